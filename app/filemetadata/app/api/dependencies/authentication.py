@@ -1,9 +1,14 @@
-import segysdk
+import threading
+from contextlib import contextmanager
+
 from fastapi import Security
 from fastapi.security import HTTPBearer
 from fastapi.security.api_key import APIKeyHeader
 
 from core.config import settings
+from core.native import lazy_module
+
+segysdk = lazy_module("segysdk")
 
 security = HTTPBearer()
 api_key_header = APIKeyHeader(scheme_name="appkey", name="appkey")
@@ -23,5 +28,23 @@ async def get_api_key(
     return api_key_header
 
 
+# segysdk keeps the SDMS url, app key and token in process-global state and copies them
+# into a session when it is created. Configuring and creating a session is therefore done
+# under one lock, after which the session carries its own caller's credentials.
+_remote_access_lock = threading.Lock()
+
+
 def configure_remote_access(sdms_bearer_token, sdms_app_key):
     segysdk.segy_configure_remote_access(settings.SDMS_URL, sdms_app_key, sdms_bearer_token)
+
+
+@contextmanager
+def remote_access(sdms_bearer_token, sdms_app_key):
+    with _remote_access_lock:
+        configure_remote_access(sdms_bearer_token, sdms_app_key)
+        yield
+
+
+def remote_access_options(sdms_bearer_token, sdms_app_key):
+    """The iocontext of a ZGY reader, which carries the caller's credentials per reader."""
+    return {"sdurl": settings.SDMS_URL, "sdapikey": sdms_app_key, "sdtoken": sdms_bearer_token}
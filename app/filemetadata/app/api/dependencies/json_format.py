@@ -0,0 +1,19 @@
+from enum import Enum
+from typing import Optional
+
+from fastapi import Query
+
+from core.config import settings
+
+
+class JsonFormat(str, Enum):
+    # SDK JSON documents are sent as strings inside the response, as in earlier versions
+    legacy = "legacy"
+    # SDK JSON documents are sent as JSON objects
+    native = "native"
+
+
+async def get_json_format(
+        json_format: Optional[JsonFormat] = Query(None, description="Shape of the response, defaults to the JSON_FORMAT setting")
+) -> JsonFormat:
+    return json_format or JsonFormat(settings.JSON_FORMAT)
@@ -0,0 +1,51 @@
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration, http_request_errors, http_requests_in_flight, metrics_directory
+
+# label of requests matching no route, so that random paths cannot grow the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope: Scope) -> str:
+    """Path template of the route handling the request, e.g. /seismic-file-metadata/api/v1/segy/revision."""
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Records the latency, in-flight count and error statuses of every HTTP request by route."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics_directory.start()
+        labels = {"method": scope["method"], "route": route_template(scope)}
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(**labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(time.perf_counter() - start, **labels)
+            http_requests_in_flight.dec(**labels)
+            if status >= 400:
+                http_request_errors.inc(status=status, **labels)
@@ -0,0 +1,80 @@
+from fastapi import responses
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from core.metrics import response_encoding_duration
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+OCTET_STREAM_MEDIA_TYPE = "application/octet-stream"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+ARRAY_SHAPE_HEADER = "X-Array-Shape"
+ARRAY_DTYPE_HEADER = "X-Array-Dtype"
+LOD_HEADER = "X-Lod"
+INDEX_START_HEADER = "X-Index-Start"
+INDEX_STEP_HEADER = "X-Index-Step"
+VALUE_RANGE_HEADER = "X-Value-Range"
+
+
+def raw_json_member(name: str, document) -> bytes:
+    """{"<name>": <document>} for an already serialized JSON document, without parsing it."""
+    if isinstance(document, str):
+        document = document.encode("utf-8")
+    return b'{"' + name.encode("utf-8") + b'":' + document + b'}'
+
+
+def has_content_type(request: Request, media_type: str) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() == media_type
+
+
+def accepts(request: Request, media_type: str) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(part.split(";")[0].strip() == media_type for part in accept.split(","))
+
+
+class BufferResponse(Response):
+    """Sends an in-memory buffer one chunk at a time, without copying it into one bytes object.
+
+    ASGI servers expect bytes bodies, so each chunk is copied out of the buffer as it is sent.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, buffer, status_code: int = 200, headers: dict = None, media_type: str = None) -> None:
+        self.buffer = buffer.getbuffer()
+        self.status_code = status_code
+        if media_type is not None:
+            self.media_type = media_type
+        self.background = None
+        headers = dict(headers or {})
+        headers["content-length"] = str(self.buffer.nbytes)
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        total = self.buffer.nbytes
+        for offset in range(0, total, self.chunk_size):
+            end = min(offset + self.chunk_size, total)
+            await send({"type": "http.response.body", "body": bytes(self.buffer[offset:end]), "more_body": end < total})
+        if total == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """orjson encoded JSON response, timed in the response encoding metrics."""
+
+    def render(self, content) -> bytes:
+        with response_encoding_duration.time(format="json"):
+            return super().render(content)
+
+
+class RawJSONResponse(Response):
+    """Sends an already serialized JSON document as is."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, str):
+            return content.encode("utf-8")
+        return content
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.security.api_key import APIKey
+from starlette.responses import StreamingResponse
+from starlette.status import (HTTP_202_ACCEPTED, HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND,
+                              HTTP_413_REQUEST_ENTITY_TOO_LARGE, HTTP_500_INTERNAL_SERVER_ERROR,
+                              HTTP_501_NOT_IMPLEMENTED)
+
+from api.dependencies.authentication import get_bearer, get_api_key
+from api.responses import NDJSON_MEDIA_TYPE, ORJSONResponse, accepts
+from api.routes.route_openzgy import read_headers
+from api.routes.route_segy import read_summary
+from core.config import settings
+from core.prefork import worker_count
+from core.sdms_client import sdms_client
+from core.writeback import WritebackPipeline
+from models.batch import BatchMetadataRequest, BatchWritebackRequest
+
+router = APIRouter()
+
+SEGY_EXTENSIONS = (".sgy", ".segy")
+ZGY_EXTENSIONS = (".zgy",)
+
+
+async def extract_metadata(sdpath, bearer, api_key):
+    name = sdpath.lower()
+    if name.endswith(SEGY_EXTENSIONS):
+        summary = await read_summary(sdpath, bearer, api_key)
+        return "segy", summary.dict(exclude_none=True)
+    if name.endswith(ZGY_EXTENSIONS):
+        return "zgy", await read_headers(sdpath, bearer, api_key)
+    raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                        detail=f"Unsupported dataset type for '{sdpath}', expected one of "
+                               f"{', '.join(SEGY_EXTENSIONS + ZGY_EXTENSIONS)}")
+
+
+async def __extract_item(sdpath, bearer, api_key):
+    try:
+        file_type, metadata = await extract_metadata(sdpath, bearer, api_key)
+        return {"sdpath": sdpath, "type": file_type, "status": 200, "metadata": metadata}
+    except HTTPException as he:
+        return {"sdpath": sdpath, "status": he.status_code, "errors": [he.detail]}
+    except Exception as e:
+        logging.error("Exception occurred", exc_info=True)
+        return {"sdpath": sdpath, "status": HTTP_500_INTERNAL_SERVER_ERROR, "errors": [str(e)]}
+
+
+async def __extract_all(sdpaths, parallelism, bearer, api_key):
+    pending = iter(sdpaths)
+    results = asyncio.Queue()
+
+    async def worker():
+        for sdpath in pending:
+            await results.put(await __extract_item(sdpath, bearer, api_key))
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(parallelism, len(sdpaths)))]
+    try:
+        for _ in range(len(sdpaths)):
+            result = await results.get()
+            yield (json.dumps(result) + "\n").encode("utf-8")
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def __check_batch_size(sdpaths):
+    if len(sdpaths) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.BATCH_MAX_ITEMS} sdpaths can be processed in one batch")
+
+
+@router.post(settings.API_PATH + "batch/metadata", tags=["BATCH"])
+async def post_batch_metadata(
+        body: BatchMetadataRequest,
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    __check_batch_size(body.sdpaths)
+    parallelism = min(body.parallelism or settings.BATCH_MAX_PARALLELISM, settings.BATCH_MAX_PARALLELISM)
+    return StreamingResponse(__extract_all(body.sdpaths, parallelism, bearer, api_key), media_type=NDJSON_MEDIA_TYPE)
+
+
+writeback_pipeline = WritebackPipeline(extract_metadata, sdms_client, settings.WRITEBACK_WORKERS,
+                                       settings.WRITEBACK_RETRIES, settings.WRITEBACK_RETRY_BACKOFF,
+                                       settings.WRITEBACK_JOB_TTL, settings.WRITEBACK_MAX_PENDING)
+
+
+def __check_single_process():
+    # jobs are kept by the process that accepted them, where prefork siblings would not find them
+    if worker_count(settings.WORKERS) > 1:
+        raise HTTPException(status_code=HTTP_501_NOT_IMPLEMENTED,
+                            detail="Write-back jobs are kept by the process that accepted them and need WORKERS=1")
+
+
+@router.post(settings.API_PATH + "batch/writeback", tags=["BATCH"], status_code=HTTP_202_ACCEPTED)
+async def post_batch_writeback(
+        request: Request,
+        body: BatchWritebackRequest,
+        idempotency_key: Optional[str] = Header(None),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    __check_single_process()
+    __check_batch_size(body.sdpaths)
+    job, _ = writeback_pipeline.submit(body.sdpaths, bearer, api_key, idempotency_key)
+    if accepts(request, NDJSON_MEDIA_TYPE):
+        return StreamingResponse(job.results(), media_type=NDJSON_MEDIA_TYPE, headers={"X-Job-Id": job.id})
+    return ORJSONResponse(job.as_dict(), status_code=HTTP_202_ACCEPTED)
+
+
+@router.get(settings.API_PATH + "batch/writeback/{job_id}", tags=["BATCH"])
+async def get_batch_writeback(
+        job_id: str,
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    __check_single_process()
+    job = writeback_pipeline.get(job_id, bearer, api_key)
+    if job is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail=f"No write-back job '{job_id}'")
+    return ORJSONResponse(job.as_dict())
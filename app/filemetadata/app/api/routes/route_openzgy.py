@@ -1,24 +1,44 @@
-import openzgycpp as zgy
 import os
 import re
-import enum
-import math
 import json
-import vector
+import logging
+import numpy as np
 
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security.api_key import APIKey
-from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
+from typing import Optional
 
-from api.dependencies.authentication import get_bearer, get_api_key, configure_remote_access
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.security.api_key import APIKey
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_413_REQUEST_ENTITY_TOO_LARGE, HTTP_500_INTERNAL_SERVER_ERROR
+
+from api.dependencies.authentication import get_api_key, get_bearer, remote_access_options
+from api.dependencies.json_format import JsonFormat, get_json_format
+from api.responses import (ARRAY_DTYPE_HEADER, ARRAY_SHAPE_HEADER, INDEX_START_HEADER, INDEX_STEP_HEADER, LOD_HEADER,
+                           OCTET_STREAM_MEDIA_TYPE, VALUE_RANGE_HEADER, ORJSONResponse, RawJSONResponse, accepts,
+                           has_content_type)
+from core.bingrid import compute_bingrid
 from core.config import settings
+from core.coordinates import SurveyCorners, decode_points, encode_points
+from core.executor import sdk_executor
+from core.metadata_cache import cached_metadata
+from core.metrics import TimedSdkObject, response_encoding_duration, timed_sdk_call
+from core.native import lazy_module
+from core.session_pool import SessionPool, StreamedLease
+from core.zgy_volume import ARRAY_DTYPES, INT8, VolumeBox, box_end, choose_lod, encode_samples, read_slab
+from core.zgy_statistics import SampleSummary
+from models.openzgy import ArrayFormat, CoordinateSystem, SliceAxis, StatisticsMode
+
+zgy = lazy_module("openzgycpp")
 
 router = APIRouter()
 
 def internal_server_error(e: Exception): 
+    if isinstance(e, HTTPException):
+        return e
     return HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-def zgy_error(ze: zgy.ZgyError):
+def zgy_error(ze: "zgy.ZgyError"):
     message = str(ze)
     matched = re.search('HTTP [0-9][0-9][0-9]', message)
     if(matched):
@@ -27,158 +47,84 @@ def zgy_error(ze: zgy.ZgyError):
     
     return HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=message)
 
-class P6Bin(enum.Enum):
-    P6BinGridOriginI = 1
-    P6BinGridOriginJ = 2
-    P6BinGridOriginEasting = 3
-    P6BinGridOriginNorthing = 4
-    P6BinNodeIncrementOnIaxis = 5
-    P6BinNodeIncrementOnJaxis = 6
-    P6BinWidthOnIaxis = 7
-    P6BinWidthOnJaxis = 8
-    P6TransformationMethod = 10
-    P6MapGridBearingOfBinGridJaxis = 11
-    BinGridLocalCoordinates = 12
-
-
-class Line:
-    def __init__(self, start, increment, count):
-        self.start = start
-        self.increment = increment
-        self.count = count
-
-    def __repr__(self):
-        return f"start: {self.start} increment: {self.increment} count: {self.count}"
-
-    def __str__(self):
-        return f"start: {self.start} increment: {self.increment} count: {self.count}"
-
-
-class Point:
-    def __init__(self, i, j, inline, xline, easting, northing):
-        self.i = i
-        self.j = j
-        self.inline = inline
-        self.xline = xline
-        self.easting = easting
-        self.northing = northing
-        self.vector = vector.obj(x=self.easting, y=self.northing)
-
-    def __repr__(self):
-        return f"i: {self.i} j: {self.j} inline: {self.inline} xline: {self.xline} easting: {self.easting} northing: {self.northing}"
-
-    def __str__(self):
-        return f"i: {self.i} j: {self.j} inline: {self.inline} xline: {self.xline} easting: {self.easting} northing: {self.northing}"
-
-
-class ZGYToBinGrid:
-    def __init__(self, point00, point10, point01, point11, inline, xline):
-        self.point00 = point00
-        self.point10 = point10
-        self.point01 = point01
-        self.point11 = point11
-        self.inline = inline
-        self.xline = xline
-
-    def getValue(self, attribute):
-        if attribute == P6Bin.P6BinGridOriginI:
-            return self.point00.inline
-
-        elif attribute == P6Bin.P6BinGridOriginJ:
-            return self.point00.xline
-
-        elif attribute == P6Bin.P6BinGridOriginEasting:
-            return self.point00.easting
-
-        elif attribute == P6Bin.P6BinGridOriginNorthing:
-            return self.point00.northing
-
-        elif attribute == P6Bin.P6BinNodeIncrementOnIaxis:
-            return self.inline.increment
-
-        elif attribute == P6Bin.P6BinNodeIncrementOnJaxis:
-            return self.xline.increment
-
-        elif attribute == P6Bin.P6BinWidthOnIaxis:
-            return math.ceil(abs(self.point10.vector - self.point00.vector) / (self.inline.count - 1))
-
-        elif attribute == P6Bin.P6BinWidthOnJaxis:
-            return math.ceil(abs(self.point01.vector - self.point00.vector) / (self.xline.count - 1))
-
-        elif attribute == P6Bin.P6TransformationMethod:
-            a1 = self.point10.vector - self.point00.vector
-            b1 = self.point01.vector - self.point00.vector
-            a2 = self.point11.vector - self.point01.vector
-            b2 = self.point11.vector - self.point10.vector
-
-            if a1.dot(b2) - a2.dot(b1) > 0:
-                return 9666
-            else:
-                return 1049
-
-        elif attribute == P6Bin.P6MapGridBearingOfBinGridJaxis:
-            b = self.point01.vector - self.point00.vector
-            b1 = b.x
-            b2 = b.y
-            angle = math.acos(b2 / abs(b))
-            if b1 >= 0:
-                return round((angle * 180) / math.pi, 2)
-            else:
-                return round(360 - (angle * 180) / math.pi)
-
-        elif attribute == P6Bin.BinGridLocalCoordinates:
-            points = [self.point00, self.point01, self.point11, self.point10, self.point00]
-            lst = []
-            for point in points:
-                m = {}
-                m["X"] = point.easting
-                m["Y"] = point.northing
-                lst.append(m)
-            return lst
-
-    def getValusAsJson(self):
-        m = {}
-        for attr in P6Bin:
-            m[attr.name] = self.getValue(attr)
-
-        return json.dumps(m, indent=2)
+
+def __open_zgy_reader(sdpath, bearer, api_key):
+    reader = timed_sdk_call("openzgycpp", "ZgyReader", zgy.ZgyReader, sdpath,
+                            iocontext=remote_access_options(bearer, api_key))
+    return TimedSdkObject(reader, "openzgycpp")
+
+
+zgy_reader_pool = SessionPool(__open_zgy_reader, settings.ZGY_READER_POOL_SIZE, settings.ZGY_READER_IDLE_TTL)
+
+
+def __read_headers(sdpath, bearer, api_key):
+    with zgy_reader_pool.acquire(sdpath, bearer, api_key) as reader:
+        headers = {
+            'Guid':                    str(reader.verid),
+            'Size':                    reader.size,
+            'BrickSize':               reader.bricksize,
+            'DataType':                str(reader.datatype),
+            'DataRange':               reader.datarange,
+            'ZUnitDimension':          str(reader.zunitdim),
+            'ZUnitName':               reader.zunitname,
+            'ZUnitFactor':             reader.zunitfactor,
+            'ZStart':                  reader.zstart,
+            'ZIncrement':              reader.zinc,
+            'XYUnitDimension':         str(reader.hunitdim),
+            'XYUnitName':              reader.hunitname,
+            'XYUnitFactor':            reader.hunitfactor,
+            'InlineStart':             reader.annotstart[0],
+            'InlineIncrement':         reader.annotinc[0],
+            'CrosslineStart':          reader.annotstart[1],
+            'CrosslineIncrement':      reader.annotinc[1],
+            'WorldCorners':            reader.corners,
+            'IndexCorners':            reader.indexcorners,
+            'AnnotationCorners':       reader.annotcorners,
+            'AmountOfLevelsOfDetail':  reader.nlods,
+            'BricksPerLevelsOfDetail': reader.brickcount,
+            'Statistics':              {'Count': reader.statistics[0], 'Sum': reader.statistics[1], 'SumOfSquares': reader.statistics[2], 'Minimum': reader.statistics[3],'Maximum': reader.statistics[4]},
+            'Histogram':               {'Count': reader.histogram[0], 'Minimum': reader.histogram[1], 'Maximum':reader.histogram[2], 'Bins': reader.histogram[3]}
+        }
+        return headers
+
+
+def __read_bingrid(sdpath, bearer, api_key):
+    with zgy_reader_pool.acquire(sdpath, bearer, api_key) as r:
+        return compute_bingrid(r.corners, r.annotcorners, r.annotinc, r.size[:2]).as_json()
+
+
+def __read_corners(sdpath, bearer, api_key):
+    with zgy_reader_pool.acquire(sdpath, bearer, api_key) as reader:
+        return {
+            'indexcorners': reader.indexcorners,
+            'annotcorners': reader.annotcorners,
+            'corners':      reader.corners
+        }
 
 
 @router.get(settings.API_PATH + "openzgy/headers", tags=["OPENZGY"])
 async def get_headers(
         sdpath: str,
+        json_format: JsonFormat = Depends(get_json_format),
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
+    headers = await read_headers(sdpath, bearer, api_key)
+    if json_format == JsonFormat.native:
+        return headers
+    return json.dumps(headers, indent=2)
+
+
+async def read_headers(sdpath, bearer, api_key):
+    return await cached_metadata(sdpath, bearer, api_key, "openzgy/headers",
+                                 lambda: __zgy_errors(sdk_executor.run(__read_headers, sdpath, bearer, api_key)))
+
+
+async def __zgy_errors(call):
+    """Awaits an SDK call, answering its ZGY and unexpected errors with their HTTP status."""
     try:
-        with zgy.ZgyReader(sdpath, iocontext={"sdurl": settings.SDMS_URL, "sdapikey": api_key,
-                                          "sdtoken": bearer}) as reader:
-            headers = {
-                'Guid':                    str(reader.verid),
-                'Size':                    reader.size,
-                'BrickSize':               reader.bricksize,
-                'DataType':                str(reader.datatype),
-                'DataRange':               reader.datarange,
-                'ZUnitDimension':          str(reader.zunitdim),
-                'ZUnitName':               reader.zunitname,
-                'ZUnitFactor':             reader.zunitfactor,
-                'ZStart':                  reader.zstart,
-                'ZIncrement':              reader.zinc,
-                'XYUnitDimension':         str(reader.hunitdim),
-                'XYUnitName':              reader.hunitname,
-                'XYUnitFactor':            reader.hunitfactor,
-                'InlineStart':             reader.annotstart[0],
-                'InlineIncrement':         reader.annotinc[0],
-                'CrosslineStart':          reader.annotstart[1],
-                'CrosslineIncrement':      reader.annotinc[1],
-                'WorldCorners':            reader.corners,
-                'IndexCorners':            reader.indexcorners,
-                'AnnotationCorners':       reader.annotcorners,
-                'AmountOfLevelsOfDetail':  reader.nlods,
-                'BricksPerLevelsOfDetail': reader.brickcount,
-                'Statistics':              {'Count': reader.statistics[0], 'Sum': reader.statistics[1], 'SumOfSquares': reader.statistics[2], 'Minimum': reader.statistics[3],'Maximum': reader.statistics[4]},
-                'Histogram':               {'Count': reader.histogram[0], 'Minimum': reader.histogram[1], 'Maximum':reader.histogram[2], 'Bins': reader.histogram[3]}
-            }
-            return json.dumps(headers, indent=2)
+        return await call
+    except HTTPException:
+        raise
     except zgy.ZgyError as ze:
         raise zgy_error(ze)
     except Exception as e:
@@ -188,32 +134,216 @@ async def get_headers(
 @router.get(settings.API_PATH + "openzgy/bingrid", tags=["OPENZGY"])
 async def get_bingrid(
         sdpath: str,
+        json_format: JsonFormat = Depends(get_json_format),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    bingrid = await cached_metadata(sdpath, bearer, api_key, "openzgy/bingrid",
+                                    lambda: __zgy_errors(sdk_executor.run(__read_bingrid, sdpath, bearer, api_key)))
+    if json_format == JsonFormat.native:
+        return RawJSONResponse(bingrid)
+    return bingrid
+
+
+@router.post(settings.API_PATH + "openzgy/transform", tags=["OPENZGY"])
+async def transform_coordinates(
+        request: Request,
+        sdpath: str,
+        source: CoordinateSystem,
+        target: CoordinateSystem,
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
+    binary = has_content_type(request, OCTET_STREAM_MEDIA_TYPE)
+    body = await request.body()
     try:
-        with zgy.ZgyReader(sdpath, iocontext={"sdurl": settings.SDMS_URL, "sdapikey": api_key,
-                                          "sdtoken": bearer}) as r:        
-            inline = Line(r.annotstart[0], r.annotinc[0], r.size[0])
-            xline = Line(r.annotstart[1], r.annotinc[1], r.size[1])
-            point00 = Point(r.indexcorners[0][0], r.indexcorners[0][1], 
-                           r.annotcorners[0][0], r.annotcorners[0][1],
-                                r.corners[0][0], r.corners[0][1])
-            
-            point10 = Point(r.indexcorners[1][0], r.indexcorners[1][1], 
-                           r.annotcorners[1][0], r.annotcorners[1][1],
-                                r.corners[1][0], r.corners[1][1])
-            
-            point01 = Point(r.indexcorners[2][0], r.indexcorners[2][1], 
-                           r.annotcorners[2][0], r.annotcorners[2][1],
-                                r.corners[2][0], r.corners[2][1])
-            
-            point11 = Point(r.indexcorners[3][0], r.indexcorners[3][1], 
-                           r.annotcorners[3][0], r.annotcorners[3][1],
-                                r.corners[3][0], r.corners[3][1])
-            
-            zgyToBinGrid = ZGYToBinGrid(point00, point10, point01, point11, inline, xline)
-            return zgyToBinGrid.getValusAsJson()
-    except zgy.ZgyError as ze:
-        raise zgy_error(ze)
-    except Exception as e:
-        raise internal_server_error(e)
+        points = decode_points(body) if binary else __json_points(body)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+
+    corners = await cached_metadata(sdpath, bearer, api_key, "openzgy/corners",
+                                    lambda: __zgy_errors(sdk_executor.run(__read_corners, sdpath, bearer, api_key)))
+    survey = SurveyCorners(corners['indexcorners'], corners['annotcorners'], corners['corners'])
+    result = await sdk_executor.run(survey.transform, points, source.value, target.value)
+
+    if binary or accepts(request, OCTET_STREAM_MEDIA_TYPE):
+        return Response(encode_points(result), media_type=OCTET_STREAM_MEDIA_TYPE)
+    return ORJSONResponse({"points": result.tolist()})
+
+
+def __json_points(body):
+    try:
+        points = np.asarray(json.loads(body)["points"], dtype=np.float64)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Expected a JSON body {{\"points\": [[x, y], ...]}}: {e}")
+    if points.size == 0:
+        return points.reshape(0, 2)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("Expected a JSON body {\"points\": [[x, y], ...]}")
+    return points
+
+
+@router.get(settings.API_PATH + "openzgy/slice", tags=["OPENZGY"])
+async def get_slice(
+        sdpath: str,
+        axis: SliceAxis,
+        index: int,
+        resolution: Optional[int] = Query(None, ge=1),
+        dtype: ArrayFormat = ArrayFormat.float32,
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    dimension = list(SliceAxis).index(axis)
+    start, count = [0, 0, 0], [None, None, None]
+    start[dimension], count[dimension] = index, 1
+    return await __volume_response(sdpath, bearer, api_key, start, count, resolution, dtype.value, dimension)
+
+
+@router.get(settings.API_PATH + "openzgy/subvolume", tags=["OPENZGY"])
+async def get_subvolume(
+        sdpath: str,
+        inline_start: int = 0,
+        inline_count: Optional[int] = None,
+        crossline_start: int = 0,
+        crossline_count: Optional[int] = None,
+        time_start: int = 0,
+        time_count: Optional[int] = None,
+        resolution: Optional[int] = Query(None, ge=1),
+        dtype: ArrayFormat = ArrayFormat.float32,
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    start = [inline_start, crossline_start, time_start]
+    count = [inline_count, crossline_count, time_count]
+    return await __volume_response(sdpath, bearer, api_key, start, count, resolution, dtype.value)
+
+
+async def __volume_response(sdpath, bearer, api_key, start, count, resolution, dtype, sliced_axis=None):
+    # the first brick row is read before the response starts so that SDK errors keep their status code
+    lease, box, slabs, value_range, first = await __zgy_errors(
+        sdk_executor.run(__open_volume, sdpath, bearer, api_key, start, count, resolution, dtype))
+    stream = StreamedLease(lease, sdk_executor)
+
+    async def chunks():
+        # the reader stays checked out of the pool until the last brick row is sent
+        try:
+            data = first
+            for slab_start, slab_shape in slabs[1:]:
+                yield __encode_slab(data, dtype, value_range)
+                data = await stream.run(read_slab, stream.session, slab_start, slab_shape, box.lod)
+            yield __encode_slab(data, dtype, value_range)
+        except Exception:
+            logging.error("ZGY volume stream interrupted", exc_info=True)
+            raise
+        finally:
+            await stream.close()
+
+    shape = [n for axis, n in enumerate(box.shape) if axis != sliced_axis]
+    headers = {
+        "Content-Length": str(int(np.prod(shape)) * ARRAY_DTYPES[dtype].itemsize),
+        ARRAY_SHAPE_HEADER: ",".join(map(str, shape)),
+        ARRAY_DTYPE_HEADER: dtype,
+        LOD_HEADER: str(box.lod),
+        INDEX_START_HEADER: ",".join(str(s * box.step) for s in box.start),
+        INDEX_STEP_HEADER: str(box.step),
+    }
+    if value_range is not None:
+        headers[VALUE_RANGE_HEADER] = f"{value_range[0]},{value_range[1]}"
+    return StreamingResponse(chunks(), media_type=OCTET_STREAM_MEDIA_TYPE, headers=headers,
+                             background=BackgroundTask(stream.close))
+
+
+def __open_volume(sdpath, bearer, api_key, start, count, resolution, dtype):
+    lease = zgy_reader_pool.acquire(sdpath, bearer, api_key)
+    reader = lease.session
+    try:
+        size = reader.size
+        end = __box_end(start, count, size)
+        lod = choose_lod([e - s for s, e in zip(start, end)], reader.nlods, resolution)
+        box = VolumeBox.at_lod(start, end, size, lod)
+        if box.count > settings.ZGY_VOLUME_MAX_SAMPLES:
+            raise HTTPException(status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"The box holds {box.count} samples at level of detail {lod}, more than the "
+                                       f"{settings.ZGY_VOLUME_MAX_SAMPLES} of a response: request a smaller box "
+                                       f"or a lower resolution")
+        slabs = list(box.slabs(reader.bricksize))
+        value_range = tuple(reader.datarange) if dtype == INT8 else None
+        first = read_slab(reader, slabs[0][0], slabs[0][1], lod)
+    except BaseException:
+        lease.release()
+        raise
+    return lease, box, slabs, value_range, first
+
+
+def __encode_slab(data, dtype, value_range):
+    with response_encoding_duration.time(format="array"):
+        return encode_samples(data, dtype, value_range)
+
+
+@router.get(settings.API_PATH + "openzgy/statistics", tags=["OPENZGY"])
+async def get_statistics(
+        sdpath: str,
+        inline_start: int = 0,
+        inline_count: Optional[int] = None,
+        crossline_start: int = 0,
+        crossline_count: Optional[int] = None,
+        time_start: int = 0,
+        time_count: Optional[int] = None,
+        mode: StatisticsMode = StatisticsMode.exact,
+        bins: int = Query(256, ge=1, le=65536),
+        minimum: Optional[float] = Query(None, description="Defaults to the low end of the file's data range"),
+        maximum: Optional[float] = Query(None, description="Defaults to the high end of the file's data range"),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    start = [inline_start, crossline_start, time_start]
+    count = [inline_count, crossline_count, time_count]
+    operation = (f"statistics?start={start}&count={count}&mode={mode.value}&bins={bins}"
+                 f"&minimum={minimum}&maximum={maximum}")
+    return await cached_metadata(sdpath, bearer, api_key, "openzgy/" + operation,
+                                 lambda: __region_statistics(sdpath, bearer, api_key, start, count, mode, bins,
+                                                             minimum, maximum))
+
+
+async def __region_statistics(sdpath, bearer, api_key, start, count, mode, bins, minimum, maximum):
+    lease = await __zgy_errors(sdk_executor.run(zgy_reader_pool.acquire, sdpath, bearer, api_key))
+    reader = lease.session
+    try:
+        size = reader.size
+        end = __box_end(start, count, size)
+        full = VolumeBox(start, end, 0)
+        lod = 0
+        if mode == StatisticsMode.estimate:
+            lod = choose_lod(full.shape, reader.nlods, settings.ZGY_STATISTICS_ESTIMATE_RESOLUTION)
+        box = VolumeBox.at_lod(start, end, size, lod)
+        low, high = reader.datarange
+        low = low if minimum is None else minimum
+        high = high if maximum is None else maximum
+        if not low < high:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                                detail=f"The histogram minimum {low} is not below its maximum {high}")
+
+        def summarize(brick_start, brick_shape):
+            return SampleSummary.of(read_slab(reader, brick_start, brick_shape, lod), bins, low, high)
+
+        # summaries are merged as the bricks complete; after a failure the reads still running end before the release
+        try:
+            summary = await sdk_executor.reduce(summarize, box.bricks(reader.bricksize), SampleSummary.merge,
+                                                SampleSummary.empty(bins, low, high),
+                                                settings.ZGY_STATISTICS_PARALLELISM)
+        except zgy.ZgyError as ze:
+            raise zgy_error(ze)
+        except Exception as e:
+            raise internal_server_error(e)
+    finally:
+        lease.release()
+
+    return {
+        'Mode': mode.value,
+        'Lod': lod,
+        'Start': list(start),
+        'Size': list(full.shape),
+        **summary.scaled(full.count).as_json(),
+    }
+
+
+def __box_end(start, count, size):
+    try:
+        return box_end(start, count, size)
+    except ValueError as ve:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(ve))
@@ -1,20 +1,49 @@
+import asyncio
 import json
+import logging
 import re
-import segysdk
+import numpy as np
 
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.security.api_key import APIKey
-from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from starlette.status import (HTTP_400_BAD_REQUEST, HTTP_413_REQUEST_ENTITY_TOO_LARGE, HTTP_422_UNPROCESSABLE_ENTITY,
+                              HTTP_500_INTERNAL_SERVER_ERROR)
 
-from api.dependencies.authentication import get_bearer, get_api_key, configure_remote_access
+from api.dependencies.authentication import get_bearer, get_api_key, remote_access
+from api.dependencies.json_format import JsonFormat, get_json_format
+from api.responses import (NDJSON_MEDIA_TYPE, NEXT_CURSOR_HEADER, NPZ_MEDIA_TYPE, BufferResponse, ORJSONResponse, RawJSONResponse,
+                           accepts, raw_json_member)
 from core.config import settings
+from core.executor import sdk_executor
+from core.metadata_cache import cached_metadata
+from core.metrics import TimedSdkObject, response_encoding_duration, segy_session_create_duration, timed_sdk_call
+from core.native import lazy_module
+from core.range_reader import RangeReader
+from core.sdms_client import sdms_client
+from core.sdpath import parse_sdpath
+from core.segy_bingrid import (COORDINATE_FIELDS, BinGridFitError, choose_coordinates, fit_bingrid, sample_trace_chunks,
+                               sample_trace_numbers)
+from core.segy_decoder import binary_header_from_json, extended_textual_header_count, scaled_coordinates
+from core.segy_range_session import RangeReadSegySession
+from core.session_pool import SerializedSession, SessionPool, StreamedLease
+from core.trace_header_stats import TraceHeaderHistograms, TraceHeaderSummary, statistics_as_json
+from core.trace_headers import chunk_trace_count, decode_cursor, encode_cursor, encode_ndjson, parse_trace_headers, to_npz
+from models.segy import SEGY_SUMMARY_FIELDS, SegySummary
+
+segysdk = lazy_module("segysdk")
 
 router = APIRouter()
 
 def internal_server_error(e: Exception): 
+    if isinstance(e, HTTPException):
+        return e
     return HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-def segy_error(se: segysdk.SegyException):
+def segy_error(se: "segysdk.SegyException"):
     message = str(se)
     matched = re.search('HTTP [0-9][0-9][0-9]', message)
     if(matched):
@@ -28,13 +57,7 @@ async def get_revision(
         sdpath: str,
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        revision = segy.get_revision()
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    revision = await __segy_metadata(sdpath, bearer, api_key, "revision", lambda segy: segy.get_revision())
 
     return revision
 
@@ -43,13 +66,7 @@ async def get_is_3d(
         sdpath: str,
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        is_3d = segy.is_3d()
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    is_3d = await __segy_metadata(sdpath, bearer, api_key, "is3D", lambda segy: segy.is_3d())
 
     return is_3d == 1
 
@@ -58,13 +75,8 @@ async def get_trace_header_field_count(
         sdpath: str,
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        count = segy.get_trace_header_field_count()
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    count = await __segy_metadata(sdpath, bearer, api_key, "traceHeaderFieldCount",
+                                  lambda segy: segy.get_trace_header_field_count())
 
     return count
 
@@ -73,86 +85,352 @@ async def get_textual_header(
         sdpath: str,
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        ascii_headers_as_json = segy.get_ascii_headers_as_json()
-        json_header = json.loads(ascii_headers_as_json)["Textualheader"]
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    json_header = await __segy_metadata(sdpath, bearer, api_key, "textualHeader",
+                                        lambda segy: json.loads(segy.get_ascii_headers_as_json())["Textualheader"])
 
     return {"header": f"{json_header}"}
 
 @router.get(settings.API_PATH + "segy/extendedTextualHeaders", tags=["SEGY"])
 async def get_extended_textual_headers(
         sdpath: str,
+        json_format: JsonFormat = Depends(get_json_format),
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        get_extended_ascii_headers_as_json = segy.get_extended_ascii_headers_as_json()
-        json_header = json.loads(get_extended_ascii_headers_as_json)
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    json_header = await __segy_metadata(sdpath, bearer, api_key, "extendedTextualHeaders",
+                                        lambda segy: json.loads(segy.get_extended_ascii_headers_as_json()))
 
+    if json_format == JsonFormat.native:
+        return {"header": json_header}
     return {"header": f"{json_header}"}
 
 @router.get(settings.API_PATH + "segy/binaryHeader", tags=["SEGY"])
 async def get_binary_header(
         sdpath: str,
+        json_format: JsonFormat = Depends(get_json_format),
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
-    try:
-        header = segy.get_binary_header_as_json()
-    except segysdk.SegyException as se:
-        raise segy_error(se)
-    except Exception as e:
-        raise internal_server_error(e)
+    header = await __segy_metadata(sdpath, bearer, api_key, "binaryHeader", lambda segy: segy.get_binary_header_as_json())
 
+    if json_format == JsonFormat.native:
+        return RawJSONResponse(raw_json_member("header", header))
     return {"header": f"{header}"}
 
+@router.get(settings.API_PATH + "segy/summary", tags=["SEGY"], response_model=SegySummary, response_model_exclude_none=True)
+async def get_summary(
+        sdpath: str,
+        fields: Optional[str] = Query(None, description="Comma separated subset of " + ", ".join(SEGY_SUMMARY_FIELDS)),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    requested = SEGY_SUMMARY_FIELDS if fields is None else [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SEGY_SUMMARY_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"Unknown summary fields: {', '.join(unknown)}")
+
+    return await read_summary(sdpath, bearer, api_key, requested)
+
+async def read_summary(sdpath, bearer, api_key, fields=SEGY_SUMMARY_FIELDS):
+    summary = await __segy_metadata(sdpath, bearer, api_key, "summary?fields=" + ",".join(fields),
+                                    lambda segy: __read_summary(segy, fields).dict(exclude_none=True))
+    return SegySummary(**summary)
+
+async def __segy_metadata(sdpath, bearer, api_key, operation, read):
+    async def compute():
+        lease = await sdk_executor.run(__create_segy_session, bearer, api_key, sdpath)
+        try:
+            return await sdk_executor.run(read, lease.session)
+        except segysdk.SegyException as se:
+            raise segy_error(se)
+        except Exception as e:
+            raise internal_server_error(e)
+        finally:
+            lease.release()
+
+    return await cached_metadata(sdpath, bearer, api_key, "segy/" + operation, compute)
+
+def __read_summary(segy, fields):
+    summary = {}
+    if "revision" in fields:
+        summary["revision"] = segy.get_revision()
+    if "is3D" in fields:
+        summary["is3D"] = segy.is_3d() == 1
+    if "traceHeaderFieldCount" in fields:
+        summary["traceHeaderFieldCount"] = segy.get_trace_header_field_count()
+    if "textualHeader" in fields:
+        summary["textualHeader"] = json.loads(segy.get_ascii_headers_as_json())["Textualheader"]
+    if "extendedTextualHeaders" in fields:
+        summary["extendedTextualHeaders"] = json.loads(segy.get_extended_ascii_headers_as_json())
+    if "binaryHeader" in fields:
+        summary["binaryHeader"] = json.loads(segy.get_binary_header_as_json())["BinaryHeaders"]
+    return SegySummary(**summary)
+
 @router.get(settings.API_PATH + "segy/rawTraceHeaders", tags=["SEGY"])
 async def get_raw_trace_headers(
         sdpath: str,
         start_trace: int,
         traces_to_dump: int,
+        request: Request,
+        page_size: Optional[int] = Query(None, gt=0),
+        cursor: Optional[str] = None,
+        json_format: JsonFormat = Depends(get_json_format),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    return await __trace_headers_response(request, sdpath, bearer, api_key, True,
+                                          start_trace, traces_to_dump, page_size, cursor, json_format)
+
+@router.get(settings.API_PATH + "segy/scaledTraceHeaders", tags=["SEGY"])
+async def get_scaled_trace_headers(
+        sdpath: str,
+        start_trace: int,
+        traces_to_dump: int,
+        request: Request,
+        page_size: Optional[int] = Query(None, gt=0),
+        cursor: Optional[str] = None,
+        json_format: JsonFormat = Depends(get_json_format),
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
+    return await __trace_headers_response(request, sdpath, bearer, api_key, False,
+                                          start_trace, traces_to_dump, page_size, cursor, json_format)
+
+async def __trace_headers_response(request, sdpath, bearer, api_key, raw, start_trace, traces_to_dump, page_size, cursor,
+                                   json_format=JsonFormat.legacy):
+    lease = await sdk_executor.run(__create_segy_session, bearer, api_key, sdpath)
     try:
-        header = segy.get_raw_trace_headers_as_json(start_trace, traces_to_dump)
+        get_trace_headers_as_json = (lease.session.get_raw_trace_headers_as_json if raw
+                                     else lease.session.get_scaled_trace_headers_as_json)
+        response = await __trace_headers_page(request, lease, get_trace_headers_as_json, raw, start_trace,
+                                              traces_to_dump, page_size, cursor, json_format)
     except segysdk.SegyException as se:
+        lease.release()
         raise segy_error(se)
     except Exception as e:
+        lease.release()
         raise internal_server_error(e)
+    if not isinstance(response, StreamingResponse):
+        lease.release()
+    return response
 
-    return {"header": f"{header}"}
+async def __trace_headers_page(request, lease, get_trace_headers_as_json, raw, start_trace, traces_to_dump, page_size,
+                               cursor, json_format):
+    """The response to a trace header request; a streamed response releases the session lease once it is sent."""
+    end_trace = start_trace + traces_to_dump
+    first_trace = start_trace
+    if cursor is not None:
+        try:
+            first_trace = decode_cursor(cursor)
+        except ValueError as ve:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(ve))
+        if not start_trace <= first_trace < end_trace:
+            raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=f"Cursor '{cursor}' is outside of the requested traces")
 
-@router.get(settings.API_PATH + "segy/scaledTraceHeaders", tags=["SEGY"])
-async def get_scaled_trace_headers(
+    last_trace = end_trace if page_size is None else min(end_trace, first_trace + page_size)
+    headers = {}
+    if last_trace < end_trace:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(last_trace)
+    trace_count = last_trace - first_trace
+
+    if accepts(request, NDJSON_MEDIA_TYPE):
+        stream = StreamedLease(lease, sdk_executor)
+        chunks = await __ndjson_trace_headers(stream, get_trace_headers_as_json, first_trace, trace_count)
+        return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers,
+                                 background=BackgroundTask(stream.close))
+
+    if trace_count > settings.TRACE_HEADER_MAX_BUFFERED_TRACES:
+        raise HTTPException(status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {settings.TRACE_HEADER_MAX_BUFFERED_TRACES} trace headers can be returned at once. "
+                                   f"Use page_size or 'Accept: {NDJSON_MEDIA_TYPE}' for larger requests")
+    if accepts(request, NPZ_MEDIA_TYPE):
+        buffer = await sdk_executor.run(__trace_headers_npz, get_trace_headers_as_json, first_trace, trace_count, raw)
+        return BufferResponse(buffer, headers=headers, media_type=NPZ_MEDIA_TYPE)
+    header = await sdk_executor.run(get_trace_headers_as_json, first_trace, trace_count)
+    if json_format == JsonFormat.native:
+        return RawJSONResponse(raw_json_member("header", header), headers=headers)
+    return ORJSONResponse({"header": f"{header}"}, headers=headers)
+
+async def __ndjson_trace_headers(stream, get_trace_headers_as_json, first_trace, trace_count):
+    # the first chunk is read before the response starts so that SDK errors keep their status code
+    count = chunk_trace_count(0, settings.TRACE_HEADER_CHUNK_TRACES, settings.TRACE_HEADER_CHUNK_BYTES)
+    count = min(count, trace_count)
+    first_chunk = await sdk_executor.run(get_trace_headers_as_json, first_trace, count)
+
+    async def chunks():
+        header, start, fetched = first_chunk, first_trace, count
+        try:
+            with response_encoding_duration.time(format="ndjson"):
+                chunk = encode_ndjson(header, trace_count)
+            yield chunk
+            while True:
+                start += fetched
+                remaining = first_trace + trace_count - start
+                if remaining <= 0:
+                    break
+                bytes_per_trace = len(header) / fetched
+                fetched = min(remaining, chunk_trace_count(bytes_per_trace, settings.TRACE_HEADER_CHUNK_TRACES,
+                                                           settings.TRACE_HEADER_CHUNK_BYTES))
+                header = await stream.run(get_trace_headers_as_json, start, fetched)
+                with response_encoding_duration.time(format="ndjson"):
+                    chunk = encode_ndjson(header)
+                yield chunk
+        except Exception as e:
+            logging.error("Trace header stream interrupted", exc_info=True)
+            yield (json.dumps({"errors": [str(e)]}) + "\n").encode("utf-8")
+        finally:
+            await stream.close()
+
+    return chunks()
+
+def __trace_headers_npz(get_trace_headers_as_json, start_trace, traces_to_dump, raw):
+    trace_headers = parse_trace_headers(get_trace_headers_as_json(start_trace, traces_to_dump), raw)
+    with response_encoding_duration.time(format="npz"):
+        return to_npz(trace_headers)
+
+@router.get(settings.API_PATH + "segy/traceHeaderStatistics", tags=["SEGY"])
+async def get_trace_header_statistics(
         sdpath: str,
-        start_trace: int,
-        traces_to_dump: int,
+        start_trace: int = Query(1, ge=1),
+        traces_to_scan: Optional[int] = Query(None, gt=0, description="Defaults to all traces from start_trace on"),
+        bins: int = Query(32, ge=0, le=4096, description="Most histogram bins per field, 0 skips the histograms"),
+        bearer: APIKey = Depends(get_bearer),
+        api_key: APIKey = Depends(get_api_key)):
+    operation = f"traceHeaderStatistics?start_trace={start_trace}&traces_to_scan={traces_to_scan}&bins={bins}"
+    return await cached_metadata(sdpath, bearer, api_key, "segy/" + operation,
+                                 lambda: __trace_header_statistics(sdpath, bearer, api_key, start_trace, traces_to_scan, bins))
+
+async def __trace_header_statistics(sdpath, bearer, api_key, start_trace, traces_to_scan, bins):
+    lease = await sdk_executor.run(__create_segy_session, bearer, api_key, sdpath)
+    segy = lease.session
+    try:
+        if traces_to_scan is None:
+            traces_to_scan = await __segy_trace_count(segy, sdpath, bearer, api_key) - start_trace + 1
+        traces_to_scan = max(traces_to_scan, 0)
+
+        def summarize(start, count):
+            trace_headers = parse_trace_headers(segy.get_raw_trace_headers_as_json(start, count))
+            return TraceHeaderSummary.of(trace_headers), TraceHeaderHistograms.of(trace_headers, bins) if bins else None
+
+        def merge(merged, chunk):
+            return merged[0].merge(chunk[0]), merged[1].merge(chunk[1]) if bins else None
+
+        empty = TraceHeaderSummary.empty([]), TraceHeaderHistograms.empty([], bins) if bins else None
+        summary, histograms = await __reduce_trace_chunks(summarize, merge, empty, start_trace, traces_to_scan)
+    except segysdk.SegyException as se:
+        raise segy_error(se)
+    except Exception as e:
+        raise internal_server_error(e)
+    finally:
+        lease.release()
+
+    return {"StartTrace": start_trace, "TraceCount": summary.count, "Fields": statistics_as_json(summary, histograms)}
+
+async def __reduce_trace_chunks(fn, merge, initial, start_trace, trace_count):
+    """Merge fn(start, count) of consecutive trace chunks, run on the SDK executor a few chunks at a time."""
+    chunk = settings.TRACE_HEADER_CHUNK_TRACES
+    end = start_trace + trace_count
+    calls = ((start, min(chunk, end - start)) for start in range(start_trace, end, chunk))
+    return await sdk_executor.reduce(fn, calls, merge, initial, settings.TRACE_HEADER_SCAN_PARALLELISM)
+
+async def __segy_trace_count(segy, sdpath, bearer, api_key):
+    if isinstance(segy, RangeReadSegySession):
+        return await sdk_executor.run(lambda: segy.binary_header().trace_count(segy.reader.size()))
+    binary_header_json = await sdk_executor.run(segy.get_binary_header_as_json)
+    binary_header = binary_header_from_json(binary_header_json)
+    if binary_header.revision >= 1:
+        # extended textual headers come before the first trace but are missing from the binary header document
+        extended = extended_textual_header_count(await sdk_executor.run(segy.get_extended_ascii_headers_as_json))
+        binary_header = binary_header_from_json(binary_header_json, extended)
+    size = (await sdms_client.get_descriptor(sdpath, bearer, api_key)).size
+    if size is None:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                            detail="The dataset record has no file size, the number of traces must be given")
+    return binary_header.trace_count(int(size))
+
+@router.get(settings.API_PATH + "segy/bingrid", tags=["SEGY"])
+async def get_bingrid(
+        sdpath: str,
+        sample_traces: Optional[int] = Query(None, ge=0, description="Traces sampled evenly over the file, 0 reads all traces"),
+        coordinates: str = Query("auto", regex="^(auto|cdp|source|receiver)$",
+                                 description="Trace header coordinates to fit, auto uses CDP X/Y when they can be read "
+                                             "and reports in CoordinateFallback why it used source X/Y otherwise"),
         bearer: APIKey = Depends(get_bearer),
         api_key: APIKey = Depends(get_api_key)):
-    segy = __create_segy_session(bearer, api_key, sdpath)
+    if sample_traces is None:
+        sample_traces = settings.SEGY_BINGRID_SAMPLE_TRACES
+    return await cached_metadata(sdpath, bearer, api_key,
+                                 f"segy/bingrid?sample_traces={sample_traces}&coordinates={coordinates}",
+                                 lambda: __segy_bingrid(sdpath, bearer, api_key, sample_traces, coordinates))
+
+async def __segy_bingrid(sdpath, bearer, api_key, sample_traces, coordinates):
+    lease = await sdk_executor.run(__create_segy_session, bearer, api_key, sdpath)
+    segy = lease.session
     try:
-        header = segy.get_scaled_trace_headers_as_json(start_trace, traces_to_dump)
+        trace_count = await __segy_trace_count(segy, sdpath, bearer, api_key)
+        if trace_count <= 0:
+            raise BinGridFitError("The file has no traces")
+        if isinstance(segy, RangeReadSegySession):
+            # only the 240 bytes of each sampled trace header are read, CDP coordinates included
+            trace_headers = await sdk_executor.run(segy.read_trace_headers,
+                                                   sample_trace_numbers(trace_count, sample_traces).tolist())
+            headers = {field: trace_headers[field] for field in trace_headers.dtype.names}
+        else:
+            # the segysdk trace header document has no CDP coordinates
+            if coordinates == "cdp":
+                raise HTTPException(status_code=HTTP_400_BAD_REQUEST,
+                                    detail="CDP coordinates can only be read with SEGY_RANGE_READ_URL configured")
+            headers = await __sample_sdk_trace_headers(segy, trace_count, sample_traces)
+
+        coordinates, fallback = choose_coordinates(coordinates, headers)
+        x, y = scaled_coordinates(headers, *COORDINATE_FIELDS[coordinates])
+        bingrid, residuals = await sdk_executor.run(fit_bingrid, headers["InlineNumber"], headers["CrosslineNumber"], x, y)
+    except BinGridFitError as e:
+        raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except segysdk.SegyException as se:
         raise segy_error(se)
     except Exception as e:
         raise internal_server_error(e)
+    finally:
+        lease.release()
 
-    return {"header": f"{header}"}
+    response = {**bingrid.as_dict(), "CoordinateSource": coordinates, "Residuals": residuals}
+    if fallback is not None:
+        response["CoordinateFallback"] = fallback
+    return response
+
+async def __sample_sdk_trace_headers(segy, trace_count, sample_traces):
+    """Header columns of sample_traces traces, subsampled from a few chunks of consecutive traces read with segysdk."""
+    chunks = sample_trace_chunks(trace_count, settings.SEGY_BINGRID_SAMPLE_CHUNKS if sample_traces else 0,
+                                 settings.TRACE_HEADER_CHUNK_TRACES)
+
+    def read(start, count):
+        return start, parse_trace_headers(segy.get_raw_trace_headers_as_json(start, count)).columns
+
+    samples = sorted(await sdk_executor.reduce(read, chunks, lambda read, chunk: read + [chunk], [],
+                                               settings.TRACE_HEADER_SCAN_PARALLELISM), key=lambda chunk: chunk[0])
+    headers = {field: np.concatenate([columns[field] for _, columns in samples]) for field in samples[0][1]}
+    rows = sample_trace_numbers(len(headers["InlineNumber"]), sample_traces) - 1
+    return {field: values[rows] for field, values in headers.items()}
+
+def __open_sdk_segy_session(sdpath, bearer, api_key):
+    with remote_access(bearer, api_key):
+        session = timed_sdk_call("segysdk", "create_session", segysdk.create_session, sdpath, '{}')
+    return SerializedSession(TimedSdkObject(session, "segysdk"))
+
+def __open_segy_session(sdpath, bearer, api_key):
+    if not settings.SEGY_RANGE_READ_URL:
+        return __open_sdk_segy_session(sdpath, bearer, api_key)
+    try:
+        parts = parse_sdpath(sdpath)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+    url = settings.SEGY_RANGE_READ_URL.format(**parts._asdict())
+    reader = RangeReader(url, headers={"Authorization": bearer})
+    return RangeReadSegySession(reader, sdpath, lambda: __open_sdk_segy_session(sdpath, bearer, api_key))
+
+segy_session_pool = SessionPool(__open_segy_session, settings.SEGY_SESSION_POOL_SIZE, settings.SEGY_SESSION_IDLE_TTL)
 
 def __create_segy_session(bearer, api_key, sdpath):
+    """A lease on the caller's pooled session; the session stays open until the lease is released."""
     try:
-        configure_remote_access(bearer, api_key)
-        return segysdk.create_session(sdpath, '{}')    
+        with segy_session_create_duration.time():
+            return segy_session_pool.acquire(sdpath, bearer, api_key)
     except segysdk.SegyException as se:
         raise segy_error(se)
     except Exception as e:
@@ -1,6 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from starlette.responses import JSONResponse, Response
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
 
 from core.config import settings
+from core.executor import sdk_executor
+from core.metadata_cache import metadata_cache
+from core.metrics import CONTENT_TYPE, metrics_directory, registry
+from core.native import native_modules
 
 router = APIRouter()
 
@@ -8,3 +14,27 @@ router = APIRouter()
 @router.get(settings.API_PATH + "service-status", tags=["General"])
 def get_status():
     return {"status": "ok"}
+
+
+@router.get(settings.API_PATH + "service-status/executor", tags=["General"])
+def get_executor_status():
+    return sdk_executor.stats()
+
+
+@router.get(settings.API_PATH + "service-status/metadataCache", tags=["General"])
+def get_metadata_cache_status():
+    return metadata_cache.stats()
+
+
+@router.get(settings.API_PATH + "service-status/readiness", tags=["General"])
+def get_readiness(require_warm: bool = Query(False, description="Answer 503 until the native SDKs are loaded")):
+    status = native_modules.status()
+    if require_warm and status["status"] != "warm":
+        return JSONResponse(status, status_code=HTTP_503_SERVICE_UNAVAILABLE)
+    return status
+
+
+@router.get(settings.API_PATH + "metrics", tags=["General"])
+def get_metrics():
+    text = metrics_directory.render() if metrics_directory.enabled else registry.render()
+    return Response(text, media_type=CONTENT_TYPE)
@@ -0,0 +1,65 @@
+"""Compare core.bingrid with the per-Point ZGYToBinGrid class.
+
+Run from the app directory, in an environment with the service and benchmark requirements installed:
+
+    python -m benchmark.bench_bingrid [--surveys 10000] [--repeat 3]
+
+Checks that both produce the same P6 output for the integration test dataset
+and for random surveys, then prints the time per survey of each as JSON.
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmark.surveys import ANNOT_CORNERS, ANNOT_INC, CORNERS, SIZE, legacy_bingrid, random_surveys
+from core.bingrid import P6_FIELDS, compute_bingrid, compute_bingrids
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'integration_test', 'features', 'data')
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--surveys", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, 'integration_test_bingrid_response.json')) as fp:
+        expected = json.loads(json.load(fp))
+    bingrid = compute_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE)
+    assert all(bingrid.as_dict()[field] == expected[field] for field in P6_FIELDS if field.startswith("P6"))
+    assert bingrid.as_json() == legacy_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE)
+
+    corners, annotcorners, annotinc, size = random_surveys(args.surveys)
+    surveys = [(corners[n].tolist(), annotcorners[n].tolist(), annotinc[n].tolist(), size[n].tolist())
+               for n in range(args.surveys)]
+    grids = compute_bingrids(corners, annotcorners, annotinc, size)
+    assert [grid.as_json() for grid in grids] == [legacy_bingrid(*survey) for survey in surveys]
+
+    legacy = best_of(args.repeat, lambda: [legacy_bingrid(*survey) for survey in surveys])
+    single = best_of(args.repeat, lambda: [compute_bingrid(*survey).as_json() for survey in surveys])
+    batch = best_of(args.repeat, lambda: [grid.as_json() for grid in
+                                          compute_bingrids(corners, annotcorners, annotinc, size)])
+    print(json.dumps({
+        "surveys": args.surveys,
+        "identicalOutput": True,
+        "usPerSurvey": {
+            "ZGYToBinGrid": legacy / args.surveys * 1e6,
+            "compute_bingrid": single / args.surveys * 1e6,
+            "compute_bingrids": batch / args.surveys * 1e6,
+        },
+        "speedup": {"compute_bingrid": legacy / single, "compute_bingrids": legacy / batch},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
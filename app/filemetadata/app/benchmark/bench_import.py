@@ -0,0 +1,78 @@
+"""Measure the cold start cost of the application module.
+
+Run from the app directory, in an environment with the service requirements installed:
+
+    python -m benchmark.bench_import [--repeat 5] [--slowest 10]
+
+Imports main in fresh interpreters and prints as JSON the median time to import it,
+the native modules it imported (none while they are loaded lazily), the time each
+native module then takes to load, and the slowest imports reported by -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from core.native import NATIVE_MODULES
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+native = [name for name in {names!r} if name in sys.modules]
+from core.native import native_modules
+for name in native_modules.names:
+    try:
+        native_modules.load(name)
+    except Exception:
+        pass
+print(json.dumps({{"importMain": imported, "importedByMain": native, "states": native_modules.states,
+                  "native": native_modules.seconds}}))
+"""
+
+
+def measure():
+    output = subprocess.run([sys.executable, "-c", MEASURE.format(names=NATIVE_MODULES)], cwd=APP_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def slowest_imports(count):
+    """(module, cumulative seconds) of the slowest imports of main, from -X importtime."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=APP_DIR,
+                            capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda item: -item[1])[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--slowest", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    print(json.dumps({
+        "repeat": args.repeat,
+        "importMainSeconds": statistics.median(run["importMain"] for run in runs),
+        "nativeModulesImportedByMain": runs[-1]["importedByMain"],
+        "nativeImportSeconds": {
+            name: statistics.median(run["native"][name] for run in runs) if state == "warm" else state
+            for name, state in runs[-1]["states"].items()
+        },
+        "slowestImports": dict(slowest_imports(args.slowest)),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""The per-Point bin grid classes that core.bingrid replaced, kept to check and time it against."""
+import enum
+import json
+import math
+
+import vector
+
+
+class P6Bin(enum.Enum):
+    P6BinGridOriginI = 1
+    P6BinGridOriginJ = 2
+    P6BinGridOriginEasting = 3
+    P6BinGridOriginNorthing = 4
+    P6BinNodeIncrementOnIaxis = 5
+    P6BinNodeIncrementOnJaxis = 6
+    P6BinWidthOnIaxis = 7
+    P6BinWidthOnJaxis = 8
+    P6TransformationMethod = 10
+    P6MapGridBearingOfBinGridJaxis = 11
+    BinGridLocalCoordinates = 12
+
+
+class Line:
+    def __init__(self, start, increment, count):
+        self.start = start
+        self.increment = increment
+        self.count = count
+
+    def __repr__(self):
+        return f"start: {self.start} increment: {self.increment} count: {self.count}"
+
+    def __str__(self):
+        return f"start: {self.start} increment: {self.increment} count: {self.count}"
+
+
+class Point:
+    def __init__(self, i, j, inline, xline, easting, northing):
+        self.i = i
+        self.j = j
+        self.inline = inline
+        self.xline = xline
+        self.easting = easting
+        self.northing = northing
+        self.vector = vector.obj(x=self.easting, y=self.northing)
+
+    def __repr__(self):
+        return f"i: {self.i} j: {self.j} inline: {self.inline} xline: {self.xline} easting: {self.easting} northing: {self.northing}"
+
+    def __str__(self):
+        return f"i: {self.i} j: {self.j} inline: {self.inline} xline: {self.xline} easting: {self.easting} northing: {self.northing}"
+
+
+class ZGYToBinGrid:
+    """Bin grid computed one attribute at a time, as the openzgy/bingrid route did before core.bingrid."""
+
+    def __init__(self, point00, point10, point01, point11, inline, xline):
+        self.point00 = point00
+        self.point10 = point10
+        self.point01 = point01
+        self.point11 = point11
+        self.inline = inline
+        self.xline = xline
+
+    def getValue(self, attribute):
+        if attribute == P6Bin.P6BinGridOriginI:
+            return self.point00.inline
+
+        elif attribute == P6Bin.P6BinGridOriginJ:
+            return self.point00.xline
+
+        elif attribute == P6Bin.P6BinGridOriginEasting:
+            return self.point00.easting
+
+        elif attribute == P6Bin.P6BinGridOriginNorthing:
+            return self.point00.northing
+
+        elif attribute == P6Bin.P6BinNodeIncrementOnIaxis:
+            return self.inline.increment
+
+        elif attribute == P6Bin.P6BinNodeIncrementOnJaxis:
+            return self.xline.increment
+
+        elif attribute == P6Bin.P6BinWidthOnIaxis:
+            return math.ceil(abs(self.point10.vector - self.point00.vector) / (self.inline.count - 1))
+
+        elif attribute == P6Bin.P6BinWidthOnJaxis:
+            return math.ceil(abs(self.point01.vector - self.point00.vector) / (self.xline.count - 1))
+
+        elif attribute == P6Bin.P6TransformationMethod:
+            a1 = self.point10.vector - self.point00.vector
+            b1 = self.point01.vector - self.point00.vector
+            a2 = self.point11.vector - self.point01.vector
+            b2 = self.point11.vector - self.point10.vector
+
+            if a1.dot(b2) - a2.dot(b1) > 0:
+                return 9666
+            else:
+                return 1049
+
+        elif attribute == P6Bin.P6MapGridBearingOfBinGridJaxis:
+            b = self.point01.vector - self.point00.vector
+            b1 = b.x
+            b2 = b.y
+            angle = math.acos(b2 / abs(b))
+            if b1 >= 0:
+                return round((angle * 180) / math.pi, 2)
+            else:
+                return round(360 - (angle * 180) / math.pi)
+
+        elif attribute == P6Bin.BinGridLocalCoordinates:
+            points = [self.point00, self.point01, self.point11, self.point10, self.point00]
+            lst = []
+            for point in points:
+                m = {}
+                m["X"] = point.easting
+                m["Y"] = point.northing
+                lst.append(m)
+            return lst
+
+    def getValusAsJson(self):
+        m = {}
+        for attr in P6Bin:
+            m[attr.name] = self.getValue(attr)
+
+        return json.dumps(m, indent=2)
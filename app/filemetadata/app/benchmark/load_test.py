@@ -0,0 +1,216 @@
+"""Load test of the service against simulated SDKs.
+
+Run from the app directory, in an environment with the service requirements installed:
+
+    python -m benchmark.load_test [--requests 200] [--concurrency 16] [--sdk-latency 0.005] [--open-latency 0.05]
+
+Starts the service with uvicorn in a child process, with benchmark.simulated_sdk in place
+of segysdk and openzgycpp and a stand-in SDMS answering dataset records. It then sends
+--requests requests to every route from --concurrency threads and prints JSON with the
+p50/p99 latency, requests per second and errors (responses without the expected status)
+of every route, and the peak RSS of the largest service process. --workers serves with
+that many forked worker processes.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from benchmark import simulated_sdk
+
+SGY = "sd://opendes/load-test/integration_test_dataset.sgy"
+ZGY = "sd://opendes/load-test/integration_test_dataset.zgy"
+HEADERS = {"Authorization": "Bearer token", "appkey": "load-test"}
+
+# name: (method, route under API_PATH, keyword arguments of requests.request[, expected status])
+ROUTES = {
+    "service-status": ("GET", "service-status", {}),
+    "segy/revision": ("GET", f"segy/revision?sdpath={SGY}", {}),
+    "segy/is3D": ("GET", f"segy/is3D?sdpath={SGY}", {}),
+    "segy/traceHeaderFieldCount": ("GET", f"segy/traceHeaderFieldCount?sdpath={SGY}", {}),
+    "segy/textualHeader": ("GET", f"segy/textualHeader?sdpath={SGY}", {}),
+    "segy/extendedTextualHeaders": ("GET", f"segy/extendedTextualHeaders?sdpath={SGY}", {}),
+    "segy/binaryHeader": ("GET", f"segy/binaryHeader?sdpath={SGY}", {}),
+    "segy/binaryHeader native": ("GET", f"segy/binaryHeader?sdpath={SGY}&json_format=native", {}),
+    "segy/summary": ("GET", f"segy/summary?sdpath={SGY}", {}),
+    "segy/rawTraceHeaders": ("GET", f"segy/rawTraceHeaders?sdpath={SGY}&start_trace=1&traces_to_dump=100", {}),
+    "segy/rawTraceHeaders npz": ("GET", f"segy/rawTraceHeaders?sdpath={SGY}&start_trace=1&traces_to_dump=100",
+                                 {"headers": {"Accept": "application/x-npz"}}),
+    "segy/rawTraceHeaders ndjson": ("GET", f"segy/rawTraceHeaders?sdpath={SGY}&start_trace=1&traces_to_dump=100",
+                                    {"headers": {"Accept": "application/x-ndjson"}}),
+    "segy/scaledTraceHeaders": ("GET", f"segy/scaledTraceHeaders?sdpath={SGY}&start_trace=1&traces_to_dump=100", {}),
+    "segy/traceHeaderStatistics": ("GET", f"segy/traceHeaderStatistics?sdpath={SGY}", {}),
+    # the trace headers of the integration test file carry no inline and crossline numbers
+    "segy/bingrid": ("GET", f"segy/bingrid?sdpath={SGY}", {}, 422),
+    "openzgy/headers": ("GET", f"openzgy/headers?sdpath={ZGY}", {}),
+    "openzgy/bingrid": ("GET", f"openzgy/bingrid?sdpath={ZGY}", {}),
+    "openzgy/slice": ("GET", f"openzgy/slice?sdpath={ZGY}&axis=time&index=5", {}),
+    "openzgy/transform": ("POST", f"openzgy/transform?sdpath={ZGY}&source=annotation&target=world",
+                          {"json": {"points": [[500 + i % 6, 360 + i // 6] for i in range(36)]}}),
+    "batch/metadata": ("POST", "batch/metadata", {"json": {"sdpaths": [SGY, ZGY]}}),
+}
+
+
+class SdmsStandIn(ThreadingHTTPServer):
+    """Answers every dataset record request with the size of the integration test SEG-Y file."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SdmsHandler)
+        self.record = json.dumps({
+            "name": "integration_test_dataset.sgy", "gcsurl": "load-test/dataset", "generation": 1,
+            "filemetadata": {"size": os.path.getsize(simulated_sdk.SEGY_DATASET), "nobjects": 1}
+        }).encode("utf-8")
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/seistore-svc/api/v3"
+
+
+class SdmsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.record)))
+        self.end_headers()
+        self.wfile.write(self.server.record)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, latency, workers):
+    """Service process: simulated SDKs and SDMS, then uvicorn until SIGTERM."""
+    simulated_sdk.install(latency)
+    sdms = SdmsStandIn()
+    threading.Thread(target=sdms.serve_forever, daemon=True).start()
+    os.environ["SDMS_SERVICE_HOST"] = sdms.url
+    # expected error responses are logged with their traceback, which would swamp the output
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    import uvicorn
+    from core.prefork import PreforkServer, worker_count
+    from main import app
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    if worker_count(workers) == 1:
+        uvicorn.Server(config).run()
+    else:
+        PreforkServer(config, worker_count(workers), 30).run()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The service exited with status {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("The service did not start in time")
+
+
+def load(base_url, method, route, kwargs, total, concurrency, expected_status=200):
+    local = threading.local()
+    url = base_url + route
+    headers = {**HEADERS, **kwargs.get("headers", {})}
+    kwargs = {**kwargs, "headers": headers}
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+            response.content
+            ok = response.status_code == expected_status
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([seconds for seconds, _ in results])
+    return {
+        "requests": total,
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50Ms": float(np.percentile(latencies, 50) * 1000),
+        "p99Ms": float(np.percentile(latencies, 99) * 1000),
+        "requestsPerSecond": total / elapsed,
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the largest waited service process, from the rusage of the children."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sdk-latency", type=float, default=0.005, help="seconds per simulated SDK call")
+    parser.add_argument("--open-latency", type=float, default=0.05, help="seconds to open a simulated dataset")
+    parser.add_argument("--workers", type=int, default=1, help="service worker processes, 0 for one per CPU")
+    parser.add_argument("--routes", help="comma separated subset of " + ", ".join(ROUTES))
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    latency = simulated_sdk.Latency(args.open_latency, args.sdk_latency)
+    if args.serve:
+        serve(args.serve, latency, args.workers)
+        return
+
+    routes = ROUTES if args.routes is None else {name: ROUTES[name.strip()] for name in args.routes.split(",")}
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-m", "benchmark.load_test", "--serve", str(port),
+                                "--sdk-latency", str(args.sdk_latency), "--open-latency", str(args.open_latency),
+                                "--workers", str(args.workers)],
+                               cwd=os.path.join(os.path.dirname(__file__), ".."))
+    try:
+        from core.config import settings
+        base_url = f"http://127.0.0.1:{port}{settings.API_PATH}"
+        wait_until_ready(base_url + "service-status", process)
+        results = {name: load(base_url, *request[:3], args.requests, args.concurrency, *request[3:])
+                   for name, request in routes.items()}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    print(json.dumps({
+        "config": {"requestsPerRoute": args.requests, "concurrency": args.concurrency, "workers": args.workers,
+                   "sdkLatencySeconds": args.sdk_latency, "openLatencySeconds": args.open_latency},
+        "routes": results,
+        "peakRssBytes": peak_rss_bytes(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
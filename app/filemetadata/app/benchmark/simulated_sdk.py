@@ -0,0 +1,195 @@
+"""Stand-ins for the segysdk and openzgycpp modules, replaying the integration test datasets.
+
+install() registers them in sys.modules, so it must run before the service modules are
+imported. Every SDK call sleeps for the configured latency without holding the GIL, the
+way the native libraries wait on remote storage, then answers from the fixtures under
+integration_test/features/data: the SDK JSON documents recorded from segysdk for
+integration_test_dataset.sgy, and the geometry of integration_test_dataset.zgy.
+"""
+import ast
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'integration_test', 'features', 'data')
+SEGY_DATASET = os.path.join(DATA_DIR, 'integration_test_dataset.sgy')
+
+
+class Latency:
+    """Seconds slept by each simulated call, opening a dataset and any other call."""
+
+    def __init__(self, open_seconds=0.0, call_seconds=0.0):
+        self.open_seconds = open_seconds
+        self.call_seconds = call_seconds
+
+    def open(self):
+        if self.open_seconds > 0:
+            time.sleep(self.open_seconds)
+
+    def call(self):
+        if self.call_seconds > 0:
+            time.sleep(self.call_seconds)
+
+
+def _recorded_document(file_name):
+    """segysdk JSON document recorded in a legacy {'header': '<document>'} response fixture."""
+    with open(os.path.join(DATA_DIR, file_name)) as fp:
+        return ast.literal_eval(json.load(fp))['header']
+
+
+class _TraceHeaderDocument:
+    """Recorded trace header document answered for any range of its traces.
+
+    The JSON of every trace is serialized once, so that a call costs a string join
+    rather than a json.dumps the native library does not do in Python.
+    """
+
+    def __init__(self, document):
+        document = json.loads(document)
+        self.metadata = document["Metadata"]
+        self.file_metadata = json.dumps(document.get("metadata", {}))
+        self.traces = [json.dumps(trace) for trace in document["TraceData"]]
+        self.columns = json.dumps(self.metadata["ColumnHeaders"])
+
+    def window(self, start_trace, traces_to_dump):
+        if start_trace < 1 or start_trace - 1 + traces_to_dump > len(self.traces):
+            raise SegyException(f"Traces {start_trace}..{start_trace + traces_to_dump - 1} are out of range")
+        traces = self.traces[start_trace - 1:start_trace - 1 + traces_to_dump]
+        return (f'{{"Metadata": {{"ColumnHeaders": {self.columns}, "StartTrace": {start_trace}, '
+                f'"TraceCount": {traces_to_dump}}}, "TraceData": [{", ".join(traces)}], '
+                f'"metadata": {self.file_metadata}}}')
+
+
+class SegyException(Exception):
+    pass
+
+
+class _SegyFixtures:
+    _lock = threading.Lock()
+    _loaded = None
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._loaded is None:
+                fixtures = types.SimpleNamespace()
+                fixtures.textual = _recorded_document('integration_test_segy_textualHeader_response.json')
+                fixtures.extended = _recorded_document('integration_test_segy_extendedTextualHeaders_response.json')
+                fixtures.binary = _recorded_document('integration_test_segy_binaryHeader_response.json')
+                fixtures.raw = _TraceHeaderDocument(_recorded_document('integration_test_segy_rawTraceHeaders_response.json'))
+                fixtures.scaled = _TraceHeaderDocument(
+                    _recorded_document('integration_test_segy_scaledTraceHeaders_response.json'))
+                cls._loaded = fixtures
+            return cls._loaded
+
+
+class SimulatedSegySession:
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.fixtures = _SegyFixtures.get()
+
+    def get_revision(self):
+        self.latency.call()
+        return 0
+
+    def is_3d(self):
+        self.latency.call()
+        return 1
+
+    def get_trace_header_field_count(self):
+        self.latency.call()
+        return 73
+
+    def get_ascii_headers_as_json(self):
+        self.latency.call()
+        return json.dumps({"Textualheader": self.fixtures.textual})
+
+    def get_extended_ascii_headers_as_json(self):
+        self.latency.call()
+        return self.fixtures.extended
+
+    def get_binary_header_as_json(self):
+        self.latency.call()
+        return self.fixtures.binary
+
+    def get_raw_trace_headers_as_json(self, start_trace, traces_to_dump):
+        self.latency.call()
+        return self.fixtures.raw.window(start_trace, traces_to_dump)
+
+    def get_scaled_trace_headers_as_json(self, start_trace, traces_to_dump):
+        self.latency.call()
+        return self.fixtures.scaled.window(start_trace, traces_to_dump)
+
+    def close(self):
+        pass
+
+
+class ZgyError(Exception):
+    pass
+
+
+class SimulatedZgyReader:
+    """integration_test_dataset.zgy: 6 x 6 traces with 55 m bins, inline 500..505 and crossline 360..365."""
+
+    def __init__(self, latency):
+        latency.open()
+        self.latency = latency
+        self.verid = 'simulated'
+        self.size = (6, 6, 10)
+        self.bricksize = (64, 64, 64)
+        self.datatype = 'SampleDataType.float'
+        self.datarange = (-1.0, 1.0)
+        self.zunitdim = 'UnitDimension.time'
+        self.zunitname = 'ms'
+        self.zunitfactor = 0.001
+        self.zstart = 0.0
+        self.zinc = 4.0
+        self.hunitdim = 'UnitDimension.length'
+        self.hunitname = 'm'
+        self.hunitfactor = 1.0
+        self.annotstart = (500.0, 360.0)
+        self.annotinc = (1.0, 1.0)
+        self.indexcorners = ((0, 0), (5, 0), (0, 5), (5, 5))
+        self.annotcorners = ((500, 360), (505, 360), (500, 365), (505, 365))
+        self.corners = ((1598582.0, -170134.0), (1598582.0, -170409.0),
+                        (1598857.0, -170134.0), (1598857.0, -170409.0))
+        self.nlods = 1
+        self.brickcount = [(1, 1, 1)]
+        self.statistics = (360, 0.0, 120.0, -1.0, 1.0)
+        self.histogram = (360, -1.0, 1.0, [0] * 256)
+
+    def read(self, start, data, lod=0):
+        self.latency.call()
+        data[...] = 0.0
+
+    def close(self):
+        pass
+
+
+def segysdk_module(latency):
+    module = types.ModuleType('segysdk')
+    module.SegyException = SegyException
+
+    def create_session(sdpath, options):
+        latency.open()
+        return SimulatedSegySession(latency)
+
+    module.create_session = create_session
+    module.segy_configure_remote_access = lambda sdms_url, app_key, token: None
+    return module
+
+
+def openzgycpp_module(latency):
+    module = types.ModuleType('openzgycpp')
+    module.ZgyError = ZgyError
+    module.ZgyReader = lambda sdpath, iocontext=None: SimulatedZgyReader(latency)
+    return module
+
+
+def install(latency):
+    sys.modules['segysdk'] = segysdk_module(latency)
+    sys.modules['openzgycpp'] = openzgycpp_module(latency)
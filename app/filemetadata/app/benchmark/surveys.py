@@ -0,0 +1,35 @@
+"""Surveys for comparing core.bingrid with the per-Point ZGYToBinGrid class, shared by its benchmark and unit tests."""
+import numpy as np
+
+from benchmark.legacy_bingrid import Line, Point, ZGYToBinGrid
+
+# survey of the integration test dataset: 6 x 6 bins of 55 m, crossline axis pointing east
+CORNERS = [(1598582.0, -170134.0), (1598582.0, -170409.0), (1598857.0, -170134.0), (1598857.0, -170409.0)]
+ANNOT_CORNERS = [(500.0, 360.0), (505.0, 360.0), (500.0, 365.0), (505.0, 365.0)]
+ANNOT_INC = (1.0, 1.0)
+SIZE = (6, 6)
+
+
+def legacy_bingrid(corners, annotcorners, annotinc, size):
+    points = [Point(0, 0, annot[0], annot[1], corner[0], corner[1]) for corner, annot in zip(corners, annotcorners)]
+    inline = Line(annotcorners[0][0], annotinc[0], size[0])
+    xline = Line(annotcorners[0][1], annotinc[1], size[1])
+    return ZGYToBinGrid(points[0], points[1], points[2], points[3], inline, xline).getValusAsJson()
+
+
+def random_surveys(count, seed=0):
+    rng = np.random.default_rng(seed)
+    origin = rng.uniform(-1e6, 1e6, (count, 2))
+    angle = rng.uniform(0, 2 * np.pi, count)
+    size = rng.integers(2, 5000, (count, 2))
+    width = rng.choice([6.25, 12.5, 25.0, 55.0], (count, 2))
+    handedness = rng.choice([-1.0, 1.0], count)
+    i_axis = np.stack([np.cos(angle), np.sin(angle)], axis=1) * (width[:, 0] * (size[:, 0] - 1))[:, None]
+    j_axis = np.stack([-np.sin(angle), np.cos(angle)], axis=1) * (handedness * width[:, 1] * (size[:, 1] - 1))[:, None]
+    corners = np.stack([origin, origin + i_axis, origin + j_axis, origin + i_axis + j_axis], axis=1)
+    annotstart = rng.integers(1, 3000, (count, 2)).astype(np.float64)
+    annotinc = rng.choice([1.0, 2.0, 4.0], (count, 2))
+    annotend = annotstart + annotinc * (size - 1)
+    annotcorners = np.stack([annotstart, np.stack([annotend[:, 0], annotstart[:, 1]], axis=1),
+                             np.stack([annotstart[:, 0], annotend[:, 1]], axis=1), annotend], axis=1)
+    return corners, annotcorners, annotinc, size
@@ -0,0 +1,98 @@
+import json
+import math
+
+import numpy as np
+
+# P6 bin grid attributes in the order they are reported
+P6_FIELDS = [
+    "P6BinGridOriginI",
+    "P6BinGridOriginJ",
+    "P6BinGridOriginEasting",
+    "P6BinGridOriginNorthing",
+    "P6BinNodeIncrementOnIaxis",
+    "P6BinNodeIncrementOnJaxis",
+    "P6BinWidthOnIaxis",
+    "P6BinWidthOnJaxis",
+    "P6TransformationMethod",
+    "P6MapGridBearingOfBinGridJaxis",
+    "BinGridLocalCoordinates",
+]
+
+# EPSG transformation codes of a right-handed and a left-handed bin grid
+TRANSFORMATION_RIGHT_HANDED = 9666
+TRANSFORMATION_LEFT_HANDED = 1049
+
+
+class BinGrid:
+    """P6 description of one survey's bin grid."""
+
+    __slots__ = tuple(P6_FIELDS)
+
+    def __init__(self, *values):
+        for name, value in zip(P6_FIELDS, values):
+            setattr(self, name, value)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in P6_FIELDS}
+
+    def as_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+
+def _norm(v):
+    return np.sqrt(v[..., 0] ** 2 + v[..., 1] ** 2)
+
+
+def _dot(a, b):
+    return a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1]
+
+
+def compute_bingrids(corners, annotcorners, annotinc, size):
+    """Compute the bin grids of n surveys at once.
+
+    corners and annotcorners are (n, 4, 2) arrays with the world and annotation
+    coordinates of the corners in ZgyReader order: first inline/first crossline,
+    last inline/first crossline, first inline/last crossline, last inline/last
+    crossline. annotinc and size are (n, 2) arrays of the inline/crossline
+    increments and counts.
+    """
+    corners = np.asarray(corners, dtype=np.float64)
+    annotcorners = np.asarray(annotcorners)
+    annotinc = np.asarray(annotinc)
+    size = np.asarray(size)
+
+    p00, p10, p01, p11 = corners[:, 0], corners[:, 1], corners[:, 2], corners[:, 3]
+    a1, b1 = p10 - p00, p01 - p00
+    a2, b2 = p11 - p01, p11 - p10
+
+    width_i = np.ceil(_norm(a1) / (size[:, 0] - 1))
+    width_j = np.ceil(_norm(b1) / (size[:, 1] - 1))
+    method = np.where(_dot(a1, b2) - _dot(a2, b1) > 0, TRANSFORMATION_RIGHT_HANDED, TRANSFORMATION_LEFT_HANDED)
+    cos_bearing = b1[:, 1] / _norm(b1)
+    clockwise = b1[:, 0] >= 0
+    outline = corners[:, [0, 2, 3, 1, 0]]
+
+    grids = []
+    for n in range(len(corners)):
+        # acos and rounding of the one bearing per survey are left to Python, numpy's
+        # SIMD acos and round can differ from them in the last digit
+        bearing = math.acos(cos_bearing[n]) * 180 / math.pi
+        grids.append(BinGrid(
+            annotcorners[n, 0, 0].item(),
+            annotcorners[n, 0, 1].item(),
+            p00[n, 0].item(),
+            p00[n, 1].item(),
+            annotinc[n, 0].item(),
+            annotinc[n, 1].item(),
+            int(width_i[n]),
+            int(width_j[n]),
+            int(method[n]),
+            round(bearing, 2) if clockwise[n] else round(360 - bearing),
+            [{"X": x, "Y": y} for x, y in outline[n].tolist()],
+        ))
+    return grids
+
+
+def compute_bingrid(corners, annotcorners, annotinc, size):
+    """Bin grid of a single survey, see compute_bingrids."""
+    return compute_bingrids([corners], [annotcorners], [annotinc], [size])[0]
@@ -0,0 +1,46 @@
+import asyncio
+
+from core.config import settings
+from core.metrics import coalesced_requests
+
+
+def route_of(operation):
+    """Route of a metadata operation, e.g. segy/summary for 'segy/summary?fields=revision'."""
+    return operation.split("?", 1)[0]
+
+
+class RequestCoalescer:
+    """Shares one execution between identical concurrent calls.
+
+    Calls with the same key that arrive while an execution is running wait for it and
+    get its result or exception. The execution runs as its own task, so a caller that
+    goes away does not cancel it for the others. Operations of excluded routes always
+    run on their own.
+    """
+
+    def __init__(self, enabled=True, excluded=()):
+        self.enabled = enabled
+        self.excluded = set(excluded)
+        self._running = {}
+
+    async def run(self, key, operation, compute):
+        route = route_of(operation)
+        if not self.enabled or route in self.excluded:
+            return await compute()
+        task = self._running.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._running[key] = task
+            task.add_done_callback(lambda _: self._running.pop(key, None))
+            coalesced_requests.inc(route=route, role="leader")
+        else:
+            coalesced_requests.inc(route=route, role="follower")
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._running)
+
+
+request_coalescer = RequestCoalescer(
+    settings.REQUEST_COALESCING,
+    [route.strip() for route in settings.REQUEST_COALESCING_EXCLUDED.split(",") if route.strip()])
@@ -12,6 +12,87 @@ class Settings:
 
     # This is required for running the service
     SDMS_URL: str = os.getenv('SDMS_SERVICE_HOST')
+    # SDMS requests: keep-alive connections (and requests in flight), retries and their base backoff in seconds
+    SDMS_MAX_CONNECTIONS: int = int(os.getenv('SDMS_MAX_CONNECTIONS', 16))
+    SDMS_RETRIES: int = int(os.getenv('SDMS_RETRIES', 3))
+    SDMS_RETRY_BACKOFF: float = float(os.getenv('SDMS_RETRY_BACKOFF', 0.2))
+    SDMS_TIMEOUT: float = float(os.getenv('SDMS_TIMEOUT', 30))
+
+    # Opened segysdk sessions are reused per (sdpath, caller). Size 0 disables pooling.
+    SEGY_SESSION_POOL_SIZE: int = int(os.getenv('SEGY_SESSION_POOL_SIZE', 64))
+    SEGY_SESSION_IDLE_TTL: float = float(os.getenv('SEGY_SESSION_IDLE_TTL', 300))
+
+    # Opened ZgyReader handles are shared the same way. Size 0 opens a reader per request.
+    ZGY_READER_POOL_SIZE: int = int(os.getenv('ZGY_READER_POOL_SIZE', 32))
+    ZGY_READER_IDLE_TTL: float = float(os.getenv('ZGY_READER_IDLE_TTL', 300))
+    # openzgy/slice and openzgy/subvolume answer 413 to boxes of more samples at the level of detail they read
+    ZGY_VOLUME_MAX_SAMPLES: int = int(os.getenv('ZGY_VOLUME_MAX_SAMPLES', 64 * 1024 * 1024))
+    ZGY_STATISTICS_PARALLELISM: int = int(os.getenv('ZGY_STATISTICS_PARALLELISM', 4))
+    ZGY_STATISTICS_ESTIMATE_RESOLUTION: int = int(os.getenv('ZGY_STATISTICS_ESTIMATE_RESOLUTION', 64))
+
+    # Blocking segysdk/openzgycpp calls run on this many worker threads. Queue size 0 means unbounded.
+    SDK_EXECUTOR_WORKERS: int = int(os.getenv('SDK_EXECUTOR_WORKERS', 16))
+    SDK_EXECUTOR_MAX_QUEUE: int = int(os.getenv('SDK_EXECUTOR_MAX_QUEUE', 0))
+
+    # Trace header dumps: traces per SDK fetch and memory bounds per request
+    TRACE_HEADER_CHUNK_TRACES: int = int(os.getenv('TRACE_HEADER_CHUNK_TRACES', 1000))
+    TRACE_HEADER_CHUNK_BYTES: int = int(os.getenv('TRACE_HEADER_CHUNK_BYTES', 8 * 1024 * 1024))
+    TRACE_HEADER_MAX_BUFFERED_TRACES: int = int(os.getenv('TRACE_HEADER_MAX_BUFFERED_TRACES', 100000))
+    # Chunks read concurrently by one request scanning the trace headers of a whole file
+    TRACE_HEADER_SCAN_PARALLELISM: int = int(os.getenv('TRACE_HEADER_SCAN_PARALLELISM', 4))
+    # Traces sampled by segy/bingrid to fit the bin grid, 0 reads all traces. Through segysdk
+    # they are taken from SEGY_BINGRID_SAMPLE_CHUNKS chunks of consecutive traces.
+    SEGY_BINGRID_SAMPLE_TRACES: int = int(os.getenv('SEGY_BINGRID_SAMPLE_TRACES', 1000))
+    SEGY_BINGRID_SAMPLE_CHUNKS: int = int(os.getenv('SEGY_BINGRID_SAMPLE_CHUNKS', 8))
+
+    # Batch metadata extraction: datasets processed concurrently and per request
+    BATCH_MAX_PARALLELISM: int = int(os.getenv('BATCH_MAX_PARALLELISM', 8))
+    BATCH_MAX_ITEMS: int = int(os.getenv('BATCH_MAX_ITEMS', 10000))
+
+    # Metadata write-back into SDMS dataset records: background workers, retries of datasets failing with
+    # a transient status and their base backoff in seconds, seconds finished jobs are kept, and a bound on
+    # the datasets waiting for a worker
+    WRITEBACK_WORKERS: int = int(os.getenv('WRITEBACK_WORKERS', 8))
+    WRITEBACK_RETRIES: int = int(os.getenv('WRITEBACK_RETRIES', 2))
+    WRITEBACK_RETRY_BACKOFF: float = float(os.getenv('WRITEBACK_RETRY_BACKOFF', 1.0))
+    WRITEBACK_JOB_TTL: float = float(os.getenv('WRITEBACK_JOB_TTL', 3600))
+    WRITEBACK_MAX_PENDING: int = int(os.getenv('WRITEBACK_MAX_PENDING', 100000))
+
+    # SEG-Y headers are read with HTTP range requests when this url template is set, e.g.
+    # 'https://storage/{tenant}/{subproject}{path}{name}'. Empty means segysdk reads them.
+    SEGY_RANGE_READ_URL: str = os.getenv('SEGY_RANGE_READ_URL', '')
+    RANGE_READ_MERGE_GAP: int = int(os.getenv('RANGE_READ_MERGE_GAP', 4096))
+    RANGE_READ_CACHE_BYTES: int = int(os.getenv('RANGE_READ_CACHE_BYTES', 1024 * 1024))
+    RANGE_READ_BLOCK_BYTES: int = int(os.getenv('RANGE_READ_BLOCK_BYTES', 1024 * 1024))
+    RANGE_READ_MAX_TRACE_GAP: int = int(os.getenv('RANGE_READ_MAX_TRACE_GAP', 256 * 1024))
+    RANGE_READ_PARALLELISM: int = int(os.getenv('RANGE_READ_PARALLELISM', 8))
+    RANGE_READ_CONNECT_TIMEOUT: float = float(os.getenv('RANGE_READ_CONNECT_TIMEOUT', 5))
+    RANGE_READ_TIMEOUT: float = float(os.getenv('RANGE_READ_TIMEOUT', 30))
+
+    # Metadata results are cached in this SQLite file per dataset version. Empty disables the cache.
+    METADATA_CACHE_PATH: str = os.getenv('METADATA_CACHE_PATH', '')
+    METADATA_CACHE_MAX_BYTES: int = int(os.getenv('METADATA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Identical concurrent metadata requests of one caller, or of any caller on one dataset version when the
+    # metadata cache is enabled, share one execution, except for the comma separated routes listed in
+    # REQUEST_COALESCING_EXCLUDED, e.g. 'segy/bingrid,openzgy/headers'
+    REQUEST_COALESCING: bool = os.getenv('REQUEST_COALESCING', 'true').lower() == 'true'
+    REQUEST_COALESCING_EXCLUDED: str = os.getenv('REQUEST_COALESCING_EXCLUDED', '')
+
+    # segysdk and openzgycpp are imported on first use, or in the background right after
+    # startup when NATIVE_WARM_UP is true
+    NATIVE_WARM_UP: bool = os.getenv('NATIVE_WARM_UP', 'true').lower() == 'true'
+
+    # Worker processes forked by main.py after importing the SDKs, 0 means one per CPU. Stopping workers
+    # finish the requests they are handling for at most GRACEFUL_SHUTDOWN_TIMEOUT seconds.
+    WORKERS: int = int(os.getenv('WORKERS', 1))
+    GRACEFUL_SHUTDOWN_TIMEOUT: float = float(os.getenv('GRACEFUL_SHUTDOWN_TIMEOUT', 30))
+    # Directory through which the workers share their metrics, a temporary one when empty
+    METRICS_DIR: str = os.getenv('METRICS_DIR', '')
+
+    # Shape of header responses when the request has no json_format: 'legacy' keeps SDK JSON as strings
+    # inside the response, 'native' returns it as JSON objects.
+    JSON_FORMAT: str = os.getenv('JSON_FORMAT', 'legacy')
 
 
 settings = Settings()
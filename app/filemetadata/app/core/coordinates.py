@@ -0,0 +1,50 @@
+import numpy as np
+
+INDEX = "index"
+ANNOTATION = "annotation"
+WORLD = "world"
+COORDINATE_SYSTEMS = [INDEX, ANNOTATION, WORLD]
+
+# points travel as little endian float64 (x, y) pairs in binary requests and responses
+POINT_DTYPE = np.dtype("<f8")
+
+
+class SurveyCorners:
+    """The four corners of a survey in index (i, j), annotation (inline, crossline) and world coordinates."""
+
+    def __init__(self, indexcorners, annotcorners, corners):
+        self.corners = {
+            INDEX: np.asarray(indexcorners, dtype=np.float64),
+            ANNOTATION: np.asarray(annotcorners, dtype=np.float64),
+            WORLD: np.asarray(corners, dtype=np.float64),
+        }
+
+    def affine(self, source, target):
+        """3 x 2 matrix M such that [x, y, 1] @ M maps source to target coordinates.
+
+        It is the least squares fit over the four corners, which is exact for the
+        affine grids ZGY describes.
+        """
+        design = np.hstack([self.corners[source], np.ones((4, 1))])
+        matrix, _, _, _ = np.linalg.lstsq(design, self.corners[target], rcond=None)
+        return matrix
+
+    def transform(self, points, source, target):
+        """Transform an (n, 2) array of points; the result is a new (n, 2) float64 array."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if source == target:
+            return points.copy()
+        matrix = self.affine(source, target)
+        result = points @ matrix[:2]
+        result += matrix[2]
+        return result
+
+
+def decode_points(raw):
+    if len(raw) % (2 * POINT_DTYPE.itemsize):
+        raise ValueError(f"Binary points must be pairs of {POINT_DTYPE.itemsize} byte floats, got {len(raw)} bytes")
+    return np.frombuffer(raw, dtype=POINT_DTYPE).reshape(-1, 2)
+
+
+def encode_points(points):
+    return np.ascontiguousarray(points, dtype=POINT_DTYPE).tobytes()
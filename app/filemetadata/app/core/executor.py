@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+from core.config import settings
+from core.metrics import sdk_executor_active, sdk_executor_queued, sdk_executor_rejections
+
+
+class SdkExecutor:
+    """Bounded thread pool for blocking segysdk/openzgycpp calls.
+
+    Handlers await run() so that a slow remote read only occupies a worker thread,
+    never the event loop. When max_queue is set, calls that would wait behind more
+    than max_queue others are rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, max_workers, max_queue=0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.max_queue > 0 and self.queued >= self.max_queue:
+                sdk_executor_rejections.inc()
+                raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail="SDK executor queue is full")
+            self.queued += 1
+            sdk_executor_queued.inc()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sdk")
+            pool = self._pool
+        future = pool.submit(self._call, fn, args)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    async def reduce(self, fn, calls, merge, initial, parallelism):
+        """Merge fn(*args) for every args of calls into initial, in completion order.
+
+        At most parallelism calls are submitted at a time and each result is merged
+        as soon as it is ready, so results never pile up. Once a call fails, or the
+        caller is cancelled, no further call starts and the calls already running
+        are waited for, so the objects they use can be released right after.
+        """
+        calls = iter(calls)
+        result = initial
+        stopped = False
+
+        async def worker():
+            nonlocal result, stopped
+            for args in calls:
+                if stopped:
+                    return
+                try:
+                    value = await self.run(fn, *args)
+                    result = merge(result, value)
+                except BaseException:
+                    stopped = True
+                    raise
+
+        workers = asyncio.gather(*(worker() for _ in range(max(parallelism, 1))), return_exceptions=True)
+        try:
+            outcomes = await asyncio.shield(workers)
+        except asyncio.CancelledError:
+            stopped = True
+            await workers
+            raise
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return result
+
+    def _call(self, fn, args):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            sdk_executor_queued.dec()
+            sdk_executor_active.inc()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                sdk_executor_active.dec()
+
+    def _on_done(self, future):
+        # a call cancelled while still waiting in the queue never reaches _call
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+                sdk_executor_queued.dec()
+
+    def stats(self):
+        return {"workers": self.max_workers, "active": self.active, "queued": self.queued}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+sdk_executor = SdkExecutor(settings.SDK_EXECUTOR_WORKERS, settings.SDK_EXECUTOR_MAX_QUEUE)
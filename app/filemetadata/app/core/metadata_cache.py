@@ -0,0 +1,120 @@
+import json
+import sqlite3
+import threading
+import time
+
+from core.coalescing import request_coalescer
+from core.config import settings
+from core.executor import sdk_executor
+from core.sdms_client import sdms_client
+from core.session_pool import caller_identity
+
+
+class MetadataCache:
+    """Persistent cache of metadata results in an SQLite file.
+
+    Entries are keyed by sdpath and operation and carry the fingerprint of the
+    dataset version they were computed from, so a rewritten dataset misses and its
+    entry is replaced. When the stored values exceed max_bytes, the least recently
+    used entries are evicted. An empty path disables the cache.
+    """
+
+    def __init__(self, path, max_bytes, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "sdpath TEXT NOT NULL, operation TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (sdpath, operation))")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata (last_used)")
+        return self._connection
+
+    def get(self, sdpath, operation, fingerprint):
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute("SELECT value FROM metadata WHERE sdpath = ? AND operation = ? AND fingerprint = ?",
+                                     (sdpath, operation, fingerprint)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute("UPDATE metadata SET last_used = ? WHERE sdpath = ? AND operation = ?",
+                               (self.clock(), sdpath, operation))
+            self.hits += 1
+            return row[0]
+
+    def put(self, sdpath, operation, fingerprint, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            connection = self._connect()
+            # one write transaction, as worker processes may share the file
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                                   (sdpath, operation, fingerprint, value, size, self.clock()))
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+                while total > self.max_bytes:
+                    oldest = connection.execute(
+                        "SELECT sdpath, operation, size FROM metadata ORDER BY last_used LIMIT 1").fetchone()
+                    connection.execute("DELETE FROM metadata WHERE sdpath = ? AND operation = ?", oldest[:2])
+                    total -= oldest[2]
+                    self.evictions += 1
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+metadata_cache = MetadataCache(settings.METADATA_CACHE_PATH, settings.METADATA_CACHE_MAX_BYTES)
+
+
+async def cached_metadata(sdpath, bearer, api_key, operation, compute):
+    """Return the JSON serializable result of awaiting compute(), from the cache when possible.
+
+    With the cache enabled, the dataset record is read from SDMS with the caller's
+    credentials on every call, which checks this caller's access and yields the
+    current dataset fingerprint; concurrent calls for the same operation on the
+    same version of a dataset then share one execution, whoever their callers are.
+    Without it, SDMS is not called and only concurrent calls of the same caller
+    share an execution, compute() checking that caller's access itself.
+    """
+    if not metadata_cache.enabled:
+        return await request_coalescer.run((sdpath, caller_identity(bearer, api_key), operation), operation, compute)
+    fingerprint = (await sdms_client.get_descriptor(sdpath, bearer, api_key)).fingerprint
+    return await request_coalescer.run((sdpath, fingerprint, operation), operation,
+                                       lambda: _cached_metadata(sdpath, operation, fingerprint, compute))
+
+
+async def _cached_metadata(sdpath, operation, fingerprint, compute):
+    value = await sdk_executor.run(metadata_cache.get, sdpath, operation, fingerprint)
+    if value is not None:
+        return json.loads(value)
+    result = await compute()
+    await sdk_executor.run(metadata_cache.put, sdpath, operation, fingerprint, json.dumps(result))
+    return result
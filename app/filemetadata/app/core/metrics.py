@@ -0,0 +1,355 @@
+import bisect
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition format, https://prometheus.io/docs/instrumenting/exposition_formats/
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a cached metadata lookup up to a full trace header scan of a large file
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labelnames) or 'none'}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self, values=None):
+        """Text exposition of the values of this metric, or of values merged from snapshots."""
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            samples = sorted((self._values if values is None else values).items())
+            lines.extend(self._render_sample(key, value) for key, value in samples)
+        return "\n".join(lines)
+
+    def snapshot(self):
+        """JSON serializable [label values, value] pairs of this metric."""
+        with self._lock:
+            return [[list(key), self._dump_value(value)] for key, value in self._values.items()]
+
+    def merge(self, values, snapshot):
+        """Add the values of a snapshot to values, a dict by label values."""
+        for key, value in snapshot:
+            key = tuple(key)
+            values[key] = self._merge_value(values.get(key), value)
+
+    def _dump_value(self, value):
+        return value
+
+    def _merge_value(self, total, value):
+        return value if total is None else total + value
+
+    def _render_sample(self, key, value):
+        return f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = _HistogramValue(len(self.buckets))
+            if index < len(self.buckets):
+                histogram.buckets[index] += 1
+            histogram.count += 1
+            histogram.total += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        histogram = self._values.get(self._key(labels))
+        return histogram.count if histogram else 0
+
+    def _dump_value(self, histogram):
+        return [list(histogram.buckets), histogram.count, histogram.total]
+
+    def _merge_value(self, total, value):
+        buckets, count, amount = value
+        if total is None:
+            total = _HistogramValue(len(self.buckets))
+        total.buckets = [a + b for a, b in zip(total.buckets, buckets)]
+        total.count += count
+        total.total += amount
+        return total
+
+    def _render_sample(self, key, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, histogram.buckets):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+        lines.append(f"{self.name}_bucket{labels} {histogram.count}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(histogram.total)}")
+        lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return "\n".join(lines)
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render_snapshots(self, snapshots):
+        """Text exposition of the sum of (snapshot, live) pairs; gauges only sum the live ones."""
+        texts = []
+        for metric in self._metrics:
+            values = {}
+            for snapshot, live in snapshots:
+                if live or metric.kind != "gauge":
+                    metric.merge(values, snapshot.get(metric.name, []))
+            texts.append(metric.render(values))
+        return "\n".join(texts) + "\n"
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsDirectory:
+    """Sums the metrics of the prefork workers, which share them through the files of a directory.
+
+    Once open() was called in the supervisor, every worker writes the snapshot of
+    its registry to <pid>.json in the directory every interval seconds, from a
+    thread started by the first request it serves, and the metrics endpoint of any
+    worker returns the sum over all the files, its own snapshot being written
+    first. The values of the other workers are thus up to interval seconds old.
+    Counters and histograms of workers that exited stay in the sum, so that they
+    never decrease; gauges only count the workers still running.
+    """
+
+    def __init__(self, registry, interval=1.0):
+        self.registry = registry
+        self.interval = interval
+        self.path = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def open(self, path):
+        """Share the metrics of the processes forked from now on through path, emptied of older snapshots."""
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith(".json"):
+                os.remove(os.path.join(path, name))
+        self.path = path
+
+    def start(self):
+        if self.path is None or self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid != os.getpid():
+                self._writer_pid = os.getpid()
+                threading.Thread(target=self._write_periodically, name="metrics", daemon=True).start()
+
+    def _write_periodically(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                logging.warning("Could not write the metrics to %s", self.path, exc_info=True)
+
+    def write(self):
+        path = os.path.join(self.path, f"{os.getpid()}.json")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(temporary, path)
+
+    def render(self):
+        self.write()
+        snapshots = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append((snapshot, _process_alive(int(name[:-len(".json")]))))
+        return self.registry.render_snapshots(snapshots)
+
+
+registry = Registry()
+metrics_directory = MetricsDirectory(registry)
+
+http_request_duration = registry.register(Histogram(
+    "filemetadata_http_request_duration_seconds", "Time until the last byte of the response was sent",
+    ["method", "route"]))
+http_requests_in_flight = registry.register(Gauge(
+    "filemetadata_http_requests_in_flight", "Requests being handled", ["method", "route"]))
+http_request_errors = registry.register(Counter(
+    "filemetadata_http_request_errors_total", "Responses with a 4xx or 5xx status", ["method", "route", "status"]))
+segy_session_create_duration = registry.register(Histogram(
+    "filemetadata_segy_session_create_duration_seconds", "Time to get a SEG-Y session, from the pool or newly opened"))
+sdk_call_duration = registry.register(Histogram(
+    "filemetadata_sdk_call_duration_seconds", "Duration of segysdk and openzgycpp calls", ["library", "call"]))
+sdk_call_errors = registry.register(Counter(
+    "filemetadata_sdk_call_errors_total", "segysdk and openzgycpp calls that raised", ["library", "call"]))
+response_encoding_duration = registry.register(Histogram(
+    "filemetadata_response_encoding_duration_seconds", "Time to encode response bodies", ["format"]))
+coalesced_requests = registry.register(Counter(
+    "filemetadata_coalesced_requests_total",
+    "Metadata requests that ran an execution (leader) or shared a running one (follower)", ["route", "role"]))
+sdms_request_duration = registry.register(Histogram(
+    "filemetadata_sdms_request_duration_seconds", "Duration of SDMS requests, one per attempt", ["method", "status"]))
+sdms_request_retries = registry.register(Counter(
+    "filemetadata_sdms_request_retries_total", "SDMS requests sent again after an error", ["method"]))
+writeback_items = registry.register(Counter(
+    "filemetadata_writeback_items_total", "Datasets whose metadata write-back completed, by outcome", ["status"]))
+writeback_pending = registry.register(Gauge(
+    "filemetadata_writeback_pending", "Datasets queued or being written back"))
+sdk_executor_queued = registry.register(Gauge(
+    "filemetadata_sdk_executor_queued", "SDK calls waiting for an executor thread"))
+sdk_executor_active = registry.register(Gauge(
+    "filemetadata_sdk_executor_active", "SDK calls running on an executor thread"))
+sdk_executor_rejections = registry.register(Counter(
+    "filemetadata_sdk_executor_rejections_total", "SDK calls refused with 503 because the executor queue was full"))
+
+
+def timed_sdk_call(library, call, fn, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        sdk_call_errors.inc(library=library, call=call)
+        raise
+    finally:
+        sdk_call_duration.observe(time.perf_counter() - start, library=library, call=call)
+
+
+class TimedSdkObject:
+    """Proxy of an SDK session or reader that times every method called on it.
+
+    Attributes that are not callable are returned as they are.
+    """
+
+    def __init__(self, target, library):
+        self._target = target
+        self._library = library
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def timed(*args, **kwargs):
+            return timed_sdk_call(self._library, name, value, *args, **kwargs)
+        return timed
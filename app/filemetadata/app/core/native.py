@@ -0,0 +1,98 @@
+import importlib
+import logging
+import threading
+import time
+
+# imported on first use or by warm_up(), so that the service answers before they are loaded
+NATIVE_MODULES = ("segysdk", "openzgycpp")
+
+
+class NativeModules:
+    """Imports the native SDK modules on demand and records their state and import time."""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.states = {name: "cold" for name in self.names}
+        self.seconds = {}
+        self._locks = {name: threading.Lock() for name in self.names}
+        self._lock = threading.Lock()
+        self._warm_up = None
+
+    def load(self, name):
+        with self._locks[name]:
+            if self.states[name] == "warm":
+                return importlib.import_module(name)
+            self.states[name] = "loading"
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(name)
+            except BaseException:
+                self.states[name] = "failed"
+                raise
+            self.seconds[name] = time.perf_counter() - start
+            self.states[name] = "warm"
+            return module
+
+    def load_all(self):
+        for name in self.names:
+            self.load(name)
+
+    def warm_up(self):
+        """Import the modules in a background thread."""
+        def run():
+            for name in self.names:
+                try:
+                    self.load(name)
+                except Exception:
+                    logging.exception("Failed to load %s", name)
+
+        with self._lock:
+            if self._warm_up is None:
+                self._warm_up = threading.Thread(target=run, name="native-warm-up", daemon=True)
+                self._warm_up.start()
+
+    @property
+    def warm(self):
+        return all(state == "warm" for state in self.states.values())
+
+    def status(self):
+        return {
+            "status": "warm" if self.warm else "cold",
+            "modules": {name: {"state": state, "importSeconds": self.seconds.get(name)}
+                        for name, state in self.states.items()},
+        }
+
+
+native_modules = NativeModules(NATIVE_MODULES)
+
+
+class LazyModule:
+    """Stands for a module that is imported through native_modules on first attribute access."""
+
+    def __init__(self, name, modules=None):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_modules", modules or native_modules)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            module = self._modules.load(self._name)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
@@ -0,0 +1,103 @@
+import logging
+import os
+import signal
+import time
+
+import uvicorn
+
+logger = logging.getLogger("filemetadata.prefork")
+
+
+def worker_count(workers):
+    """workers, or the number of CPUs this process may run on when workers is 0."""
+    if workers > 0:
+        return workers
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class PreforkServer:
+    """Serves an application from several forked uvicorn worker processes on one listening socket.
+
+    The application, and with it segysdk and openzgycpp, is imported once in the
+    supervisor and inherited by the workers. Nothing may start threads or open
+    connections before the fork: the SDK executor, range read pool and metadata
+    cache connection are created lazily in each worker. Workers that die are
+    replaced. On SIGTERM or SIGINT every worker stops accepting connections and
+    finishes the requests it is handling; workers still busy after drain_timeout
+    seconds are killed.
+    """
+
+    def __init__(self, config, workers, drain_timeout, poll_interval=0.5):
+        self.config = config
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.poll_interval = poll_interval
+        self.pids = set()
+        self.should_exit = False
+
+    def run(self):
+        self.config.load()
+        socket = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+        logger.info("Starting %d workers", self.workers)
+        try:
+            while not self.should_exit:
+                while len(self.pids) < self.workers and not self.should_exit:
+                    self._spawn(socket)
+                self._reap()
+                time.sleep(self.poll_interval)
+        finally:
+            self._drain()
+            socket.close()
+
+    def _handle_exit(self, signum, frame):
+        self.should_exit = True
+
+    def _spawn(self, socket):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                uvicorn.Server(self.config).run(sockets=[socket])
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                status = 1
+            finally:
+                os._exit(status)
+        self.pids.add(pid)
+
+    def _reap(self):
+        for pid in list(self.pids):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if done:
+                self.pids.discard(pid)
+                if not self.should_exit:
+                    logger.warning("Worker %d exited with status %d, starting a new one", pid, status)
+
+    def _signal_workers(self, signum):
+        for pid in self.pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def _drain(self):
+        self._signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_timeout
+        while self.pids and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        if self.pids:
+            logger.warning("Killing %d workers still busy after %s seconds", len(self.pids), self.drain_timeout)
+            self._signal_workers(signal.SIGKILL)
+            while self.pids:
+                self._reap()
+                time.sleep(0.05)
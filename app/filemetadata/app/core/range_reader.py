@@ -0,0 +1,146 @@
+import bisect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from core.config import settings
+
+_fetch_pool = None
+_fetch_pool_lock = threading.Lock()
+
+
+def _get_fetch_pool():
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=settings.RANGE_READ_PARALLELISM, thread_name_prefix="range")
+        return _fetch_pool
+
+
+def merge_ranges(ranges, max_gap, max_length=None):
+    """Sort (offset, length) ranges and merge those that overlap or are at most max_gap bytes apart.
+
+    A merged range is not grown past max_length bytes; a single longer range is kept whole.
+    """
+    merged = []
+    for offset, length in sorted(ranges):
+        end = offset + length
+        if merged and offset - merged[-1][1] <= max_gap and \
+                (max_length is None or max(merged[-1][1], end) - merged[-1][0] <= max_length):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([offset, end])
+    return [(start, end - start) for start, end in merged]
+
+
+class RangeReader:
+    """Reads byte ranges of one remote object with HTTP range GETs.
+
+    Requested ranges are merged when they are close to each other, up to
+    block_bytes per request, the merged requests are issued in parallel and
+    their content is kept in a small LRU cache of fetched blocks, so only header
+    regions ever leave the object store. A store answering anything but 206
+    Partial Content fails the read rather than sending the whole object, and every
+    request gives up after timeout, a (connect, read) pair of seconds. Cached
+    blocks never contain one another, which keeps their ends in the order of
+    their offsets and lets a lookup bisect the sorted offsets.
+    """
+
+    def __init__(self, url, headers=None, merge_gap=None, cache_bytes=None, block_bytes=None, timeout=None,
+                 http=None):
+        self.url = url
+        self.headers = headers or {}
+        self.merge_gap = settings.RANGE_READ_MERGE_GAP if merge_gap is None else merge_gap
+        self.cache_bytes = settings.RANGE_READ_CACHE_BYTES if cache_bytes is None else cache_bytes
+        self.block_bytes = settings.RANGE_READ_BLOCK_BYTES if block_bytes is None else block_bytes
+        self.timeout = (settings.RANGE_READ_CONNECT_TIMEOUT, settings.RANGE_READ_TIMEOUT) if timeout is None else timeout
+        self.http = http or requests.Session()
+        self.requests = 0
+        self.bytes_transferred = 0
+        self._size = None
+        self._blocks = OrderedDict()
+        self._offsets = []
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def size(self):
+        if self._size is None:
+            response = self.http.head(self.url, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            self._size = int(response.headers["Content-Length"])
+        return self._size
+
+    def read(self, offset, length):
+        return self.read_ranges([(offset, length)])[0]
+
+    def read_ranges(self, ranges, merge_gap=None):
+        """The bytes of each (offset, length) range; merge_gap widens the reader's own gap for this call."""
+        result = [self._cached(offset, length) for offset, length in ranges]
+        missing = [r for r, data in zip(ranges, result) if data is None]
+        if not missing:
+            return result
+        merged = merge_ranges(missing, max(self.merge_gap, merge_gap or 0), self.block_bytes)
+        if len(merged) == 1:
+            blocks = [self._fetch(*merged[0])]
+        else:
+            blocks = list(_get_fetch_pool().map(lambda block: self._fetch(*block), merged))
+        # slice every range out of the fetched blocks before storing them, as storing may evict any block
+        starts = [start for start, _ in merged]
+        for i, (offset, length) in enumerate(ranges):
+            if result[i] is None:
+                k = bisect.bisect_right(starts, offset) - 1
+                result[i] = blocks[k][offset - starts[k]:offset - starts[k] + length]
+        for start, data in zip(starts, blocks):
+            self._store(start, data)
+        return result
+
+    def _fetch(self, offset, length):
+        headers = {**self.headers, "Range": f"bytes={offset}-{offset + length - 1}"}
+        # streamed, so that the body of a store ignoring the range is never downloaded
+        with self.http.get(self.url, headers=headers, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise IOError(f"Range request to {self.url} answered {response.status_code} instead of 206 Partial Content")
+            data = response.content
+        with self._lock:
+            self.requests += 1
+            self.bytes_transferred += len(data)
+        return data
+
+    def _cached(self, offset, length):
+        with self._lock:
+            k = bisect.bisect_right(self._offsets, offset) - 1
+            if k >= 0:
+                start = self._offsets[k]
+                block = self._blocks[start]
+                if offset + length <= start + len(block):
+                    self._blocks.move_to_end(start)
+                    return block[offset - start:offset - start + length]
+        return None
+
+    def _store(self, offset, data):
+        end = offset + len(data)
+        with self._lock:
+            k = bisect.bisect_right(self._offsets, offset) - 1
+            if k >= 0 and self._offsets[k] + len(self._blocks[self._offsets[k]]) >= end:
+                return
+            # drop the blocks the new one contains, which follow it in offset order
+            i = bisect.bisect_left(self._offsets, offset)
+            while i < len(self._offsets) and self._offsets[i] + len(self._blocks[self._offsets[i]]) <= end:
+                self._cached_bytes -= len(self._blocks.pop(self._offsets.pop(i)))
+            self._offsets.insert(i, offset)
+            self._blocks[offset] = data
+            self._cached_bytes += len(data)
+            while self._cached_bytes > self.cache_bytes and len(self._blocks) > 1:
+                start, evicted = self._blocks.popitem(last=False)
+                del self._offsets[bisect.bisect_left(self._offsets, start)]
+                self._cached_bytes -= len(evicted)
+
+    def close(self):
+        with self._lock:
+            self._blocks.clear()
+            self._offsets.clear()
+            self._cached_bytes = 0
+        self.http.close()
@@ -0,0 +1,29 @@
+import json
+from urllib.parse import quote
+
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from core.config import settings
+from core.sdpath import parse_sdpath
+
+# Parts of an SDMS dataset record that change when the dataset content is rewritten
+FINGERPRINT_FIELDS = ["gcsurl", "ctag", "generation"]
+FINGERPRINT_FILEMETADATA_FIELDS = ["size", "nobjects"]
+
+
+def dataset_url(sdpath, base_url=None, action=None):
+    try:
+        parts = parse_sdpath(sdpath)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
+    action = f"/{action}" if action else ""
+    return (f"{base_url or settings.SDMS_URL}/dataset/tenant/{quote(parts.tenant)}/subproject/{quote(parts.subproject)}"
+            f"/dataset/{quote(parts.name)}{action}?path={quote(parts.path, safe='')}")
+
+
+def dataset_fingerprint(dataset):
+    filemetadata = dataset.get("filemetadata") or {}
+    fingerprint = {field: dataset.get(field) for field in FINGERPRINT_FIELDS}
+    fingerprint.update({field: filemetadata.get(field) for field in FINGERPRINT_FILEMETADATA_FIELDS})
+    return json.dumps(fingerprint, sort_keys=True)
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+from starlette.status import HTTP_502_BAD_GATEWAY
+
+from core.config import settings
+from core.metrics import sdms_request_duration, sdms_request_retries
+from core.sdms import dataset_fingerprint, dataset_url
+
+# statuses of SDMS answers worth another attempt: throttling and unavailable or overloaded backends
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class DatasetDescriptor:
+    """What an SDMS dataset record says about the stored file, read before the file is opened."""
+
+    def __init__(self, record):
+        filemetadata = record.get("filemetadata") or {}
+        self.record = record
+        self.name = record.get("name")
+        self.size = filemetadata.get("size")
+        self.nobjects = filemetadata.get("nobjects")
+        self.generation = record.get("generation")
+
+    @property
+    def fingerprint(self):
+        return dataset_fingerprint(self.record)
+
+    def as_dict(self):
+        return {"name": self.name, "size": self.size, "nobjects": self.nobjects, "generation": self.generation}
+
+
+class SdmsClient:
+    """Async client of the SDMS REST API, used with the caller's credentials.
+
+    Requests go through one keep-alive requests.Session whose connection pool
+    holds max_connections connections, sent from as many dedicated threads, so
+    at most max_connections requests are in flight and SDMS calls never wait
+    behind SDK reads on the SDK executor. Connection errors and throttled or
+    unavailable answers are retried up to retries times, after a random delay of
+    up to backoff * 2 ** attempt seconds. The session and threads are created on
+    first use, so that prefork workers each get their own.
+    """
+
+    def __init__(self, max_connections, retries, backoff, timeout, max_backoff=10.0, base_url=None,
+                 jitter=random.random, sleep=asyncio.sleep):
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.base_url = base_url
+        self.jitter = jitter
+        self.sleep = sleep
+        self._session = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _resources(self):
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections, pool_block=True)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+                self._pool = ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix="sdms")
+            return self._session, self._pool
+
+    async def request(self, method, url, bearer, api_key, json=None):
+        """JSON answer of SDMS, or HTTPException with the status SDMS returned after the last attempt."""
+        session, pool = self._resources()
+        headers = {"Authorization": bearer, "appkey": api_key}
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wrap_future(
+                    pool.submit(session.request, method, url, headers=headers, json=json, timeout=self.timeout))
+            except requests.RequestException as e:
+                status, error = "error", HTTPException(status_code=HTTP_502_BAD_GATEWAY, detail=f"SDMS request failed: {e}")
+            else:
+                if response.ok:
+                    sdms_request_duration.observe(time.perf_counter() - start, method=method, status=str(response.status_code))
+                    return response.json() if response.content else None
+                status, error = str(response.status_code), HTTPException(status_code=response.status_code,
+                                                                         detail=response.text)
+                if response.status_code not in RETRY_STATUSES:
+                    attempt = self.retries
+            sdms_request_duration.observe(time.perf_counter() - start, method=method, status=status)
+            if attempt >= self.retries:
+                raise error
+            sdms_request_retries.inc(method=method)
+            await self.sleep(self.jitter() * min(self.max_backoff, self.backoff * 2 ** attempt))
+            attempt += 1
+
+    async def get_dataset(self, sdpath, bearer, api_key):
+        """The SDMS record of a dataset; SDMS checks the caller's access to it."""
+        return await self.request("GET", dataset_url(sdpath, self.base_url), bearer, api_key)
+
+    async def get_descriptor(self, sdpath, bearer, api_key):
+        return DatasetDescriptor(await self.get_dataset(sdpath, bearer, api_key))
+
+    async def patch_dataset(self, sdpath, bearer, api_key, record, close=None):
+        """Update fields of a dataset record; retrying is safe as long as record holds whole fields.
+
+        close is the session id of a lock to release with the update.
+        """
+        url = dataset_url(sdpath, self.base_url)
+        if close is not None:
+            url += f"&close={quote(str(close), safe='')}"
+        return await self.request("PATCH", url, bearer, api_key, json=record)
+
+    async def lock_dataset(self, sdpath, bearer, api_key):
+        """Write lock a dataset: the record it returns holds the lock's session id in 'sbit'.
+
+        SDMS answers 423 while another session holds a lock on the dataset, and
+        refuses updates from other callers while this one holds it.
+        """
+        url = dataset_url(sdpath, self.base_url, "lock") + "&openmode=write"
+        return await self.request("PUT", url, bearer, api_key)
+
+    async def unlock_dataset(self, sdpath, bearer, api_key):
+        return await self.request("PUT", dataset_url(sdpath, self.base_url, "unlock"), bearer, api_key)
+
+    def close(self):
+        with self._lock:
+            session, pool = self._session, self._pool
+            self._session = self._pool = None
+        if session is not None:
+            pool.shutdown(wait=False)
+            session.close()
+
+
+sdms_client = SdmsClient(settings.SDMS_MAX_CONNECTIONS, settings.SDMS_RETRIES, settings.SDMS_RETRY_BACKOFF,
+                         settings.SDMS_TIMEOUT)
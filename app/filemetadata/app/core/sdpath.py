@@ -0,0 +1,27 @@
+from typing import NamedTuple
+
+SDPATH_PREFIX = "sd://"
+
+
+class SDPath(NamedTuple):
+    tenant: str
+    subproject: str
+    path: str
+    name: str
+
+    @property
+    def dataset_path(self):
+        """Path of the dataset inside the subproject, including its name."""
+        return self.path + self.name
+
+
+def parse_sdpath(sdpath):
+    """Split 'sd://tenant/subproject/a/b/name' into its parts, with path '/a/b/'."""
+    if not sdpath.startswith(SDPATH_PREFIX):
+        raise ValueError(f"Invalid sdpath '{sdpath}', it must start with {SDPATH_PREFIX}")
+    parts = sdpath[len(SDPATH_PREFIX):].split("/")
+    if len(parts) < 3 or not parts[0] or not parts[1] or not parts[-1]:
+        raise ValueError(f"Invalid sdpath '{sdpath}', expected {SDPATH_PREFIX}tenant/subproject/[path/]name")
+    folders = [part for part in parts[2:-1] if part]
+    path = "/" + "".join(folder + "/" for folder in folders)
+    return SDPath(parts[0], parts[1], path, parts[-1])
@@ -0,0 +1,88 @@
+import numpy as np
+
+from core.bingrid import compute_bingrid
+
+# header fields holding the (x, y) coordinates of a trace, by coordinate source
+COORDINATE_FIELDS = {
+    "cdp": ("CdpX", "CdpY"),
+    "source": ("SourceCoordinateX", "SourceCoordinateY"),
+    "receiver": ("ReceiverCoordinateX", "ReceiverCoordinateY"),
+}
+
+
+class BinGridFitError(ValueError):
+    pass
+
+
+def sample_trace_numbers(trace_count, samples):
+    """At most samples 1-based trace numbers spread evenly over the file, first and last trace included."""
+    if samples <= 0 or samples >= trace_count:
+        return np.arange(1, trace_count + 1)
+    return np.unique(np.linspace(1, trace_count, samples).round().astype(np.int64))
+
+
+def sample_trace_chunks(trace_count, chunks, chunk_traces):
+    """(start, count) of chunks runs of chunk_traces consecutive 1-based traces spread evenly over the file.
+
+    The first and last trace are included; the runs cover every trace when chunks
+    is 0 or they would cover the file anyway.
+    """
+    if chunks <= 0 or chunks * chunk_traces >= trace_count:
+        return [(start, min(chunk_traces, trace_count - start + 1)) for start in range(1, trace_count + 1, chunk_traces)]
+    starts = np.unique(np.linspace(1, trace_count - chunk_traces + 1, chunks).round().astype(np.int64))
+    return [(int(start), chunk_traces) for start in starts]
+
+
+def choose_coordinates(coordinates, headers):
+    """The coordinate source to fit and, when auto falls back from CDP X/Y to source X/Y, the reason why."""
+    if coordinates != "auto":
+        return coordinates, None
+    if "CdpX" not in headers:
+        return "source", "The segysdk trace header document has no CDP X/Y"
+    if not (np.any(headers["CdpX"]) or np.any(headers["CdpY"])):
+        return "source", "The CDP X/Y of every sampled trace header are zero"
+    return "cdp", None
+
+
+def _increment(values):
+    steps = np.diff(np.unique(values))
+    return int(np.gcd.reduce(steps)) if len(steps) else 1
+
+
+def fit_bingrid(inline, crossline, x, y):
+    """Fit world = [inline, crossline, 1] @ M to the traces and describe the grid it spans.
+
+    Traces whose line numbers and coordinates are all zero are taken as dead and
+    ignored. Returns the BinGrid, with the survey extent taken from the line
+    numbers seen, and the residuals of the fit in world units.
+    """
+    inline = np.asarray(inline, dtype=np.int64)
+    crossline = np.asarray(crossline, dtype=np.int64)
+    world = np.stack([np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)], axis=1)
+    live = (inline != 0) | (crossline != 0) | (world != 0).any(axis=1)
+    inline, crossline, world = inline[live], crossline[live], world[live]
+
+    design = np.stack([inline, crossline, np.ones(len(inline))], axis=1).astype(np.float64)
+    if len(design) < 3 or np.linalg.matrix_rank(design) < 3:
+        raise BinGridFitError("The trace headers do not span a 3D grid of inlines and crosslines")
+    # centering keeps the normal equations well conditioned with large line numbers and coordinates
+    center = design.mean(axis=0)
+    center[2] = 0
+    matrix, _, _, _ = np.linalg.lstsq(design - center, world, rcond=None)
+    residuals = np.hypot(*((design - center) @ matrix - world).T)
+
+    increments = (_increment(inline), _increment(crossline))
+    first = (int(inline.min()), int(crossline.min()))
+    last = (int(inline.max()), int(crossline.max()))
+    size = ((last[0] - first[0]) // increments[0] + 1, (last[1] - first[1]) // increments[1] + 1)
+    annotcorners = np.array([(first[0], first[1]), (last[0], first[1]), (first[0], last[1]), (last[0], last[1])],
+                            dtype=np.float64)
+    # rounded to a micrometre so that exact grids do not get bin widths like 25.000000001
+    corners = np.round((np.hstack([annotcorners, np.ones((4, 1))]) - center) @ matrix, 6)
+
+    bingrid = compute_bingrid(corners, annotcorners, np.asarray(increments, dtype=np.float64), size)
+    return bingrid, {
+        "Count": len(residuals),
+        "RMS": float(np.sqrt(np.mean(residuals ** 2))),
+        "Maximum": float(residuals.max()),
+    }
@@ -0,0 +1,314 @@
+import functools
+import json
+
+import numpy as np
+
+TEXTUAL_HEADER_SIZE = 3200
+BINARY_HEADER_SIZE = 400
+TRACE_HEADER_SIZE = 240
+FIRST_TRACE_OFFSET = TEXTUAL_HEADER_SIZE + BINARY_HEADER_SIZE
+
+# EBCDIC (code page 037) is a permutation of Latin-1, so one 256 entry table translates it
+EBCDIC_TO_ASCII = np.frombuffer(bytes(range(256)).decode("cp037").encode("latin-1"), dtype=np.uint8)
+
+# (segysdk id, 1-based start byte, width) in the order segysdk reports them. The second
+# 'SampleIntervalField' really is the samples per trace of the original field recording,
+# the name is kept as segysdk reports it.
+BINARY_HEADER_FIELDS = [
+    ("JobIdentificationNumber", 3201, 4),
+    ("LineNumber", 3205, 4),
+    ("ReelNumber", 3209, 4),
+    ("DataTracesPerEnsemble", 3213, 2),
+    ("NumberOfAuxillaryTracesPerEnsemble", 3215, 2),
+    ("SampleInterval", 3217, 2),
+    ("SampleIntervalField", 3219, 2),
+    ("SamplesPerTrace", 3221, 2),
+    ("SampleIntervalField", 3223, 2),
+    ("DataSampleFormatCode", 3225, 2),
+    ("EnsembleFold", 3227, 2),
+    ("TraceSortingCode", 3229, 2),
+    ("VerticalSumCode", 3231, 2),
+    ("SweepFrequencyStart", 3233, 2),
+    ("SweepFrequencyEnd", 3235, 2),
+    ("SweepLength", 3237, 2),
+    ("SweepTypeCode", 3239, 2),
+    ("TraceNumberSweepChannel", 3241, 2),
+    ("SweepTraceTaperLengthStart", 3243, 2),
+    ("SweepTraceTaperLengthEnd", 3245, 2),
+    ("TaperType", 3247, 2),
+    ("CorrelatedDataTraces", 3249, 2),
+    ("BinaryGainRecovered", 3251, 2),
+    ("AmplitudeRecoveryMethod", 3253, 2),
+    ("MeasurementSystem", 3255, 2),
+    ("ImpulseSignalPolarity", 3257, 2),
+    ("VibratorPolarityCode", 3259, 2),
+    ("SEGYFormatRevisionNumber", 3501, 2),
+]
+
+# decoded as well, but not part of the segysdk binary header document
+BINARY_HEADER_LAYOUT_FIELDS = [
+    ("FixedLengthTraceFlag", 3503, 2),
+    ("NumberOfExtendedTextualHeaders", 3505, 2),
+]
+
+TRACE_HEADER_FIELDS = [
+    ("TraceSequenceLine", 1, 4),
+    ("TraceSequenceFile", 5, 4),
+    ("FieldRecordNumber", 9, 4),
+    ("TraceNumberField", 13, 4),
+    ("EnergySourcePointNumber", 17, 4),
+    ("EnsembleNumber", 21, 4),
+    ("TraceNumberEnsemble", 25, 4),
+    ("TraceIdentificationCode", 29, 2),
+    ("NumberVerticallySummedTraces", 31, 2),
+    ("NumberHorizontallyStackedTraces", 33, 2),
+    ("DataUse", 35, 2),
+    ("Offset", 37, 4),
+    ("ReceiverGroupElevation", 41, 4),
+    ("SurfaceElevationAtSource", 45, 4),
+    ("SourceDepthBelowSurface", 49, 4),
+    ("DatumElevationAtReceiverGroup", 53, 4),
+    ("DatumElevationAtSource", 57, 4),
+    ("WaterDepthAtSource", 61, 4),
+    ("WaterDepthArtReceiverGroup", 65, 4),
+    ("ScalarForElevations", 69, 2),
+    ("ScalarForCoordinates", 71, 2),
+    ("SourceCoordinateX", 73, 4),
+    ("SourceCoordinateY", 77, 4),
+    ("ReceiverCoordinateX", 81, 4),
+    ("ReceiverCoordinateY", 85, 4),
+    ("CoordinateUnits", 89, 2),
+    ("WeatheringVelocity", 91, 2),
+    ("SubweatheringVelocity", 93, 2),
+    ("UpholeTimeSource", 95, 2),
+    ("UpholeTimeReceiverGroup", 97, 2),
+    ("StaticCorrectionSource", 99, 2),
+    ("StaticCorrectionReceiverGroup", 101, 2),
+    ("TotalStaticApplied", 103, 2),
+    ("HeaderToTimeBreakLagTime", 105, 2),
+    ("TimeBreakToShotLagTime", 107, 2),
+    ("ShotToRecordingLagTime", 109, 2),
+    ("MuteTimeStart", 111, 2),
+    ("MuteTimeEnd", 113, 2),
+    ("SamplesPerTrace", 115, 2),
+    ("SampleInterval", 117, 2),
+    ("GainTypeInstrument", 119, 2),
+    ("GainConstantInstrument", 121, 2),
+    ("GainInstrumentInitial", 123, 2),
+    ("Correlated", 125, 2),
+    ("SweepFrequencyStart", 127, 2),
+    ("SweepFrequencyEnd", 129, 2),
+    ("SweepLength", 131, 2),
+    ("SweepType", 133, 2),
+    ("SweepTraceTaperLengthStart", 135, 2),
+    ("SweepTraceTaperLengthEnd", 137, 2),
+    ("TaperType", 139, 2),
+    ("AliasFilterFrequency", 141, 2),
+    ("AliasFilterSlope", 143, 2),
+    ("NotchFilterFrequency", 145, 2),
+    ("NotchFilterSlope", 147, 2),
+    ("LowCutFrequency", 149, 2),
+    ("HighCutFrequency", 151, 2),
+    ("LowCutSlope", 153, 2),
+    ("HighCutSlope", 155, 2),
+    ("Year", 157, 2),
+    ("DayOfYear", 159, 2),
+    ("Hour", 161, 2),
+    ("Minute", 163, 2),
+    ("Second", 165, 2),
+    ("TimeBasisCode", 167, 2),
+    ("TraceWeightingFactor", 169, 2),
+    ("GeophoneGroupNumberOfRollSwitchP1", 171, 2),
+    ("GeophoneGroupNumberOfFirstTrace", 173, 2),
+    ("GeophoneGroupNumberOfLastTrace", 175, 2),
+    ("GapSize", 177, 2),
+    ("Overtravel", 179, 2),
+    ("InlineNumber", 189, 4),
+    ("CrosslineNumber", 193, 4),
+]
+
+# SEG-Y rev1 fields segysdk does not report, used for geometry
+TRACE_HEADER_EXTRA_FIELDS = [
+    ("CdpX", 181, 4),
+    ("CdpY", 185, 4),
+    ("ShotPointNumber", 197, 4),
+    ("ShotPointScalar", 201, 2),
+]
+
+# bytes per sample by data sample format code
+SAMPLE_SIZES = {1: 4, 2: 4, 3: 2, 4: 4, 5: 4, 6: 8, 7: 3, 8: 1, 9: 8, 10: 4, 11: 2, 12: 8, 15: 3, 16: 1}
+
+
+def _structured_dtype(fields, base, itemsize, byteorder):
+    names, formats, offsets = [], [], []
+    for name, start, width in fields:
+        # segysdk repeats some ids, the dtype needs unique names
+        unique = name if name not in names else f"{name}_{start}"
+        names.append(unique)
+        formats.append(f"{byteorder}i{width}")
+        offsets.append(start - 1 - base)
+    return np.dtype({"names": names, "formats": formats, "offsets": offsets, "itemsize": itemsize})
+
+
+BINARY_HEADER_DTYPES = {
+    big_endian: _structured_dtype(BINARY_HEADER_FIELDS + BINARY_HEADER_LAYOUT_FIELDS, TEXTUAL_HEADER_SIZE,
+                                  BINARY_HEADER_SIZE, ">" if big_endian else "<")
+    for big_endian in (True, False)
+}
+
+
+@functools.lru_cache(maxsize=64)
+def trace_header_dtype(trace_size=TRACE_HEADER_SIZE, big_endian=True):
+    """Structured dtype of a trace header whose itemsize is the full trace size.
+
+    With itemsize set to header plus samples, a single np.frombuffer over a block
+    of whole traces yields every trace header in it without copying the samples.
+    """
+    return _structured_dtype(TRACE_HEADER_FIELDS + TRACE_HEADER_EXTRA_FIELDS, 0, trace_size,
+                             ">" if big_endian else "<")
+
+
+def is_ebcdic(raw):
+    data = np.frombuffer(raw, dtype=np.uint8)
+    # spaces dominate textual headers: 0x40 in EBCDIC, 0x20 in ASCII
+    return np.count_nonzero(data == 0x40) > np.count_nonzero(data == 0x20)
+
+
+def decode_textual_header(raw):
+    raw = bytes(raw[:TEXTUAL_HEADER_SIZE])
+    if is_ebcdic(raw):
+        return EBCDIC_TO_ASCII[np.frombuffer(raw, dtype=np.uint8)].tobytes().decode("latin-1")
+    return raw.decode("latin-1")
+
+
+class BinaryHeader:
+    """Decoded 400 byte binary header and the trace layout it describes."""
+
+    def __init__(self, values, big_endian):
+        self.values = values
+        self.big_endian = big_endian
+
+    def __getitem__(self, name):
+        return int(self.values[name])
+
+    @property
+    def revision(self):
+        return self["SEGYFormatRevisionNumber"] >> 8
+
+    @property
+    def sample_size(self):
+        return SAMPLE_SIZES.get(self["DataSampleFormatCode"], 4)
+
+    @property
+    def extended_textual_headers(self):
+        if self.revision < 1:
+            return 0
+        return max(self["NumberOfExtendedTextualHeaders"], 0)
+
+    @property
+    def first_trace_offset(self):
+        return FIRST_TRACE_OFFSET + TEXTUAL_HEADER_SIZE * self.extended_textual_headers
+
+    @property
+    def trace_size(self):
+        # samples per trace is unsigned since SEG-Y rev2
+        return TRACE_HEADER_SIZE + self.sample_size * (self["SamplesPerTrace"] & 0xFFFF)
+
+    def trace_offset(self, trace_index):
+        return self.first_trace_offset + trace_index * self.trace_size
+
+    def trace_count(self, file_size):
+        return (file_size - self.first_trace_offset) // self.trace_size
+
+
+def decode_binary_header(raw):
+    """Decode the binary header from the 400 bytes following the textual header.
+
+    Byte order is detected from the data sample format code, which is a small
+    positive number in a well formed header.
+    """
+    raw = raw[:BINARY_HEADER_SIZE]
+    big = np.frombuffer(raw, dtype=BINARY_HEADER_DTYPES[True], count=1)[0]
+    if 0 < int(big["DataSampleFormatCode"]) <= 16:
+        return BinaryHeader(big, True)
+    little = np.frombuffer(raw, dtype=BINARY_HEADER_DTYPES[False], count=1)[0]
+    if 0 < int(little["DataSampleFormatCode"]) <= 16:
+        return BinaryHeader(little, False)
+    return BinaryHeader(big, True)
+
+
+def binary_header_from_json(binary_header_json, extended_textual_headers=0):
+    """Rebuild a BinaryHeader from the segysdk binary header document.
+
+    The document does not carry the layout fields, so the number of extended
+    textual headers, which moves the first trace, is given separately.
+    """
+    values = np.zeros(1, dtype=BINARY_HEADER_DTYPES[True])[0]
+    names = values.dtype.names
+    for unique, header in zip(names, json.loads(binary_header_json)["BinaryHeaders"]):
+        values[unique] = int(header["Value"])
+    values["NumberOfExtendedTextualHeaders"] = extended_textual_headers
+    return BinaryHeader(values, True)
+
+
+def extended_textual_header_count(extended_headers_json):
+    """Number of 3200 byte headers in the segysdk extended textual header document, "{}" when there are none.
+
+    The headers are the entries of the document, or of the list it holds when it is a single list.
+    """
+    document = json.loads(extended_headers_json)
+    entries = list(document.values()) if isinstance(document, dict) else document
+    if len(entries) == 1 and isinstance(entries[0], list):
+        return len(entries[0])
+    return len(entries)
+
+
+def decode_trace_headers(raw, count, trace_size=TRACE_HEADER_SIZE, big_endian=True):
+    """Decode count consecutive trace headers from raw, which starts at a trace header.
+
+    raw may hold whole traces (trace_size = header plus samples) or only the
+    headers packed back to back (trace_size = 240).
+    """
+    return np.frombuffer(raw, dtype=trace_header_dtype(trace_size, big_endian), count=count)
+
+
+def scaled_coordinates(headers, x_field, y_field):
+    """Apply the SEG-Y coordinate scalar: negative values divide, positive values multiply."""
+    scalar = headers["ScalarForCoordinates"].astype(np.float64)
+    factor = np.ones_like(scalar)
+    negative, positive = scalar < 0, scalar > 0
+    factor[negative] = -1.0 / scalar[negative]
+    factor[positive] = scalar[positive]
+    return headers[x_field] * factor, headers[y_field] * factor
+
+
+def _metadata(filename, binary_header):
+    return {"Filenames": [filename], "SegyRevision": binary_header.revision}
+
+
+def textual_header_as_json(raw):
+    return json.dumps({"Textualheader": decode_textual_header(raw)})
+
+
+def binary_header_as_json(binary_header, filename):
+    headers = []
+    for (name, start, width), unique in zip(BINARY_HEADER_FIELDS, binary_header.values.dtype.names):
+        headers.append({"End": start + width - 1, "Id": name, "Start": start,
+                        "Value": float(binary_header.values[unique])})
+    return json.dumps({"BinaryHeaders": headers, "metadata": _metadata(filename, binary_header)})
+
+
+def trace_headers_as_json(trace_headers, start_trace, binary_header, filename):
+    names = [name for name, _, _ in TRACE_HEADER_FIELDS]
+    values = np.stack([trace_headers[name].astype(np.float64) for name in names], axis=1) \
+        if len(trace_headers) else np.empty((0, len(names)))
+    return json.dumps({
+        "Metadata": {
+            "ColumnHeaders": [{"End": start + width - 1, "Id": name, "Start": start}
+                              for name, start, width in TRACE_HEADER_FIELDS],
+            "StartTrace": start_trace,
+            "TraceCount": len(trace_headers)
+        },
+        "TraceData": [{"TraceNo": start_trace + i, "Traces": row} for i, row in enumerate(values.tolist())],
+        "metadata": _metadata(filename, binary_header)
+    })
@@ -0,0 +1,75 @@
+import threading
+
+from core.config import settings
+from core.segy_decoder import (FIRST_TRACE_OFFSET, TEXTUAL_HEADER_SIZE, TRACE_HEADER_FIELDS, TRACE_HEADER_SIZE,
+                               binary_header_as_json, decode_binary_header, decode_trace_headers,
+                               textual_header_as_json, trace_headers_as_json)
+
+
+class RangeReadSegySession:
+    """SEG-Y header access through byte-range reads, with the interface of a segysdk session.
+
+    Only the 3600 byte file header and the 240 byte trace headers are downloaded.
+    Calls this class does not implement are forwarded to a segysdk session, which
+    is opened on first use.
+    """
+
+    def __init__(self, reader, sdpath, open_sdk_session):
+        self.reader = reader
+        self.sdpath = sdpath
+        self._open_sdk_session = open_sdk_session
+        self._sdk_session = None
+        self._binary_header = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        with self._lock:
+            if self._sdk_session is None:
+                self._sdk_session = self._open_sdk_session()
+        return getattr(self._sdk_session, name)
+
+    def file_header(self):
+        # textual and binary header are always fetched together, in one request
+        return self.reader.read(0, FIRST_TRACE_OFFSET)
+
+    def binary_header(self):
+        if self._binary_header is None:
+            self._binary_header = decode_binary_header(self.file_header()[TEXTUAL_HEADER_SIZE:])
+        return self._binary_header
+
+    def get_revision(self):
+        return self.binary_header().revision
+
+    def get_trace_header_field_count(self):
+        return len(TRACE_HEADER_FIELDS)
+
+    def get_ascii_headers_as_json(self):
+        return textual_header_as_json(self.file_header()[:TEXTUAL_HEADER_SIZE])
+
+    def get_binary_header_as_json(self):
+        return binary_header_as_json(self.binary_header(), self.sdpath)
+
+    def get_raw_trace_headers_as_json(self, start_trace, traces_to_dump):
+        binary_header = self.binary_header()
+        count = max(0, min(traces_to_dump, binary_header.trace_count(self.reader.size()) - start_trace + 1))
+        headers = self.read_trace_headers(range(start_trace, start_trace + count))
+        return trace_headers_as_json(headers, start_trace, binary_header, self.sdpath)
+
+    def read_trace_headers(self, trace_numbers):
+        """Decode the headers of the given 1-based traces, CDP coordinates included.
+
+        Headers of traces far apart are read alone; those of consecutive traces
+        whose samples take at most RANGE_READ_MAX_TRACE_GAP bytes are read in
+        blocks together with the samples, saving one request per trace.
+        """
+        binary_header = self.binary_header()
+        ranges = [(binary_header.trace_offset(n - 1), TRACE_HEADER_SIZE) for n in trace_numbers]
+        samples_bytes = binary_header.trace_size - TRACE_HEADER_SIZE
+        merge_gap = samples_bytes if samples_bytes <= settings.RANGE_READ_MAX_TRACE_GAP else None
+        raw = b"".join(self.reader.read_ranges(ranges, merge_gap)) if ranges else b""
+        return decode_trace_headers(raw, len(ranges), TRACE_HEADER_SIZE, binary_header.big_endian)
+
+    def close(self):
+        self.reader.close()
+        if self._sdk_session is not None and hasattr(self._sdk_session, "close"):
+            self._sdk_session.close()
@@ -0,0 +1,259 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# sessions are dropped this many seconds before the bearer token actually expires
+TOKEN_EXPIRY_LEEWAY = 30
+
+
+def caller_identity(bearer, api_key):
+    return hashlib.sha256(f"{api_key}:{bearer}".encode("utf-8")).hexdigest()
+
+
+def token_expiry(bearer):
+    """Return the 'exp' claim of a JWT bearer token, or None if it cannot be read.
+
+    The signature is not verified: SDMS does that on every remote call, the pool
+    only needs to know when to stop reusing a session opened with this token.
+    """
+    try:
+        token = bearer.split()[-1]
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+def close_session(session):
+    close = getattr(session, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            logging.warning("Failed to close pooled session", exc_info=True)
+
+
+class _PooledSession:
+    __slots__ = ("session", "expires_at", "last_used", "refs", "retired")
+
+    def __init__(self, session, expires_at, last_used):
+        self.session = session
+        self.expires_at = expires_at
+        self.last_used = last_used
+        self.refs = 0
+        self.retired = False
+
+
+class SessionLease:
+    """A session checked out of a SessionPool; it is not closed before release() is called.
+
+    Use it as a context manager, or keep it past the handler that acquired it, as
+    streamed responses do, and release it when the last call on the session is done.
+    """
+
+    def __init__(self, session, release=None):
+        self.session = session
+        self._release = release
+
+    def release(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __enter__(self):
+        return self.session
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class StreamedLease:
+    """The lease of a streamed response, whose reads on the session may outlive the stream.
+
+    run() reads on the executor and keeps the read in flight: when the client
+    disconnects the stream is cancelled while an executor thread still uses the
+    session, so close() releases the lease only once that read is done. The
+    stream closes it when it ends, and the response once it was sent, as the
+    stream may be abandoned before it even starts.
+    """
+
+    def __init__(self, lease, executor):
+        self.lease = lease
+        self.executor = executor
+        self._reading = None
+
+    @property
+    def session(self):
+        return self.lease.session
+
+    async def run(self, fn, *args):
+        self._reading = asyncio.ensure_future(self.executor.run(fn, *args))
+        return await asyncio.shield(self._reading)
+
+    async def close(self):
+        reading = self._reading
+        if reading is None or reading.done():
+            self.lease.release()
+        else:
+            reading.add_done_callback(self._release_after)
+
+    def _release_after(self, reading):
+        if not reading.cancelled():
+            reading.exception()
+        self.lease.release()
+
+
+class SerializedSession:
+    """Proxy of a session that is not thread safe, letting one thread at a time call its methods.
+
+    A pooled session is shared by the concurrent requests of its caller, and a
+    request may scan it from several executor threads; the work done on what a
+    call returns still runs in parallel.
+    """
+
+    def __init__(self, target):
+        self._target = target
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def serialized(*args, **kwargs):
+            with self._lock:
+                return value(*args, **kwargs)
+        return serialized
+
+
+class SessionPool:
+    """LRU pool of opened sessions keyed by (sdpath, caller identity).
+
+    A session is reused until it is evicted by the size limit, has been idle for
+    longer than idle_ttl seconds, or the bearer token it was opened with expires.
+    Sessions are leased with acquire() and reference counted: while in use they are
+    evicted last, and an evicted session still in use is closed on its last release.
+    """
+
+    def __init__(self, factory, max_size, idle_ttl, closer=close_session, clock=time.time):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.closer = closer
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def acquire(self, sdpath, bearer, api_key):
+        """Lease a pooled session, opening it when needed; it is not closed before the lease is released."""
+        if self.max_size <= 0:
+            with self._lock:
+                self.misses += 1
+            entry = _PooledSession(self.factory(sdpath, bearer, api_key), None, self.clock())
+            entry.refs, entry.retired = 1, True
+        else:
+            entry = self._checkout(sdpath, bearer, api_key)
+        return SessionLease(entry.session, lambda: self._release(entry))
+
+    def _checkout(self, sdpath, bearer, api_key):
+        key = (sdpath, caller_identity(bearer, api_key))
+        stale = []
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry, now):
+                self._retire(self._entries.pop(key), stale)
+                entry = None
+            if entry is not None:
+                entry.last_used = now
+                entry.refs += 1
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        self._close_all(stale)
+
+        # open outside the lock so a slow handshake does not block other datasets
+        session = self.factory(sdpath, bearer, api_key)
+
+        stale = []
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_expired(entry, now):
+                # another request opened the same session meanwhile, keep the pooled one
+                stale.append(_PooledSession(session, None, now))
+                entry.last_used = now
+                self._entries.move_to_end(key)
+            else:
+                if entry is not None:
+                    self._retire(self._entries.pop(key), stale)
+                expiry = token_expiry(bearer)
+                entry = _PooledSession(session, expiry - TOKEN_EXPIRY_LEEWAY if expiry is not None else None, now)
+                self._entries[key] = entry
+                while len(self._entries) > self.max_size:
+                    # evict the least recently used session nobody is using, if there is one
+                    victim = next((k for k, e in self._entries.items() if e.refs == 0 and k != key),
+                                  next(iter(self._entries)))
+                    self._retire(self._entries.pop(victim), stale)
+            entry.refs += 1
+        self._close_all(stale)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.refs -= 1
+            close = entry.retired and entry.refs == 0
+        if close:
+            self.closer(entry.session)
+
+    def _retire(self, entry, stale):
+        """Take an entry out of use; called with the lock held, after removing it from the pool."""
+        self.evictions += 1
+        entry.retired = True
+        if entry.refs == 0:
+            stale.append(entry)
+
+    def evict_expired(self):
+        stale = []
+        with self._lock:
+            now = self.clock()
+            expired = [key for key, entry in self._entries.items() if self._is_expired(entry, now)]
+            for key in expired:
+                self._retire(self._entries.pop(key), stale)
+        self._close_all(stale)
+        return len(expired)
+
+    def close(self):
+        stale = []
+        with self._lock:
+            for entry in self._entries.values():
+                entry.retired = True
+                if entry.refs == 0:
+                    stale.append(entry)
+            self._entries.clear()
+        self._close_all(stale)
+
+    def _is_expired(self, entry, now):
+        if entry.expires_at is not None and entry.expires_at <= now:
+            return True
+        return self.idle_ttl > 0 and entry.refs == 0 and now - entry.last_used > self.idle_ttl
+
+    def _close_all(self, entries):
+        for entry in entries:
+            self.closer(entry.session)
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+def _value_matrix(trace_headers):
+    """(traces, fields) float64 matrix of the header columns."""
+    columns = [trace_headers.columns[field] for field in trace_headers.field_ids]
+    if not columns:
+        return np.empty((0, 0))
+    return np.stack(columns, axis=1).astype(np.float64, copy=False)
+
+
+class TraceHeaderSummary:
+    """Count, minimum, maximum and sum of every trace header field over a set of traces.
+
+    Summaries of disjoint trace ranges are combined with merge(), so chunks can be
+    reduced independently and in any order.
+    """
+
+    def __init__(self, fields, count, minimum, maximum, total):
+        self.fields = fields
+        self.count = count
+        self.minimum = minimum
+        self.maximum = maximum
+        self.total = total
+
+    @classmethod
+    def empty(cls, fields):
+        n = len(fields)
+        return cls(fields, 0, np.full(n, np.inf), np.full(n, -np.inf), np.zeros(n))
+
+    @classmethod
+    def of(cls, trace_headers):
+        fields = trace_headers.field_ids
+        values = _value_matrix(trace_headers)
+        if len(values) == 0:
+            return cls.empty(fields)
+        return cls(fields, len(values), values.min(axis=0), values.max(axis=0), values.sum(axis=0))
+
+    def merge(self, other):
+        # an empty summary is the identity, whatever its fields
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        return TraceHeaderSummary(self.fields, self.count + other.count, np.minimum(self.minimum, other.minimum),
+                                  np.maximum(self.maximum, other.maximum), self.total + other.total)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.full(len(self.fields), np.nan)
+
+
+def _bin_exponent(low, high, bins):
+    """Smallest exponent e >= 0 per field such that bins of width 2 ** e aligned on 0 hold [low, high] in bins bins."""
+    span = np.maximum(high - low, 1.0)
+    exponent = np.maximum(np.floor(np.log2(span / bins)), 0).astype(np.int64)
+    while True:
+        width = np.exp2(exponent)
+        too_wide = np.floor(high / width) - np.floor(low / width) >= bins
+        if not too_wide.any():
+            return exponent
+        exponent[too_wide] += 1
+
+
+class TraceHeaderHistograms:
+    """Histograms of every trace header field, built in the same single pass as the summary.
+
+    The bins of a field have a power of two width, at least 1 as header values
+    are integers, and are aligned on multiples of it: bin k of exponent e holds
+    [k * 2 ** e, (k + 1) * 2 ** e). Each field uses the smallest width that fits
+    its values in bins bins. merge() brings two histograms to a common width by
+    adding up pairs of bins of the finer one, which is exact since every coarser
+    bin is a union of finer ones, so chunks can be reduced in any order.
+    """
+
+    def __init__(self, bins, count, exponent, first, counts):
+        self.bins = bins
+        self.count = count
+        self.exponent = exponent
+        self.first = first
+        self.counts = counts
+
+    @classmethod
+    def empty(cls, fields, bins):
+        n = len(fields)
+        return cls(bins, 0, np.zeros(n, np.int64), np.zeros(n, np.int64), np.zeros((n, bins), np.int64))
+
+    @classmethod
+    def of(cls, trace_headers, bins):
+        values = _value_matrix(trace_headers)
+        if len(values) == 0:
+            return cls.empty(trace_headers.field_ids, bins)
+        exponent = _bin_exponent(values.min(axis=0), values.max(axis=0), bins)
+        index = np.floor(values / np.exp2(exponent)).astype(np.int64)
+        first = index.min(axis=0)
+        index -= first
+        fields = values.shape[1]
+        index += np.arange(fields) * bins
+        counts = np.bincount(index.ravel(), minlength=fields * bins).reshape(fields, bins)
+        return cls(bins, len(values), exponent, first, counts)
+
+    @property
+    def last(self):
+        """Index of the last non-empty bin of every field."""
+        return self.first + self.bins - 1 - np.argmax(self.counts[:, ::-1] > 0, axis=1)
+
+    def merge(self, other):
+        # an empty histogram is the identity, whatever its fields
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        exponent = np.maximum(self.exponent, other.exponent)
+        while True:
+            first = np.minimum(self.first >> (exponent - self.exponent), other.first >> (exponent - other.exponent))
+            last = np.maximum(self.last >> (exponent - self.exponent), other.last >> (exponent - other.exponent))
+            too_wide = last - first >= self.bins
+            if not too_wide.any():
+                break
+            exponent[too_wide] += 1
+        counts = self._coarsened(exponent, first) + other._coarsened(exponent, first)
+        return TraceHeaderHistograms(self.bins, self.count + other.count, exponent, first, counts)
+
+    def _coarsened(self, exponent, first):
+        """The counts in the bins of the given exponent, starting at bin first of every field."""
+        fields = len(self.first)
+        index = ((self.first[:, None] + np.arange(self.bins)) >> (exponent - self.exponent)[:, None]) - first[:, None]
+        occupied = self.counts > 0
+        index = (index + np.arange(fields)[:, None] * self.bins)[occupied]
+        return np.bincount(index, weights=self.counts[occupied], minlength=fields * self.bins) \
+            .astype(np.int64).reshape(fields, self.bins)
+
+    def as_json(self, n):
+        width = 2 ** int(self.exponent[n])
+        first, last = int(self.first[n]), int(self.last[n])
+        return {'Minimum': first * width, 'Maximum': (last + 1) * width, 'BinWidth': width,
+                'Bins': self.counts[n, :last - first + 1].tolist()}
+
+
+def statistics_as_json(summary, histograms=None):
+    fields = {}
+    mean = summary.mean
+    for n, field in enumerate(summary.fields):
+        statistics = {'Count': summary.count}
+        if summary.count:
+            statistics.update({'Minimum': summary.minimum[n].item(), 'Maximum': summary.maximum[n].item(),
+                               'Mean': mean[n].item()})
+        if histograms is not None and histograms.count:
+            statistics['Histogram'] = histograms.as_json(n)
+        fields[field] = statistics
+    return fields
@@ -0,0 +1,111 @@
+import base64
+import io
+import json
+
+import numpy as np
+import orjson
+
+TRACE_NUMBER_COLUMN = "TraceNo"
+
+_INTEGER_DTYPES = {2: (np.int16, np.int32), 4: (np.int32, np.int64)}
+
+
+class TraceHeaders:
+    """Trace headers returned by segysdk as one typed column per header field."""
+
+    def __init__(self, columns, start_trace, trace_count, metadata=None):
+        self.columns = columns
+        self.start_trace = start_trace
+        self.trace_count = trace_count
+        self.metadata = metadata or {}
+
+    @property
+    def field_ids(self):
+        return [name for name in self.columns if name != TRACE_NUMBER_COLUMN]
+
+
+def _column_dtype(width, values):
+    if width not in _INTEGER_DTYPES or values.size == 0:
+        return np.float64
+    if not np.array_equal(values, np.trunc(values)):
+        return np.float64
+    narrow, wide = _INTEGER_DTYPES[width]
+    info = np.iinfo(narrow)
+    if values.min() >= info.min and values.max() <= info.max:
+        return narrow
+    return wide
+
+
+def parse_trace_headers(header_json, raw=True):
+    """Convert the segysdk trace header JSON document into columns.
+
+    Raw header values are stored with the integer width of their byte range in the
+    trace header (widened when a value does not fit), scaled values as float64.
+    """
+    document = orjson.loads(header_json)
+    metadata = document.get("Metadata", {})
+    column_headers = metadata.get("ColumnHeaders", [])
+    trace_data = document.get("TraceData", [])
+
+    values = np.array([trace["Traces"] for trace in trace_data], dtype=np.float64)
+    values = values.reshape(len(trace_data), len(column_headers))
+
+    columns = {TRACE_NUMBER_COLUMN: np.array([trace["TraceNo"] for trace in trace_data], dtype=np.int64)}
+    for index, column in enumerate(column_headers):
+        column_values = values[:, index]
+        if raw:
+            dtype = _column_dtype(column["End"] - column["Start"] + 1, column_values)
+        else:
+            dtype = np.float64
+        columns[column["Id"]] = np.ascontiguousarray(column_values, dtype=dtype)
+
+    return TraceHeaders(columns, metadata.get("StartTrace"), metadata.get("TraceCount", len(trace_data)),
+                        document.get("metadata"))
+
+
+def to_npz(trace_headers):
+    buffer = io.BytesIO()
+    np.savez(buffer, **trace_headers.columns)
+    return buffer
+
+
+def encode_ndjson(header_json, trace_count=None):
+    """Re-encode a segysdk trace header document as newline delimited JSON.
+
+    When trace_count is given, a first line carries the document metadata with the
+    total number of traces of the stream.
+    """
+    document = orjson.loads(header_json)
+    lines = []
+    if trace_count is not None:
+        metadata = document.get("Metadata", {})
+        lines.append(orjson.dumps({
+            "Metadata": {
+                "ColumnHeaders": metadata.get("ColumnHeaders", []),
+                "StartTrace": metadata.get("StartTrace"),
+                "TraceCount": trace_count
+            },
+            "metadata": document.get("metadata", {})
+        }))
+    for trace in document.get("TraceData", []):
+        lines.append(orjson.dumps(trace))
+    lines.append(b"")
+    return b"\n".join(lines)
+
+
+def encode_cursor(next_trace):
+    return base64.urlsafe_b64encode(json.dumps({"next_trace": next_trace}).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["next_trace"])
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def chunk_trace_count(bytes_per_trace, max_traces, max_bytes):
+    """Number of traces to fetch next so that one chunk stays within max_bytes."""
+    if bytes_per_trace <= 0:
+        return max_traces
+    return max(1, min(max_traces, int(max_bytes // bytes_per_trace)))
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+
+from fastapi import HTTPException
+from starlette.status import (HTTP_401_UNAUTHORIZED, HTTP_423_LOCKED, HTTP_500_INTERNAL_SERVER_ERROR,
+                              HTTP_503_SERVICE_UNAVAILABLE)
+
+from core.metrics import writeback_items, writeback_pending
+from core.sdms_client import RETRY_STATUSES
+from core.session_pool import caller_identity, token_expiry
+
+PENDING = "pending"
+WRITTEN = "written"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+EXPIRED = "expired"
+ITEM_STATUSES = (PENDING, WRITTEN, UNCHANGED, FAILED, EXPIRED)
+
+# a dataset locked by another session is retried as well
+WRITEBACK_RETRY_STATUSES = RETRY_STATUSES | {HTTP_423_LOCKED}
+
+
+class WritebackJob:
+    """Datasets submitted together for write-back, and the outcome of each one as it completes."""
+
+    def __init__(self, job_id, owner, sdpaths, clock=time.time):
+        self.id = job_id
+        self.owner = owner
+        self.clock = clock
+        self.created = clock()
+        self.finished = None
+        self.items = {sdpath: {"sdpath": sdpath, "status": PENDING} for sdpath in sdpaths}
+        self.completed = []
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return len(self.completed) == len(self.items)
+
+    @property
+    def expired(self):
+        """Whether datasets of the job were left alone because the token of the job expired first."""
+        return any(item["status"] == EXPIRED for item in self.completed)
+
+    def complete(self, sdpath, result):
+        self.items[sdpath] = result
+        self.completed.append(result)
+        if self.done:
+            self.finished = self.clock()
+        self._changed.set()
+
+    async def results(self):
+        """NDJSON lines of the item results, as they complete."""
+        sent = 0
+        while True:
+            while sent < len(self.completed):
+                yield (json.dumps(self.completed[sent]) + "\n").encode("utf-8")
+                sent += 1
+            if self.done:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+    def as_dict(self):
+        counts = Counter(item["status"] for item in self.items.values())
+        return {
+            "id": self.id,
+            "status": "done" if self.done else "running",
+            "counts": {status: counts.get(status, 0) for status in ITEM_STATUSES},
+            "items": list(self.items.values()),
+        }
+
+
+class WritebackPipeline:
+    """Extracts file metadata and writes it into the SDMS dataset records, on a pool of background workers.
+
+    submit() queues the datasets of a job and returns at once; the workers extract
+    each dataset's metadata with extract(sdpath, bearer, api_key) -> (type, metadata)
+    and merge it into the record's filemetadata under that type. Write-back is
+    idempotent: records that already hold the same metadata are not patched, and
+    the patch carries the whole filemetadata, so sending it again changes nothing.
+    SDMS replaces the whole filemetadata and has no conditional update, so the
+    record is read and patched under a write lock of the dataset, which keeps
+    other writers out in between. Datasets failing with a transient status, or
+    locked by another session, are retried up to retries times after a random
+    delay of up to backoff * 2 ** attempt seconds. Datasets whose turn comes after
+    the bearer token of their job expired are reported expired without calling
+    SDMS. A job submitted again by the same caller with the same idempotency key
+    is not queued again, unless datasets of that job expired.
+
+    The workers are started by the first submit(), in the event loop of the
+    process serving it, and jobs are kept in that process until job_ttl seconds
+    after they finished.
+    """
+
+    def __init__(self, extract, sdms, workers, retries, backoff, job_ttl, max_pending,
+                 jitter=random.random, sleep=asyncio.sleep, clock=time.time):
+        self.extract = extract
+        self.sdms = sdms
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.job_ttl = job_ttl
+        self.max_pending = max_pending
+        self.jitter = jitter
+        self.sleep = sleep
+        self.clock = clock
+        self.jobs = {}
+        self.pending = 0
+        self._idempotency_keys = {}
+        self._queue = None
+        self._tasks = []
+
+    def submit(self, sdpaths, bearer, api_key, idempotency_key=None):
+        """The job writing back sdpaths, and whether it was created by this call."""
+        self._evict_finished()
+        if self._expired(bearer):
+            raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="The bearer token has expired")
+        owner = caller_identity(bearer, api_key)
+        if idempotency_key is not None:
+            job = self.jobs.get(self._idempotency_keys.get((owner, idempotency_key)))
+            if job is not None and not job.expired:
+                return job, False
+        sdpaths = list(dict.fromkeys(sdpaths))
+        if self.pending + len(sdpaths) > self.max_pending:
+            raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE,
+                                detail=f"More than {self.max_pending} datasets would be waiting for write-back")
+        job = WritebackJob(uuid.uuid4().hex, owner, sdpaths, self.clock)
+        self.jobs[job.id] = job
+        if idempotency_key is not None:
+            self._idempotency_keys[(owner, idempotency_key)] = job.id
+        self._start()
+        for sdpath in sdpaths:
+            self._queue.put_nowait((job, sdpath, bearer, api_key))
+        self._add_pending(len(sdpaths))
+        return job, True
+
+    def get(self, job_id, bearer, api_key):
+        """The job, if it exists and was submitted by this caller."""
+        job = self.jobs.get(job_id)
+        if job is None or job.owner != caller_identity(bearer, api_key):
+            return None
+        return job
+
+    async def write_back(self, sdpath, bearer, api_key):
+        file_type, metadata = await self.extract(sdpath, bearer, api_key)
+        # compare and send the metadata as it reads back from JSON, tuples being lists
+        metadata = json.loads(json.dumps(metadata))
+        record = await self.sdms.get_dataset(sdpath, bearer, api_key)
+        if (record.get("filemetadata") or {}).get(file_type) == metadata:
+            return UNCHANGED
+        record = await self.sdms.lock_dataset(sdpath, bearer, api_key)
+        patched = False
+        try:
+            filemetadata = dict(record.get("filemetadata") or {})
+            if filemetadata.get(file_type) == metadata:
+                return UNCHANGED
+            filemetadata[file_type] = metadata
+            # the update releases the lock
+            await self.sdms.patch_dataset(sdpath, bearer, api_key, {"filemetadata": filemetadata},
+                                          close=record.get("sbit"))
+            patched = True
+            return WRITTEN
+        finally:
+            if not patched:
+                await self._unlock(sdpath, bearer, api_key)
+
+    async def _unlock(self, sdpath, bearer, api_key):
+        try:
+            await self.sdms.unlock_dataset(sdpath, bearer, api_key)
+        except Exception:
+            logging.warning("Could not unlock %s after its write-back", sdpath, exc_info=True)
+
+    def _expired(self, bearer):
+        expiry = token_expiry(bearer)
+        return expiry is not None and expiry <= self.clock()
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def _work(self):
+        while True:
+            job, sdpath, bearer, api_key = await self._queue.get()
+            try:
+                result = await self._write_back_item(sdpath, bearer, api_key)
+            finally:
+                self._add_pending(-1)
+            writeback_items.inc(status=result["status"])
+            job.complete(sdpath, result)
+
+    async def _write_back_item(self, sdpath, bearer, api_key):
+        attempt = 0
+        while True:
+            if self._expired(bearer):
+                return {"sdpath": sdpath, "status": EXPIRED, "attempts": attempt,
+                        "errors": ["The bearer token expired before the dataset was written back: submit it again"]}
+            try:
+                status = await self.write_back(sdpath, bearer, api_key)
+                return {"sdpath": sdpath, "status": status, "attempts": attempt + 1}
+            except HTTPException as he:
+                if he.status_code not in WRITEBACK_RETRY_STATUSES or attempt >= self.retries:
+                    return {"sdpath": sdpath, "status": FAILED, "attempts": attempt + 1,
+                            "errorStatus": he.status_code, "errors": [he.detail]}
+            except Exception as e:
+                logging.error("Write-back of %s failed", sdpath, exc_info=True)
+                return {"sdpath": sdpath, "status": FAILED, "attempts": attempt + 1,
+                        "errorStatus": HTTP_500_INTERNAL_SERVER_ERROR, "errors": [str(e)]}
+            await self.sleep(self.jitter() * self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def _add_pending(self, count):
+        self.pending += count
+        writeback_pending.inc(count)
+
+    def _evict_finished(self):
+        now = self.clock()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished is not None and now - job.finished > self.job_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if expired:
+            self._idempotency_keys = {key: job_id for key, job_id in self._idempotency_keys.items()
+                                      if job_id in self.jobs}
+
+    async def close(self):
+        """Stop the workers; datasets still queued are dropped, and written back when their job is submitted again."""
+        tasks, self._tasks, self._queue = self._tasks, [], None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._add_pending(-self.pending)
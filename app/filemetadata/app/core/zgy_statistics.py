@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class SampleSummary:
+    """Count, sum, sum of squares, minimum, maximum and histogram of a set of ZGY samples.
+
+    The histogram has the same bins between low and high for every set, values
+    outside of them counting in the first or last bin, so summaries of disjoint
+    bricks are combined with merge() in any order.
+    """
+
+    def __init__(self, count, total, total_squares, minimum, maximum, histogram, low, high):
+        self.count = count
+        self.total = total
+        self.total_squares = total_squares
+        self.minimum = minimum
+        self.maximum = maximum
+        self.histogram = histogram
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def empty(cls, bins, low, high):
+        return cls(0, 0.0, 0.0, np.inf, -np.inf, np.zeros(bins, dtype=np.int64), low, high)
+
+    @classmethod
+    def of(cls, samples, bins, low, high):
+        values = samples.ravel().astype(np.float64, copy=False)
+        if len(values) == 0:
+            return cls.empty(bins, low, high)
+        width = (high - low) / bins if bins else 0.0
+        index = np.floor((values - low) / (width if width > 0 else 1.0)).astype(np.int64)
+        np.clip(index, 0, max(bins - 1, 0), out=index)
+        histogram = np.bincount(index, minlength=bins)[:bins] if bins else np.zeros(0, dtype=np.int64)
+        return cls(len(values), values.sum(), np.dot(values, values), values.min(), values.max(), histogram, low, high)
+
+    def merge(self, other):
+        return SampleSummary(self.count + other.count, self.total + other.total,
+                             self.total_squares + other.total_squares, min(self.minimum, other.minimum),
+                             max(self.maximum, other.maximum), self.histogram + other.histogram, self.low, self.high)
+
+    def scaled(self, count):
+        """Estimate of the summary of count samples that this summary's samples were decimated from."""
+        if self.count == 0 or count == self.count:
+            return self
+        factor = count / self.count
+        histogram = np.rint(self.histogram * factor).astype(np.int64)
+        return SampleSummary(count, self.total * factor, self.total_squares * factor, self.minimum, self.maximum,
+                             histogram, self.low, self.high)
+
+    def as_json(self):
+        """The summary in the shape of the Statistics and Histogram of openzgy/headers."""
+        empty = self.count == 0
+        return {
+            'Statistics': {'Count': self.count, 'Sum': float(self.total), 'SumOfSquares': float(self.total_squares),
+                           'Minimum': None if empty else float(self.minimum),
+                           'Maximum': None if empty else float(self.maximum)},
+            'Histogram': {'Count': self.count, 'Minimum': self.low, 'Maximum': self.high,
+                          'Bins': self.histogram.tolist()},
+        }
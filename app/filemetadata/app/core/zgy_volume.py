@@ -0,0 +1,148 @@
+import itertools
+import math
+
+import numpy as np
+
+FLOAT32 = "float32"
+INT8 = "int8"
+
+# little endian sample types of the binary arrays returned to clients
+ARRAY_DTYPES = {FLOAT32: np.dtype("<f4"), INT8: np.dtype("i1")}
+
+
+def box_end(start, count, size):
+    """End of the full resolution box of count samples from start, a count of None extending to the end of the survey."""
+    end = []
+    for axis, (first, samples, n) in enumerate(zip(start, count, size)):
+        last = n if samples is None else first + samples
+        if not 0 <= first < last <= n:
+            raise ValueError(f"Samples {first}..{last - 1} of axis {axis} are outside of the survey of size {list(size)}")
+        end.append(last)
+    return end
+
+
+def lod_size(size, lod):
+    """Samples per axis of a survey of the given size at one level of detail; each level halves every axis."""
+    return tuple(math.ceil(n / 2 ** lod) for n in size)
+
+
+def choose_lod(extent, nlods, resolution):
+    """Coarsest level of detail that still has resolution samples on every output axis of a box of the given extent.
+
+    Axes of a single sample (the slice axis) do not count, and an axis shorter than
+    resolution only has to keep all of its samples at the full resolution.
+    """
+    if not resolution:
+        return 0
+    axes = [n for n in extent if n > 1]
+    lod = 0
+    while lod + 1 < nlods and all(math.ceil(n / 2 ** (lod + 1)) >= min(resolution, n) for n in axes):
+        lod += 1
+    return lod
+
+
+class VolumeBox:
+    """Index box [start, end) of a survey read at one level of detail, in that level's samples."""
+
+    def __init__(self, start, end, lod):
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.lod = lod
+
+    @classmethod
+    def at_lod(cls, start, end, size, lod):
+        """The samples of level lod covering the full resolution box [start, end) of a survey of the given size."""
+        step = 2 ** lod
+        limit = lod_size(size, lod)
+        return cls([s // step for s in start],
+                   [min(max(math.ceil(e / step), s // step + 1), n) for s, e, n in zip(start, end, limit)], lod)
+
+    @property
+    def shape(self):
+        return tuple(e - s for s, e in zip(self.start, self.end))
+
+    @property
+    def step(self):
+        return 2 ** self.lod
+
+    @property
+    def count(self):
+        return math.prod(self.shape)
+
+    def bricks(self, bricksize):
+        """(start, shape) of the part of the box in every brick it overlaps, in C order."""
+        ranges = []
+        for first, last, brick in zip(self.start, self.end, bricksize):
+            edges = [first] + list(range((first // brick + 1) * brick, last, brick)) + [last]
+            ranges.append(list(zip(edges[:-1], edges[1:])))
+        for i, j, k in itertools.product(*ranges):
+            yield (i[0], j[0], k[0]), (i[1] - i[0], j[1] - j[0], k[1] - k[0])
+
+    def slabs(self, bricksize):
+        """(start, shape) of the brick rows making up the box, in C order.
+
+        The box is cut at brick boundaries along its first axis with more than one
+        sample, so that every slab reads whole bricks and concatenating the slabs'
+        samples gives the samples of the whole box.
+        """
+        shape = self.shape
+        axis = next((a for a, n in enumerate(shape) if n > 1), 0)
+        brick = bricksize[axis]
+        first = self.start[axis]
+        while first < self.end[axis]:
+            last = min((first // brick + 1) * brick, self.end[axis])
+            start = list(self.start)
+            start[axis] = first
+            slab = list(shape)
+            slab[axis] = last - first
+            yield tuple(start), tuple(slab)
+            first = last
+
+
+def slab_reads(start, shape, bricksize):
+    """(start, shape) of the reads of a slab, cut at brick boundaries along its second axis with more than one sample.
+
+    A slab is one brick thick along its first axis with more than one sample, so
+    every read covers a single column of bricks whatever the size of the slab.
+    """
+    axes = [a for a, n in enumerate(shape) if n > 1]
+    if len(axes) < 2:
+        yield tuple(start), tuple(shape)
+        return
+    axis = axes[1]
+    brick = bricksize[axis]
+    first, end = start[axis], start[axis] + shape[axis]
+    while first < end:
+        last = min((first // brick + 1) * brick, end)
+        read_start, read_shape = list(start), list(shape)
+        read_start[axis], read_shape[axis] = first, last - first
+        yield tuple(read_start), tuple(read_shape)
+        first = last
+
+
+def read_slab(reader, start, shape, lod):
+    """Samples of the box (start, shape) of level lod, read one column of bricks at a time."""
+    reads = list(slab_reads(start, shape, reader.bricksize))
+    if len(reads) == 1:
+        data = np.zeros(shape, dtype=np.float32)
+        reader.read(start, data, lod=lod)
+        return data
+    data = np.empty(shape, dtype=np.float32)
+    for read_start, read_shape in reads:
+        part = np.zeros(read_shape, dtype=np.float32)
+        reader.read(read_start, part, lod=lod)
+        data[tuple(slice(r - s, r - s + n) for s, r, n in zip(start, read_start, read_shape))] = part
+    return data
+
+
+def encode_samples(data, dtype, value_range=None):
+    """Samples as a little endian float32 array, or quantized to int8 over value_range.
+
+    int8 samples q stand for value_range[0] + (q + 128) * (value_range[1] - value_range[0]) / 255.
+    """
+    if dtype == INT8:
+        low, high = value_range
+        scale = 255.0 / (high - low) if high > low else 0.0
+        quantized = np.rint((data - low) * scale) - 128
+        return np.clip(quantized, -128, 127).astype(ARRAY_DTYPES[INT8]).tobytes()
+    return data.astype(ARRAY_DTYPES[FLOAT32], copy=False).tobytes()
@@ -1,3 +1,5 @@
+import tempfile
+
 import uvicorn
 
 from fastapi import FastAPI, Request
@@ -9,23 +11,44 @@ from starlette.exceptions import HTTPException
 
 from api.errors.http_error import http_error_handler
 from api.errors.validation_error import http422_error_handler
+from api.middleware import MetricsMiddleware
+from api.responses import ORJSONResponse
 from api.routes.base import api_router
+from api.routes.route_batch import writeback_pipeline
+from api.routes.route_openzgy import zgy_reader_pool
+from api.routes.route_segy import segy_session_pool
 from core.config import settings
+from core.executor import sdk_executor
+from core.metadata_cache import metadata_cache
+from core.metrics import metrics_directory
+from core.native import native_modules
+from core.prefork import PreforkServer, worker_count
+from core.sdms_client import sdms_client
 
 def start_application():
     application = FastAPI(title=settings.PROJECT_TITLE, version=settings.PROJECT_VERSION,
-                          docs_url=None, redoc_url=None, openapi_url=settings.API_PATH + 'openapi.json')
+                          docs_url=None, redoc_url=None, openapi_url=settings.API_PATH + 'openapi.json',
+                          default_response_class=ORJSONResponse)
 
     application.add_exception_handler(HTTPException, http_error_handler)
     application.add_exception_handler(RequestValidationError, http422_error_handler)
 
     application.include_router(api_router)
+    if settings.NATIVE_WARM_UP:
+        application.add_event_handler("startup", native_modules.warm_up)
+    application.add_event_handler("shutdown", writeback_pipeline.close)
+    application.add_event_handler("shutdown", segy_session_pool.close)
+    application.add_event_handler("shutdown", zgy_reader_pool.close)
+    application.add_event_handler("shutdown", sdk_executor.shutdown)
+    application.add_event_handler("shutdown", metadata_cache.close)
+    application.add_event_handler("shutdown", sdms_client.close)
     application.mount(settings.API_PATH + "static", StaticFiles(directory="static"), name="static")
 
     application.add_middleware(
         CORSMiddleware,
         expose_headers=["Content-Security-Policy"]
     )
+    application.add_middleware(MetricsMiddleware)
 
     return application
 
@@ -60,4 +83,11 @@ async def swagger_ui_redirect():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = worker_count(settings.WORKERS)
+    if workers == 1:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    else:
+        # the workers inherit the loaded SDKs instead of each importing them
+        native_modules.load_all()
+        metrics_directory.open(settings.METRICS_DIR or tempfile.mkdtemp(prefix="filemetadata-metrics-"))
+        PreforkServer(uvicorn.Config(app, host="0.0.0.0", port=8000), workers, settings.GRACEFUL_SHUTDOWN_TIMEOUT).run()
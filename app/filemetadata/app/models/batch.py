@@ -0,0 +1,12 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BatchMetadataRequest(BaseModel):
+    sdpaths: List[str] = Field(..., min_items=1)
+    parallelism: Optional[int] = Field(None, gt=0)
+
+
+class BatchWritebackRequest(BaseModel):
+    sdpaths: List[str] = Field(..., min_items=1)
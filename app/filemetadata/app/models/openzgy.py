@@ -0,0 +1,26 @@
+from enum import Enum
+
+from core.coordinates import ANNOTATION, INDEX, WORLD
+from core.zgy_volume import FLOAT32, INT8
+
+
+class CoordinateSystem(str, Enum):
+    index = INDEX
+    annotation = ANNOTATION
+    world = WORLD
+
+
+class SliceAxis(str, Enum):
+    inline = "inline"
+    crossline = "crossline"
+    time = "time"
+
+
+class ArrayFormat(str, Enum):
+    float32 = FLOAT32
+    int8 = INT8
+
+
+class StatisticsMode(str, Enum):
+    estimate = "estimate"
+    exact = "exact"
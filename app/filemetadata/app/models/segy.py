@@ -0,0 +1,22 @@
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+
+
+class BinaryHeaderField(BaseModel):
+    Id: str
+    Start: int
+    End: int
+    Value: float
+
+
+class SegySummary(BaseModel):
+    revision: Optional[int]
+    is3D: Optional[bool]
+    traceHeaderFieldCount: Optional[int]
+    textualHeader: Optional[str]
+    extendedTextualHeaders: Optional[Any]
+    binaryHeader: Optional[List[BinaryHeaderField]]
+
+
+SEGY_SUMMARY_FIELDS = list(SegySummary.__fields__)
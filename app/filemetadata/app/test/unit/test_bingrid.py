@@ -0,0 +1,42 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+sys.modules.setdefault('openzgycpp', Mock(ZgyError=type('ZgyError', (Exception,), {})))
+
+import json
+import os
+import unittest
+
+from benchmark.surveys import ANNOT_CORNERS, ANNOT_INC, CORNERS, SIZE, legacy_bingrid, random_surveys
+from core.bingrid import P6_FIELDS, compute_bingrid, compute_bingrids
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'integration_test', 'features', 'data')
+
+
+class BinGridTest(unittest.TestCase):
+
+    def test_p6_values_of_integration_test_dataset(self):
+        with open(os.path.join(DATA_DIR, 'integration_test_bingrid_response.json')) as fp:
+            expected = json.loads(json.load(fp))
+        bingrid = compute_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE).as_dict()
+        for field in P6_FIELDS:
+            if field.startswith("P6"):
+                assert bingrid[field] == expected[field], field
+
+    def test_local_coordinates_outline_the_survey(self):
+        # world corners from the origin along the crossline axis, then the inline axis, back to the origin
+        origin, inline_end, xline_end, far = CORNERS
+        outline = [origin, xline_end, far, inline_end, origin]
+        bingrid = compute_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE).as_dict()
+        assert bingrid["BinGridLocalCoordinates"] == [{"X": x, "Y": y} for x, y in outline]
+
+    def test_same_output_as_legacy_class(self):
+        assert compute_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE).as_json() == \
+            legacy_bingrid(CORNERS, ANNOT_CORNERS, ANNOT_INC, SIZE)
+
+        corners, annotcorners, annotinc, size = random_surveys(500)
+        grids = compute_bingrids(corners, annotcorners, annotinc, size)
+        for n, grid in enumerate(grids):
+            assert grid.as_json() == legacy_bingrid(corners[n].tolist(), annotcorners[n].tolist(),
+                                                    annotinc[n].tolist(), size[n].tolist())
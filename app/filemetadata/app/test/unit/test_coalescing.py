@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+from core.coalescing import RequestCoalescer
+from core.metadata_cache import MetadataCache, cached_metadata
+from core.metrics import coalesced_requests
+from core.sdms_client import DatasetDescriptor
+
+
+class Computation:
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RequestCoalescerTest(unittest.TestCase):
+
+    def setUp(self):
+        coalesced_requests.clear()
+
+    def gather(self, coalescer, calls, computation):
+        async def main():
+            computation.release = asyncio.Event()
+            tasks = [asyncio.ensure_future(coalescer.run(key, operation, computation)) for key, operation in calls]
+            await asyncio.sleep(0)
+            computation.release.set()
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        return asyncio.run(main())
+
+    def test_identical_calls_share_one_execution(self):
+        coalescer = RequestCoalescer()
+        computation = Computation(result={"Size": [6, 6, 10]})
+        results = self.gather(coalescer, [("a", "openzgy/headers")] * 5, computation)
+        assert computation.calls == 1
+        assert results == [{"Size": [6, 6, 10]}] * 5
+        assert len(coalescer) == 0
+        assert coalesced_requests.value(route="openzgy/headers", role="leader") == 1
+        assert coalesced_requests.value(route="openzgy/headers", role="follower") == 4
+
+    def test_different_keys_run_separately(self):
+        computation = Computation(result=1)
+        self.gather(RequestCoalescer(), [("a", "segy/revision"), ("b", "segy/revision")], computation)
+        assert computation.calls == 2
+
+    def test_errors_reach_every_caller(self):
+        computation = Computation(error=HTTPException(status_code=404, detail="not found"))
+        results = self.gather(RequestCoalescer(), [("a", "segy/binaryHeader")] * 3, computation)
+        assert computation.calls == 1
+        assert [result.status_code for result in results] == [404] * 3
+
+    def test_excluded_routes_and_disabled_coalescer_run_every_call(self):
+        computation = Computation(result=1)
+        calls = [("a", "segy/summary?fields=revision")] * 3
+        self.gather(RequestCoalescer(excluded=["segy/summary"]), calls, computation)
+        assert computation.calls == 3
+        self.gather(RequestCoalescer(enabled=False), calls, computation)
+        assert computation.calls == 6
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        coalescer = RequestCoalescer()
+        computation = Computation(result=1)
+
+        async def main():
+            computation.release = asyncio.Event()
+            first = asyncio.ensure_future(coalescer.run("a", "openzgy/headers", computation))
+            second = asyncio.ensure_future(coalescer.run("a", "openzgy/headers", computation))
+            await asyncio.sleep(0)
+            first.cancel()
+            computation.release.set()
+            return await second
+        assert asyncio.run(main()) == 1
+
+    def cached_metadata(self, bearers, computation, forbidden=(), cache=True):
+        descriptors = []
+
+        async def get_descriptor(sdpath, bearer, api_key):
+            descriptors.append(bearer)
+            if bearer in forbidden:
+                raise HTTPException(status_code=403, detail="forbidden")
+            return DatasetDescriptor({"name": "a.sgy", "generation": 3})
+
+        async def main():
+            computation.release = asyncio.Event()
+            calls = [cached_metadata("sd://opendes/kt-demo/a.sgy", bearer, "key", "segy/summary", computation)
+                     for bearer in bearers]
+            tasks = [asyncio.ensure_future(call) for call in calls]
+            for _ in range(3):
+                await asyncio.sleep(0)
+            computation.release.set()
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        with tempfile.TemporaryDirectory() as directory:
+            metadata_cache = MetadataCache(os.path.join(directory, "cache.sqlite") if cache else "", 1 << 20)
+            with mock.patch('core.metadata_cache.metadata_cache', metadata_cache), \
+                    mock.patch('core.metadata_cache.sdms_client.get_descriptor', new=get_descriptor):
+                results = asyncio.run(main())
+            metadata_cache.close()
+        return results, descriptors
+
+    def test_cached_metadata_coalesces_by_caller_without_cache(self):
+        computation = Computation(result={"revision": 1})
+        results, descriptors = self.cached_metadata(["Bearer one", "Bearer one", "Bearer two"], computation,
+                                                    cache=False)
+        assert results == [{"revision": 1}] * 3
+        assert descriptors == []
+        assert computation.calls == 2
+
+    def test_cached_metadata_checks_every_caller_and_shares_the_computation(self):
+        computation = Computation(result={"revision": 1})
+        results, descriptors = self.cached_metadata(["Bearer one", "Bearer one", "Bearer two"], computation)
+        assert results == [{"revision": 1}] * 3
+        assert descriptors == ["Bearer one", "Bearer one", "Bearer two"]
+        assert computation.calls == 1
+
+    def test_cached_metadata_denies_callers_without_access(self):
+        computation = Computation(result={"revision": 1})
+        results, _ = self.cached_metadata(["Bearer one", "Bearer intruder"], computation, forbidden=["Bearer intruder"])
+        assert results[0] == {"revision": 1}
+        assert isinstance(results[1], HTTPException) and results[1].status_code == 403
+        assert computation.calls == 1
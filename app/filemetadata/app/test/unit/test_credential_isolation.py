@@ -0,0 +1,64 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from api.routes import route_segy
+from core.session_pool import SessionPool
+
+
+class StandInSegySdk:
+    """Mimics segysdk: a session copies the process-global remote access when it is created."""
+
+    SegyException = type("SegyException", (Exception,), {})
+
+    def __init__(self):
+        self.remote_access = None
+
+    def segy_configure_remote_access(self, sdms_url, app_key, token):
+        self.remote_access = token
+
+    def create_session(self, sdpath, options):
+        # the remote handshake happens between reading the settings and returning
+        time.sleep(0.001)
+        return StandInSegySession(self.remote_access)
+
+
+class StandInSegySession:
+
+    def __init__(self, token):
+        self.token = token
+
+    def get_binary_header_as_json(self):
+        time.sleep(0.002)
+        return self.token
+
+
+class CredentialIsolationTest(unittest.TestCase):
+
+    def test_concurrent_requests_never_see_another_callers_token(self):
+        sdk = StandInSegySdk()
+        pool = SessionPool(route_segy.__dict__['__open_segy_session'], max_size=8, idle_ttl=0)
+        tenants = [f"Bearer token-{i}" for i in range(24)]
+
+        async def call(i):
+            bearer = tenants[i % len(tenants)]
+            response = await route_segy.get_binary_header(f"sd://tenant/sub/file-{i % 5}.sgy", bearer=bearer, api_key="key")
+            return bearer, response["header"]
+
+        async def scenario():
+            return await asyncio.gather(*[call(i) for i in range(480)])
+
+        with mock.patch('api.routes.route_segy.segysdk', sdk), \
+                mock.patch('api.dependencies.authentication.segysdk', sdk), \
+                mock.patch('api.routes.route_segy.segy_session_pool', pool):
+            results = asyncio.run(scenario())
+
+        assert len(results) == 480
+        crossed = [(sent, seen) for sent, seen in results if sent != seen]
+        assert crossed == []
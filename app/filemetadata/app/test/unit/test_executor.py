@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from fastapi import HTTPException
+
+from core.executor import SdkExecutor
+from core.metrics import sdk_executor_active, sdk_executor_queued, sdk_executor_rejections
+
+
+class SdkExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        for metric in (sdk_executor_active, sdk_executor_queued, sdk_executor_rejections):
+            metric.clear()
+
+    def test_blocking_calls_do_not_stall_the_event_loop(self):
+        executor = SdkExecutor(max_workers=4)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.ensure_future(ticker())
+            results = await asyncio.gather(*[executor.run(time.sleep, 0.2) for _ in range(4)])
+            task.cancel()
+            return results, ticks
+
+        started = time.monotonic()
+        results, ticks = asyncio.run(scenario())
+        executor.shutdown()
+        assert results == [None] * 4
+        assert time.monotonic() - started < 0.6
+        assert ticks >= 10
+
+    def test_stats_report_active_and_queued_calls(self):
+        executor = SdkExecutor(max_workers=1)
+        release = threading.Event()
+        observed = {}
+
+        async def scenario():
+            first = asyncio.ensure_future(executor.run(release.wait))
+            second = asyncio.ensure_future(executor.run(lambda: 42))
+            await asyncio.sleep(0.05)
+            observed.update(executor.stats())
+            observed["gauges"] = sdk_executor_active.value(), sdk_executor_queued.value()
+            release.set()
+            return await first, await second
+
+        assert asyncio.run(scenario()) == (True, 42)
+        executor.shutdown()
+        assert observed == {"workers": 1, "active": 1, "queued": 1, "gauges": (1, 1)}
+        assert executor.stats() == {"workers": 1, "active": 0, "queued": 0}
+        assert (sdk_executor_active.value(), sdk_executor_queued.value()) == (0, 0)
+
+    def test_full_queue_is_rejected(self):
+        executor = SdkExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            waiting = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            try:
+                await executor.run(lambda: None)
+            except HTTPException as e:
+                return e.status_code
+            finally:
+                release.set()
+                await asyncio.gather(running, waiting)
+
+        assert asyncio.run(scenario()) == 503
+        executor.shutdown()
+        assert sdk_executor_rejections.value() == 1
+
+    def test_reduce_merges_results_with_bounded_calls(self):
+        executor = SdkExecutor(max_workers=8)
+        lock = threading.Lock()
+        active, peak = 0, 0
+
+        def square(n):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+            return n * n
+
+        total = asyncio.run(executor.reduce(square, [(n,) for n in range(20)], lambda a, b: a + b, 0, 3))
+        executor.shutdown()
+        assert total == sum(n * n for n in range(20))
+        assert peak == 3
+
+    def test_reduce_waits_for_running_calls_after_a_failure(self):
+        executor = SdkExecutor(max_workers=4)
+        finished = []
+
+        def call(n):
+            if n == 0:
+                raise ValueError("bad chunk")
+            time.sleep(0.1)
+            finished.append(n)
+            return n
+
+        with self.assertRaises(ValueError):
+            asyncio.run(executor.reduce(call, [(n,) for n in range(10)], lambda a, b: a + b, 0, 3))
+        # the two calls running when the first one failed completed, and no other call started
+        assert sorted(finished) == [1, 2]
+        executor.shutdown()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.modules.setdefault('segysdk', mock.Mock(SegyException=type('SegyException', (Exception,), {})))
+
+import requests_mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.route_segy import router
+from core.config import Settings
+from core.metadata_cache import MetadataCache
+from unit.util import apply_test_settings
+
+apply_test_settings()
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+SDMS_URL = 'https://sdms.unit-tests.com/seistore-svc/api/v3'
+DATASET_URL = SDMS_URL + '/dataset/tenant/opendes/subproject/kt-demo/dataset/example.sgy?path=%2F'
+BINARY_HEADER_URL = Settings.BASE_URL + Settings.API_PATH + 'segy/binaryHeader?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy'
+TEST_HEADERS = {'Authorization': 'Bearer token'}
+
+
+def dataset_record(size):
+    return {'name': 'example.sgy', 'gcsurl': 'bucket/prefix', 'ctag': 'tag', 'filemetadata': {'size': size, 'nobjects': 1}}
+
+
+class MetadataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'metadata.sqlite')
+        self.now = 0.0
+        self.cache = MetadataCache(self.path, 100, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_hit_and_miss(self):
+        assert self.cache.get('sd://t/s/a', 'op', 'v1') is None
+        self.cache.put('sd://t/s/a', 'op', 'v1', '"value"')
+        assert self.cache.get('sd://t/s/a', 'op', 'v1') == '"value"'
+        assert self.cache.get('sd://t/s/a', 'other', 'v1') is None
+        assert self.cache.stats() == {'enabled': True, 'hits': 1, 'misses': 2, 'evictions': 0}
+
+    def test_new_dataset_version_misses(self):
+        self.cache.put('sd://t/s/a', 'op', 'v1', '"old"')
+        assert self.cache.get('sd://t/s/a', 'op', 'v2') is None
+        self.cache.put('sd://t/s/a', 'op', 'v2', '"new"')
+        assert self.cache.get('sd://t/s/a', 'op', 'v2') == '"new"'
+        assert self.cache.get('sd://t/s/a', 'op', 'v1') is None
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for index, name in enumerate(['a', 'b', 'c']):
+            self.now = index
+            self.cache.put(name, 'op', 'v', 'x' * 30)
+        # 'a' is used again, so 'b' is the oldest when 'd' does not fit anymore
+        self.now = 3
+        assert self.cache.get('a', 'op', 'v') is not None
+        self.now = 4
+        self.cache.put('d', 'op', 'v', 'x' * 30)
+        assert self.cache.get('b', 'op', 'v') is None
+        assert self.cache.get('a', 'op', 'v') is not None
+        assert self.cache.evictions == 1
+
+    def test_cache_persists(self):
+        self.cache.put('sd://t/s/a', 'op', 'v1', '1')
+        self.cache.close()
+        reopened = MetadataCache(self.path, 100)
+        assert reopened.get('sd://t/s/a', 'op', 'v1') == '1'
+        reopened.close()
+
+
+@mock.patch.object(Settings, 'SDMS_URL', SDMS_URL)
+@mock.patch('api.routes.route_segy.__create_segy_session')
+class CachedRouteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = MetadataCache(os.path.join(self.directory.name, 'metadata.sqlite'), 1024 * 1024)
+        patcher = mock.patch('core.metadata_cache.metadata_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_repeated_reads_are_served_from_cache(self, mock_create_segy_session):
+        mock_create_segy_session.return_value.session.get_binary_header_as_json.return_value = 'binaryHeaderValue'
+        with requests_mock.Mocker(real_http=True) as sdms:
+            dataset = sdms.get(DATASET_URL, json=dataset_record(100))
+            for _ in range(3):
+                response = client.get(BINARY_HEADER_URL, headers=TEST_HEADERS)
+                assert response.status_code == 200
+                assert response.json() == {'header': 'binaryHeaderValue'}
+            assert dataset.call_count == 3
+            assert dataset.last_request.headers['Authorization'] == 'Bearer token'
+        assert mock_create_segy_session.call_count == 1
+        assert (self.cache.hits, self.cache.misses) == (2, 1)
+
+    def test_rewritten_dataset_is_read_again(self, mock_create_segy_session):
+        mock_create_segy_session.return_value.session.get_binary_header_as_json.side_effect = ['old', 'new']
+        with requests_mock.Mocker(real_http=True) as sdms:
+            sdms.get(DATASET_URL, json=dataset_record(100))
+            assert client.get(BINARY_HEADER_URL, headers=TEST_HEADERS).json() == {'header': 'old'}
+            sdms.get(DATASET_URL, json=dataset_record(200))
+            assert client.get(BINARY_HEADER_URL, headers=TEST_HEADERS).json() == {'header': 'new'}
+
+    def test_permission_is_checked_on_cache_hit(self, mock_create_segy_session):
+        mock_create_segy_session.return_value.session.get_binary_header_as_json.return_value = 'binaryHeaderValue'
+        with requests_mock.Mocker(real_http=True) as sdms:
+            sdms.get(DATASET_URL, json=dataset_record(100))
+            assert client.get(BINARY_HEADER_URL, headers=TEST_HEADERS).status_code == 200
+            sdms.get(DATASET_URL, status_code=403, text='forbidden')
+            response = client.get(BINARY_HEADER_URL, headers={'Authorization': 'Bearer other'})
+        assert response.status_code == 403
+        assert self.cache.hits == 0
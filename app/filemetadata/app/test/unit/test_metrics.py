@@ -0,0 +1,138 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.middleware import MetricsMiddleware
+from api.responses import ORJSONResponse
+from api.routes import route_segy, route_status
+from core.config import Settings
+from core.metrics import Counter, Gauge, Histogram, MetricsDirectory, Registry, registry
+from core.session_pool import SessionPool
+from unit.util import apply_test_settings
+
+apply_test_settings()
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.include_router(route_status.router)
+app.include_router(route_segy.router)
+app.add_middleware(MetricsMiddleware)
+client = TestClient(app)
+
+TEST_HEADERS = {'Authorization': 'Bearer token'}
+SDPATH = 'sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy'
+
+
+class MockSegySession:
+
+    def get_revision(self):
+        return 1
+
+    def is_3d(self):
+        raise route_segy.segysdk.SegyException("Dataset not found, HTTP 404")
+
+
+def samples(text):
+    """{'name{labels}': value} of the sample lines of a text exposition."""
+    lines = [line for line in text.splitlines() if line and not line.startswith('#')]
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1]) for line in lines}
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def test_text_format(self):
+        local = Registry()
+        requests = local.register(Counter('requests_total', 'Requests', ['path']))
+        latency = local.register(Histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0)))
+        requests.inc(path='/a "b"')
+        requests.inc(2, path='/a "b"')
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        assert local.render() == '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{path="/a \\"b\\""} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_sum 5.55',
+            'latency_seconds_count 3',
+        ]) + '\n'
+        with self.assertRaises(ValueError):
+            requests.inc(route='/a')
+
+    def test_workers_metrics_are_summed(self):
+        local = Registry()
+        requests = local.register(Counter('requests_total', 'Requests', ['path']))
+        in_flight = local.register(Gauge('in_flight', 'In flight'))
+        latency = local.register(Histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0)))
+        requests.inc(3, path='/a')
+        in_flight.inc(2)
+        latency.observe(0.5)
+        other = local.snapshot()
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, 'stale.json'), 'w'):
+                pass
+            directory = MetricsDirectory(local)
+            directory.open(path)
+            assert os.listdir(path) == []
+            for pid in [os.getppid(), exited.pid]:
+                with open(os.path.join(path, f'{pid}.json'), 'w') as f:
+                    json.dump(other, f)
+            requests.inc(path='/b')
+            latency.observe(5)
+            metrics = samples(directory.render())
+            assert sorted(os.listdir(path)) == sorted(f'{pid}.json' for pid in [os.getpid(), os.getppid(), exited.pid])
+        assert metrics['requests_total{path="/a"}'] == 9
+        assert metrics['requests_total{path="/b"}'] == 1
+        # the gauge of the exited worker is left out
+        assert metrics['in_flight'] == 4
+        assert metrics['latency_seconds_bucket{le="1"}'] == 3
+        assert metrics['latency_seconds_count'] == 4
+        assert metrics['latency_seconds_sum'] == 6.5
+
+    def test_requests_and_sdk_calls_are_measured(self):
+        pool = SessionPool(getattr(route_segy, '__open_segy_session'), 4, 60)
+        with mock.patch.object(route_segy, 'segy_session_pool', pool), \
+                mock.patch.object(route_segy.segysdk, 'create_session', return_value=MockSegySession()):
+            url = Settings.BASE_URL + Settings.API_PATH + 'segy/{}?sdpath=' + SDPATH
+            assert client.get(url.format('revision'), headers=TEST_HEADERS).status_code == 200
+            assert client.get(url.format('revision'), headers=TEST_HEADERS).status_code == 200
+            assert client.get(url.format('is3D'), headers=TEST_HEADERS).status_code == 404
+            assert client.get(Settings.BASE_URL + '/unknown').status_code == 404
+
+        response = client.get(Settings.BASE_URL + Settings.API_PATH + 'metrics')
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+        metrics = samples(response.text)
+        revision = f'method="GET",route="{Settings.API_PATH}segy/revision"'
+        is_3d = f'method="GET",route="{Settings.API_PATH}segy/is3D"'
+        assert metrics['filemetadata_http_request_duration_seconds_count{' + revision + '}'] == 2
+        assert metrics['filemetadata_http_requests_in_flight{' + revision + '}'] == 0
+        assert metrics['filemetadata_http_request_errors_total{' + is_3d + ',status="404"}'] == 1
+        assert metrics['filemetadata_http_request_errors_total{method="GET",route="unmatched",status="404"}'] == 1
+        assert not any(key.startswith('filemetadata_http_request_errors_total{' + revision) for key in metrics)
+        assert metrics['filemetadata_segy_session_create_duration_seconds_count'] == 3
+        assert metrics['filemetadata_sdk_call_duration_seconds_count{library="segysdk",call="create_session"}'] == 1
+        assert metrics['filemetadata_sdk_call_duration_seconds_count{library="segysdk",call="get_revision"}'] == 2
+        assert metrics['filemetadata_sdk_call_errors_total{library="segysdk",call="is_3d"}'] == 1
+        assert metrics['filemetadata_response_encoding_duration_seconds_count{format="json"}'] >= 2
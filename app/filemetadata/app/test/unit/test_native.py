@@ -0,0 +1,56 @@
+import sys
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from api.routes.route_status import router
+from core.config import Settings
+from core.native import LazyModule, NativeModules
+from unit.util import apply_test_settings
+
+apply_test_settings()
+
+client = TestClient(router)
+
+
+class NativeModulesTest(unittest.TestCase):
+
+    def setUp(self):
+        sys.modules.pop("colorsys", None)
+
+    def test_modules_are_imported_on_first_use(self):
+        modules = NativeModules(["colorsys"])
+        colorsys = LazyModule("colorsys", modules)
+        assert "colorsys" not in sys.modules
+        assert modules.status()["status"] == "cold"
+        assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert "colorsys" in sys.modules
+        status = modules.status()
+        assert status["status"] == "warm"
+        assert status["modules"]["colorsys"]["state"] == "warm"
+        assert status["modules"]["colorsys"]["importSeconds"] >= 0
+
+    def test_attributes_can_be_patched_through_the_proxy(self):
+        colorsys = LazyModule("colorsys", NativeModules(["colorsys"]))
+        with mock.patch.object(colorsys, "ONE_THIRD", 0.5):
+            assert sys.modules["colorsys"].ONE_THIRD == 0.5
+        assert sys.modules["colorsys"].ONE_THIRD == 1.0 / 3.0
+
+    def test_warm_up_loads_in_the_background_and_reports_failures(self):
+        modules = NativeModules(["colorsys", "no_such_native_module"])
+        modules.warm_up()
+        modules._warm_up.join(10)
+        assert modules.states == {"colorsys": "warm", "no_such_native_module": "failed"}
+        assert modules.status()["status"] == "cold"
+        with self.assertRaises(ImportError):
+            LazyModule("no_such_native_module", modules).anything
+
+    def test_readiness(self):
+        modules = NativeModules(["colorsys"])
+        with mock.patch("api.routes.route_status.native_modules", modules):
+            url = Settings.BASE_URL + Settings.API_PATH + "service-status/readiness"
+            assert client.get(url).json()["status"] == "cold"
+            assert client.get(url + "?require_warm=true").status_code == 503
+            modules.load_all()
+            assert client.get(url + "?require_warm=true").json()["status"] == "warm"
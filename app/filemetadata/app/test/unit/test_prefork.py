@@ -0,0 +1,98 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+import requests
+
+from core.prefork import worker_count
+
+# supervisor of 2 workers answering their pid, after sleeping for the requested seconds
+SERVER = """
+import asyncio, os, sys
+import uvicorn
+from core.prefork import PreforkServer
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await asyncio.sleep(float(scope["query_string"] or 0))
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+PreforkServer(uvicorn.Config(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="error", lifespan="off"),
+              2, float(sys.argv[2]), poll_interval=0.05).run()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+class PreforkServerTest(unittest.TestCase):
+
+    def start(self, drain_timeout):
+        port = free_port()
+        app_dir = os.path.join(os.path.dirname(__file__), "..", "..")
+        process = subprocess.Popen([sys.executable, "-c", SERVER, str(port), str(drain_timeout)], cwd=app_dir)
+        self.addCleanup(lambda: process.poll() is None and process.kill())
+        url = f"http://127.0.0.1:{port}/"
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            try:
+                requests.get(url, timeout=1)
+                return process, url
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        self.fail("The server did not start")
+
+    def test_worker_count(self):
+        assert worker_count(3) == 3
+        assert worker_count(0) >= 1
+
+    def test_dead_workers_are_replaced(self):
+        process, url = self.start(5)
+        pid = int(requests.get(url).text)
+        os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                if int(requests.get(url, timeout=1).text) != pid:
+                    break
+            except requests.ConnectionError:
+                pass
+        else:
+            self.fail("The killed worker was not replaced")
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(10) == 0
+
+    def test_shutdown_drains_requests_in_flight(self):
+        process, url = self.start(5)
+        responses = []
+        request = threading.Thread(target=lambda: responses.append(requests.get(url + "?1", timeout=10)))
+        request.start()
+        time.sleep(0.3)
+        process.send_signal(signal.SIGTERM)
+        request.join()
+        assert responses[0].status_code == 200
+        assert process.wait(10) == 0
+
+    def test_busy_workers_are_killed_after_the_drain_timeout(self):
+        process, url = self.start(0.5)
+
+        def busy_request():
+            with self.assertRaises(requests.ConnectionError):
+                requests.get(url + "?30", timeout=30)
+        threading.Thread(target=busy_request, daemon=True).start()
+        time.sleep(0.3)
+        start = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(10) == 0
+        assert time.monotonic() - start < 5
@@ -0,0 +1,197 @@
+import ast
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import requests
+
+sys.modules.setdefault('segysdk', mock.Mock(SegyException=type('SegyException', (Exception,), {})))
+
+from core.config import Settings
+from core.range_reader import RangeReader, merge_ranges
+from core.sdpath import parse_sdpath
+from core.segy_range_session import RangeReadSegySession
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'integration_test', 'features', 'data')
+SDPATH = 'sd://opendes//integration_test_dataset.sgy'
+
+
+class RangeServer(ThreadingHTTPServer):
+    """Local stand-in for an object store serving one file, counting what it sends."""
+
+    def __init__(self, content):
+        super().__init__(("127.0.0.1", 0), RangeHandler)
+        self.content = content
+        self.honour_range = True
+        self.delay = 0.0
+        self.requests = []
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/data"
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.server.content)))
+        self.end_headers()
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match and self.server.honour_range:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(self.server.content) - 1)
+            body = self.server.content[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.server.content)}")
+        else:
+            body = self.server.content
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests.append(self.headers.get("Range"))
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def load_sdk_header(file_name):
+    with open(os.path.join(DATA_DIR, file_name)) as fp:
+        return ast.literal_eval(json.load(fp))['header']
+
+
+class RangeReaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(DATA_DIR, 'integration_test_dataset.sgy'), 'rb') as fp:
+            cls.content = fp.read()
+
+    def setUp(self):
+        self.server = RangeServer(self.content)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_merge_ranges(self):
+        assert merge_ranges([(100, 10), (0, 10), (12, 10)], 2) == [(0, 22), (100, 10)]
+        assert merge_ranges([(0, 10), (5, 2)], 0) == [(0, 10)]
+        assert merge_ranges([(0, 10), (20, 10)], 9) == [(0, 10), (20, 10)]
+        assert merge_ranges([(0, 10), (10, 10), (20, 10), (30, 50)], 0, 25) == [(0, 20), (20, 10), (30, 50)]
+
+    def test_read_ranges(self):
+        reader = RangeReader(self.server.url, merge_gap=0)
+        assert reader.size() == len(self.content)
+        blocks = reader.read_ranges([(0, 100), (5000, 10), (50, 100)])
+        assert blocks == [self.content[0:100], self.content[5000:5010], self.content[50:150]]
+        assert reader.requests == 2
+        assert reader.bytes_transferred == self.server.bytes_sent == 160
+
+    def test_servers_ignoring_the_range_fail_the_read(self):
+        self.server.honour_range = False
+        reader = RangeReader(self.server.url)
+        with self.assertRaises(IOError):
+            reader.read(0, 100)
+        assert reader.bytes_transferred == 0
+
+    def test_stalled_servers_time_out(self):
+        self.server.delay = 1.0
+        with self.assertRaises(requests.Timeout):
+            RangeReader(self.server.url, timeout=(1, 0.1)).read(0, 100)
+
+    def test_cached_ranges_are_not_fetched_again(self):
+        reader = RangeReader(self.server.url)
+        reader.read(0, 3600)
+        assert reader.read(3200, 400) == self.content[3200:3600]
+        assert reader.requests == 1
+
+    def test_cache_is_bounded(self):
+        reader = RangeReader(self.server.url, merge_gap=0, cache_bytes=100)
+        reader.read(0, 100)
+        reader.read(1000, 100)
+        assert reader.read(0, 100) == self.content[0:100]
+        assert reader.requests == 3
+
+    def test_ranges_evicted_while_storing_are_returned(self):
+        reader = RangeReader(self.server.url, merge_gap=0, cache_bytes=1000)
+        reader.read(0, 240)
+        ranges = [(0, 240)] + [(100000 * i, 240) for i in range(1, 10)]
+        assert reader.read_ranges(ranges) == [self.content[o:o + n] for o, n in ranges]
+        assert reader.requests == 10
+
+    def test_blocks_within_a_larger_block_are_dropped(self):
+        reader = RangeReader(self.server.url, merge_gap=0)
+        reader.read_ranges([(100, 10), (200, 10)])
+        reader.read(50, 500)
+        assert reader._offsets == [50] and reader._cached_bytes == 500
+        assert reader.read_ranges([(120, 10), (300, 20)]) == [self.content[120:130], self.content[300:320]]
+        assert reader.requests == 3
+
+    def test_consecutive_trace_headers_are_read_in_blocks(self):
+        reader = RangeReader(self.server.url, block_bytes=64 * 1024)
+        segy = RangeReadSegySession(reader, SDPATH, mock.Mock())
+        assert len(segy.read_trace_headers(range(1, 101))) == 100
+        # the file header, then 25 blocks of four 20240 byte traces rather than one request per trace
+        assert reader.requests == 1 + 25
+        assert json.loads(segy.get_raw_trace_headers_as_json(1, 100)) == \
+            json.loads(load_sdk_header('integration_test_segy_rawTraceHeaders_response.json'))
+
+    @mock.patch.object(Settings, 'RANGE_READ_MAX_TRACE_GAP', 0)
+    def test_segy_headers_read_only_header_bytes(self):
+        reader = RangeReader(self.server.url, headers={"Authorization": "Bearer token"})
+        open_sdk_session = mock.Mock()
+        segy = RangeReadSegySession(reader, SDPATH, open_sdk_session)
+
+        assert json.loads(segy.get_ascii_headers_as_json())["Textualheader"] == \
+            load_sdk_header('integration_test_segy_textualHeader_response.json')
+        assert json.loads(segy.get_binary_header_as_json()) == \
+            json.loads(load_sdk_header('integration_test_segy_binaryHeader_response.json'))
+        assert json.loads(segy.get_raw_trace_headers_as_json(1, 100)) == \
+            json.loads(load_sdk_header('integration_test_segy_rawTraceHeaders_response.json'))
+        assert segy.get_revision() == 0
+        open_sdk_session.assert_not_called()
+
+        # 3600 bytes of file header and 100 trace headers out of a 2 MB file
+        assert self.server.bytes_sent == 3600 + 100 * 240
+        assert self.server.bytes_sent < len(self.content) / 50
+
+    def test_other_calls_use_segysdk(self):
+        sdk_session = mock.Mock()
+        sdk_session.is_3d.return_value = 1
+        segy = RangeReadSegySession(RangeReader(self.server.url), SDPATH, lambda: sdk_session)
+        assert segy.is_3d() == 1
+        assert self.server.requests == []
+
+
+class SDPathTest(unittest.TestCase):
+
+    def test_parse_sdpath(self):
+        assert parse_sdpath('sd://tenant/subproject/a/b/data.sgy') == ('tenant', 'subproject', '/a/b/', 'data.sgy')
+        assert parse_sdpath('sd://tenant/subproject/data.sgy').dataset_path == '/data.sgy'
+        with self.assertRaises(ValueError):
+            parse_sdpath('gs://bucket/data.sgy')
+
+    def test_segy_sessions_use_range_reads_when_configured(self):
+        from api.routes import route_segy
+        from core.config import Settings
+        open_segy_session = getattr(route_segy, '__open_segy_session')
+        with mock.patch.object(Settings, 'SEGY_RANGE_READ_URL', 'https://storage/{tenant}/{subproject}{path}{name}'):
+            segy = open_segy_session('sd://tenant/subproject/a/data.sgy', 'Bearer token', 'key')
+        assert isinstance(segy, RangeReadSegySession)
+        assert segy.reader.url == 'https://storage/tenant/subproject/a/data.sgy'
+        assert segy.reader.headers == {"Authorization": "Bearer token"}
@@ -0,0 +1,23 @@
+import asyncio
+import io
+import unittest
+
+from api.responses import BufferResponse
+
+
+class BufferResponseTest(unittest.TestCase):
+
+    def test_buffer_is_sent_as_bytes_chunks(self):
+        response = BufferResponse(io.BytesIO(b"abcdefg"), media_type="application/octet-stream")
+        response.chunk_size = 3
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(response(None, None, send))
+        assert response.headers["content-length"] == "7"
+        bodies = [message for message in messages if message["type"] == "http.response.body"]
+        assert [type(body["body"]) for body in bodies] == [bytes] * 3
+        assert [body["body"] for body in bodies] == [b"abc", b"def", b"g"]
+        assert [body["more_body"] for body in bodies] == [True, True, False]
@@ -0,0 +1,188 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+sys.modules.setdefault('openzgycpp', Mock(ZgyError=type('ZgyError', (Exception,), {})))
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import route_batch, route_openzgy, route_segy
+from api.routes.route_batch import extract_metadata, router
+from core.writeback import WritebackPipeline
+from core.config import Settings
+from core.session_pool import SessionLease
+from unit.util import apply_test_settings
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+TEST_HEADERS = {
+    'appkey': 'xvz1evFS4wEEPTGEFPHBog',
+    'Authorization': 'Bearer token',
+}
+
+apply_test_settings()
+
+
+class MockSegySession:
+
+    def get_revision(self):
+        return 1
+
+    def is_3d(self):
+        return 0
+
+    def get_trace_header_field_count(self):
+        return 73
+
+    def get_ascii_headers_as_json(self):
+        return '{"Textualheader": "C 1 CLIENT"}'
+
+    def get_extended_ascii_headers_as_json(self):
+        return '{}'
+
+    def get_binary_header_as_json(self):
+        return '{"BinaryHeaders": []}'
+
+
+class ConcurrencyProbe:
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, sdpath, bearer, api_key):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if 'missing' in sdpath:
+            raise route_openzgy.zgy.ZgyError("Dataset not found: HTTP 404")
+        return {'Size': [10, 20, 30]}
+
+
+class RouteBatchTest(unittest.TestCase):
+
+    def post(self, body):
+        response = client.post(Settings.BASE_URL + Settings.API_PATH + "batch/metadata", json=body, headers=TEST_HEADERS)
+        return response, [json.loads(line) for line in response.text.splitlines()]
+
+    def test_batch_mixes_segy_and_zgy_results_and_errors(self):
+        def open_session(bearer, api_key, sdpath):
+            if 'forbidden' in sdpath:
+                raise route_segy.segy_error(route_segy.segysdk.SegyException("Access denied: HTTP 403"))
+            return SessionLease(MockSegySession())
+
+        with mock.patch('api.routes.route_segy.__create_segy_session', side_effect=open_session), \
+                mock.patch('api.routes.route_openzgy.__read_headers', ConcurrencyProbe()):
+            response, results = self.post({"sdpaths": [
+                "sd://t/s/a.sgy", "sd://t/s/forbidden.segy", "sd://t/s/b.zgy", "sd://t/s/missing.zgy", "sd://t/s/c.txt"]})
+
+        assert response.status_code == 200
+        by_path = {result['sdpath']: result for result in results}
+        assert by_path["sd://t/s/a.sgy"]["status"] == 200
+        assert by_path["sd://t/s/a.sgy"]["type"] == "segy"
+        assert by_path["sd://t/s/a.sgy"]["metadata"]["traceHeaderFieldCount"] == 73
+        assert by_path["sd://t/s/a.sgy"]["metadata"]["is3D"] is False
+        assert by_path["sd://t/s/forbidden.segy"]["status"] == 403
+        assert by_path["sd://t/s/b.zgy"] == {"sdpath": "sd://t/s/b.zgy", "type": "zgy", "status": 200, "metadata": {"Size": [10, 20, 30]}}
+        assert by_path["sd://t/s/missing.zgy"]["status"] == 404
+        assert by_path["sd://t/s/c.txt"]["status"] == 400
+
+    def test_batch_parallelism_is_bounded(self):
+        probe = ConcurrencyProbe()
+        sdpaths = [f"sd://t/s/{i}.zgy" for i in range(12)]
+        with mock.patch('api.routes.route_openzgy.__read_headers', probe):
+            response, results = self.post({"sdpaths": sdpaths, "parallelism": 3})
+
+        assert response.status_code == 200
+        assert sorted(result['sdpath'] for result in results) == sorted(sdpaths)
+        assert 1 < probe.peak <= 3
+
+    @mock.patch.object(Settings, 'BATCH_MAX_ITEMS', 2)
+    def test_batch_size_is_capped(self):
+        response = client.post(Settings.BASE_URL + Settings.API_PATH + "batch/metadata",
+                               json={"sdpaths": ["a.sgy", "b.sgy", "c.sgy"]}, headers=TEST_HEADERS)
+        assert response.status_code == 413
+
+
+class InMemorySdms:
+
+    def __init__(self, records):
+        self.records = records
+        self.patches = []
+
+    async def get_dataset(self, sdpath, bearer, api_key):
+        return self.records[sdpath]
+
+    async def lock_dataset(self, sdpath, bearer, api_key):
+        return {**self.records[sdpath], "sbit": "W1"}
+
+    async def unlock_dataset(self, sdpath, bearer, api_key):
+        pass
+
+    async def patch_dataset(self, sdpath, bearer, api_key, record, close=None):
+        self.patches.append(sdpath)
+        self.records[sdpath] = {**self.records[sdpath], **record}
+
+
+class RouteBatchWritebackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sdms = InMemorySdms({f"sd://t/s/{name}": {"filemetadata": {"size": 100}} for name in ["a.zgy", "b.zgy"]})
+        pipeline = WritebackPipeline(extract_metadata, self.sdms, 2, 0, 0.0, 60, 100)
+        # the workers run in the event loop of the test client
+        self.addCleanup(lambda: asyncio.get_event_loop().run_until_complete(pipeline.close()))
+        for patcher in [mock.patch.object(route_batch, 'writeback_pipeline', pipeline),
+                        mock.patch('api.routes.route_openzgy.__read_headers', ConcurrencyProbe())]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, sdpaths, headers=None):
+        return client.post(Settings.BASE_URL + Settings.API_PATH + "batch/writeback", json={"sdpaths": sdpaths},
+                           headers={**TEST_HEADERS, **(headers or {})})
+
+    def status(self, job_id, headers=TEST_HEADERS):
+        return client.get(Settings.BASE_URL + Settings.API_PATH + "batch/writeback/" + job_id, headers=headers)
+
+    def test_streamed_write_back(self):
+        response = self.post(["sd://t/s/a.zgy", "sd://t/s/b.zgy", "sd://t/s/c.txt"],
+                             headers={'Accept': 'application/x-ndjson', 'Idempotency-Key': 'k1'})
+        assert response.status_code == 200
+        results = {result['sdpath']: result for result in map(json.loads, response.text.splitlines())}
+        assert results["sd://t/s/a.zgy"]["status"] == "written"
+        assert results["sd://t/s/c.txt"]["errorStatus"] == 400
+        assert self.sdms.records["sd://t/s/a.zgy"]["filemetadata"] == {"size": 100, "zgy": {"Size": [10, 20, 30]}}
+
+        job = self.status(response.headers['x-job-id']).json()
+        assert job['status'] == 'done'
+        assert job['counts'] == {'pending': 0, 'written': 2, 'unchanged': 0, 'failed': 1, 'expired': 0}
+        assert self.status(response.headers['x-job-id'], headers={**TEST_HEADERS, 'Authorization': 'Bearer other'}).status_code == 404
+
+        again = self.post(["sd://t/s/a.zgy"], headers={'Idempotency-Key': 'k1'})
+        assert again.json()['id'] == response.headers['x-job-id']
+        assert sorted(self.sdms.patches) == ["sd://t/s/a.zgy", "sd://t/s/b.zgy"]
+
+    def test_submitted_job(self):
+        response = self.post(["sd://t/s/a.zgy"])
+        assert response.status_code == 202
+        assert response.json()['counts']['pending'] == 1
+        assert self.status('unknown').status_code == 404
+
+    def test_write_back_needs_a_single_process(self):
+        with mock.patch.object(Settings, 'WORKERS', 2):
+            assert self.post(["sd://t/s/a.zgy"]).status_code == 501
+            assert self.status('unknown').status_code == 501
+        assert self.sdms.patches == []
@@ -0,0 +1,289 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+sys.modules.setdefault('openzgycpp', Mock(ZgyError=type('ZgyError', (Exception,), {})))
+
+import json
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import route_openzgy
+from api.routes.route_openzgy import router
+from core.config import Settings
+from core.session_pool import SessionPool
+from core.zgy_volume import lod_size
+from unit.util import apply_test_settings
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+TEST_HEADERS = {
+    'appkey': 'xvz1evFS4wEEPTGEFPHBog',
+    'Authorization': 'Bearer token',
+}
+SDPATH = 'sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.zgy'
+
+apply_test_settings()
+
+
+class MockZgyReader:
+    """Survey of 6 x 6 traces with 55 m bins, inline 500..505 and crossline 360..365."""
+
+    def __init__(self, sdpath, iocontext=None):
+        self.closed = False
+        self.verid = 'a1b2c3'
+        self.size = (6, 6, 10)
+        self.bricksize = (64, 64, 64)
+        self.datatype = 'SampleDataType.float'
+        self.datarange = (-1.0, 1.0)
+        self.zunitdim = 'UnitDimension.time'
+        self.zunitname = 'ms'
+        self.zunitfactor = 0.001
+        self.zstart = 0.0
+        self.zinc = 4.0
+        self.hunitdim = 'UnitDimension.length'
+        self.hunitname = 'm'
+        self.hunitfactor = 1.0
+        self.annotstart = (500.0, 360.0)
+        self.annotinc = (1.0, 1.0)
+        self.indexcorners = ((0, 0), (5, 0), (0, 5), (5, 5))
+        self.annotcorners = ((500, 360), (505, 360), (500, 365), (505, 365))
+        self.corners = ((1598582.0, -170134.0), (1598582.0, -170409.0),
+                        (1598857.0, -170134.0), (1598857.0, -170409.0))
+        self.nlods = 1
+        self.brickcount = [(1, 1, 1)]
+        self.statistics = (360, 0.0, 120.0, -1.0, 1.0)
+        self.histogram = (360, -1.0, 1.0, [0] * 256)
+        self.reads = []
+
+    def read(self, start, data, lod=0):
+        """Fills data with the samples of level lod at start, sample (i, j, k) being i * 10000 + j * 100 + k."""
+        end = [s + n for s, n in zip(start, data.shape)]
+        if any(s < 0 or e > n for s, e, n in zip(start, end, lod_size(self.size, lod))) or lod >= self.nlods:
+            raise route_openzgy.zgy.ZgyError(f"Read outside of the survey at lod {lod}")
+        i, j, k = np.meshgrid(*[np.arange(s, e) for s, e in zip(start, end)], indexing='ij')
+        data[...] = i * 10000 + j * 100 + k
+        self.reads.append((tuple(start), data.shape, lod))
+
+    def close(self):
+        self.closed = True
+
+
+class MockLargeZgyReader(MockZgyReader):
+    """Survey of 100 x 80 x 50 samples in bricks of 16, with 4 levels of detail."""
+
+    def __init__(self, sdpath, iocontext=None):
+        super().__init__(sdpath, iocontext)
+        self.size = (100, 80, 50)
+        self.bricksize = (16, 16, 16)
+        self.nlods = 4
+        self.brickcount = [(7, 5, 4), (4, 3, 2), (2, 2, 1), (1, 1, 1)]
+
+
+class RouteOpenZgyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.readers = []
+        self.reader_class = MockZgyReader
+
+        def open_reader(sdpath, iocontext=None):
+            reader = self.reader_class(sdpath, iocontext)
+            self.readers.append(reader)
+            return reader
+
+        patcher = mock.patch.object(route_openzgy.zgy, 'ZgyReader', side_effect=open_reader)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = SessionPool(getattr(route_openzgy, '__open_zgy_reader'), 2, 60)
+        patcher = mock.patch.object(route_openzgy, 'zgy_reader_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, route, sdpath=SDPATH, headers=TEST_HEADERS):
+        return client.get(Settings.BASE_URL + Settings.API_PATH + route + "?sdpath=" + sdpath, headers=headers)
+
+    def test_headers(self):
+        response = self.get("openzgy/headers")
+        assert response.status_code == 200
+        headers = json.loads(response.json())
+        assert headers['Size'] == [6, 6, 10]
+        assert headers['InlineStart'] == 500.0
+        assert headers['Statistics']['Count'] == 360
+
+    def test_native_json_format(self):
+        headers = self.get("openzgy/headers", sdpath=SDPATH + "&json_format=native")
+        assert headers.json()['Size'] == [6, 6, 10]
+        bingrid = self.get("openzgy/bingrid", sdpath=SDPATH + "&json_format=native")
+        assert bingrid.json() == json.loads(self.get("openzgy/bingrid").json())
+
+    def test_headers_and_bingrid_share_one_reader(self):
+        assert self.get("openzgy/headers").status_code == 200
+        assert self.get("openzgy/bingrid").status_code == 200
+        assert self.get("openzgy/headers").status_code == 200
+        assert len(self.readers) == 1
+        assert not self.readers[0].closed
+        assert self.pool.hits == 2
+
+    def test_readers_are_not_shared_between_callers(self):
+        self.get("openzgy/headers")
+        self.get("openzgy/headers", headers={**TEST_HEADERS, 'Authorization': 'Bearer other'})
+        assert len(self.readers) == 2
+
+    def test_open_readers_are_capped(self):
+        for name in ['a', 'b', 'c']:
+            assert self.get("openzgy/headers", sdpath=f"sd%3A%2F%2Fopendes%2Fkt-demo%2F{name}.zgy").status_code == 200
+        assert [reader.closed for reader in self.readers] == [True, False, False]
+        assert len(self.pool) == 2
+
+    def transform(self, source, target, **kwargs):
+        return client.post(Settings.BASE_URL + Settings.API_PATH +
+                           f"openzgy/transform?sdpath={SDPATH}&source={source}&target={target}", **kwargs)
+
+    def test_transform_json(self):
+        response = self.transform("annotation", "world", headers=TEST_HEADERS,
+                                  json={"points": [[500, 360], [505, 365], [500, 365], [502.5, 361]]})
+        assert response.status_code == 200
+        np.testing.assert_allclose(response.json()["points"], [
+            [1598582.0, -170134.0], [1598857.0, -170409.0], [1598857.0, -170134.0], [1598637.0, -170271.5]])
+
+    def test_transform_binary_round_trip(self):
+        rng = np.random.default_rng(0)
+        points = np.stack([rng.uniform(0, 5, 100000), rng.uniform(0, 5, 100000)], axis=1)
+        headers = {**TEST_HEADERS, 'Content-Type': 'application/octet-stream'}
+        world = self.transform("index", "world", headers=headers, data=points.astype('<f8').tobytes())
+        assert world.status_code == 200
+        assert world.headers['content-type'] == 'application/octet-stream'
+        back = self.transform("world", "index", headers=headers, data=world.content)
+        np.testing.assert_allclose(np.frombuffer(back.content, dtype='<f8').reshape(-1, 2), points, atol=1e-6)
+        assert len(self.readers) == 1
+
+    def test_transform_invalid_input(self):
+        headers = {**TEST_HEADERS, 'Content-Type': 'application/octet-stream'}
+        assert self.transform("index", "world", headers=headers, data=b"\0" * 20).status_code == 400
+        assert self.transform("index", "world", headers=TEST_HEADERS, json={"x": [1]}).status_code == 400
+        assert self.transform("index", "world", headers=TEST_HEADERS, json={"points": [1, 2, 3]}).status_code == 400
+        assert self.transform("index", "map", headers=TEST_HEADERS, json={"points": []}).status_code == 422
+
+    def volume(self, route, query):
+        return client.get(Settings.BASE_URL + Settings.API_PATH + route + "?sdpath=" + SDPATH + "&" + query,
+                          headers=TEST_HEADERS)
+
+    def test_slices_at_full_resolution(self):
+        response = self.volume("openzgy/slice", "axis=crossline&index=2")
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/octet-stream'
+        assert response.headers['x-array-shape'] == '6,10'
+        assert response.headers['x-lod'] == '0'
+        samples = np.frombuffer(response.content, dtype='<f4').reshape(6, 10)
+        assert samples[3, 4] == 30204
+        time_slice = self.volume("openzgy/slice", "axis=time&index=9")
+        assert time_slice.headers['x-array-shape'] == '6,6'
+        assert time_slice.headers['x-index-start'] == '0,0,9'
+        assert np.frombuffer(time_slice.content, dtype='<f4')[-1] == 50509
+
+    def test_coarsest_lod_meeting_the_resolution(self):
+        self.reader_class = MockLargeZgyReader
+        response = self.volume("openzgy/slice", "axis=inline&index=37&resolution=20")
+        assert response.status_code == 200
+        assert response.headers['x-lod'] == '1'
+        assert response.headers['x-array-shape'] == '40,25'
+        assert response.headers['x-index-start'] == '36,0,0'
+        assert response.headers['x-index-step'] == '2'
+        samples = np.frombuffer(response.content, dtype='<f4').reshape(40, 25)
+        assert samples[39, 24] == 180000 + 3900 + 24
+        assert self.volume("openzgy/slice", "axis=inline&index=37&resolution=10").headers['x-lod'] == '2'
+        assert self.volume("openzgy/slice", "axis=inline&index=37&resolution=1").headers['x-lod'] == '3'
+
+    def test_subvolume_is_streamed_by_brick_row(self):
+        self.reader_class = MockLargeZgyReader
+        response = self.volume("openzgy/subvolume", "inline_start=10&inline_count=40&crossline_count=20&time_start=5&time_count=3")
+        assert response.status_code == 200
+        assert response.headers['x-array-shape'] == '40,20,3'
+        assert int(response.headers['content-length']) == 40 * 20 * 3 * 4
+        samples = np.frombuffer(response.content, dtype='<f4').reshape(40, 20, 3)
+        i, j, k = np.meshgrid(np.arange(10, 50), np.arange(20), np.arange(5, 8), indexing='ij')
+        np.testing.assert_array_equal(samples, i * 10000 + j * 100 + k)
+        # brick rows along the inlines, each read in columns of bricks along the crosslines
+        assert [read[0][:2] for read in self.readers[0].reads] == [(10, 0), (10, 16), (16, 0), (16, 16),
+                                                                  (32, 0), (32, 16), (48, 0), (48, 16)]
+        assert {read[1] for read in self.readers[0].reads} == {(6, 16, 3), (6, 4, 3), (16, 16, 3), (16, 4, 3),
+                                                               (2, 16, 3), (2, 4, 3)}
+
+    def test_boxes_above_the_sample_limit_are_refused(self):
+        self.reader_class = MockLargeZgyReader
+        with mock.patch.object(Settings, 'ZGY_VOLUME_MAX_SAMPLES', 1000):
+            response = self.volume("openzgy/subvolume", "inline_count=20&crossline_count=20&time_count=10")
+            assert response.status_code == 413
+            assert 'lower resolution' in response.json()['detail']
+            response = self.volume("openzgy/subvolume", "inline_count=20&crossline_count=20&time_count=10&resolution=5")
+            assert response.status_code == 200
+            assert response.headers['x-array-shape'] == '10,10,5'
+        assert self.readers[0].reads == [((0, 0, 0), (10, 10, 5), 1)]
+        assert all(entry.refs == 0 for entry in self.pool._entries.values())
+
+    def test_int8_samples_are_quantized_over_the_data_range(self):
+        response = self.volume("openzgy/subvolume", "inline_count=1&crossline_count=1&time_count=2&dtype=int8")
+        assert response.status_code == 200
+        assert response.headers['x-array-dtype'] == 'int8'
+        assert response.headers['x-value-range'] == '-1.0,1.0'
+        assert np.frombuffer(response.content, dtype="i1").tolist() == [0, 127]
+
+    def test_volume_outside_of_the_survey(self):
+        assert self.volume("openzgy/slice", "axis=inline&index=6").status_code == 400
+        assert self.volume("openzgy/subvolume", "time_start=8&time_count=5").status_code == 400
+        assert self.volume("openzgy/slice", "axis=depth&index=0").status_code == 422
+        assert self.pool._entries and all(entry.refs == 0 for entry in self.pool._entries.values())
+
+    def test_exact_region_statistics(self):
+        self.reader_class = MockLargeZgyReader
+        response = self.volume("openzgy/statistics", "inline_start=10&inline_count=40&crossline_count=20"
+                                                     "&time_start=5&time_count=3&bins=10&minimum=0&maximum=500000")
+        assert response.status_code == 200
+        result = response.json()
+        i, j, k = np.meshgrid(np.arange(10, 50), np.arange(20), np.arange(5, 8), indexing='ij')
+        values = (i * 10000 + j * 100 + k).astype(np.float64).ravel()
+        assert result['Mode'] == 'exact' and result['Lod'] == 0 and result['Size'] == [40, 20, 3]
+        statistics = result['Statistics']
+        assert statistics['Count'] == 2400
+        assert statistics['Minimum'] == 100005 and statistics['Maximum'] == 491907
+        np.testing.assert_allclose([statistics['Sum'], statistics['SumOfSquares']], [values.sum(), values @ values])
+        assert result['Histogram']['Bins'] == np.histogram(values, bins=10, range=(0, 500000))[0].tolist()
+        assert len(self.readers[0].reads) == 8
+
+    def test_estimated_region_statistics_read_a_coarse_lod(self):
+        self.reader_class = MockLargeZgyReader
+        with mock.patch.object(Settings, 'ZGY_STATISTICS_ESTIMATE_RESOLUTION', 10):
+            response = self.volume("openzgy/statistics", "mode=estimate&bins=4")
+        assert response.status_code == 200
+        result = response.json()
+        assert result['Lod'] == 2
+        assert result['Statistics']['Count'] == 100 * 80 * 50
+        assert abs(sum(result['Histogram']['Bins']) - 100 * 80 * 50) <= 4
+        assert {read[2] for read in self.readers[0].reads} == {2}
+
+    def test_failed_brick_stops_the_region_statistics(self):
+        class FailingZgyReader(MockLargeZgyReader):
+            def read(self, start, data, lod=0):
+                if len(self.reads) == 3:
+                    raise route_openzgy.zgy.ZgyError("Brick read failed, HTTP 503")
+                super().read(start, data, lod)
+
+        self.reader_class = FailingZgyReader
+        with mock.patch.object(Settings, 'ZGY_STATISTICS_PARALLELISM', 1):
+            response = self.volume("openzgy/statistics", "bins=4")
+        assert response.status_code == 503
+        # 140 bricks, none read after the failed one
+        assert len(self.readers[0].reads) == 3
+        assert all(entry.refs == 0 for entry in self.pool._entries.values())
+
+    def test_region_statistics_errors(self):
+        assert self.volume("openzgy/statistics", "minimum=1&maximum=1").status_code == 400
+        assert self.volume("openzgy/statistics", "inline_start=9").status_code == 400
+        assert all(entry.refs == 0 for entry in self.pool._entries.values())
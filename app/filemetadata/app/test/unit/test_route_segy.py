@@ -1,18 +1,29 @@
 import sys
 from unittest.mock import Mock
 
-sys.modules['segysdk'] = Mock()
+sys.modules['segysdk'] = Mock(SegyException=type('SegyException', (Exception,), {}))
 
+import io
+import json
 import unittest
 from unittest import mock
 
+import numpy as np
+
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from api.routes.route_segy import router
 from core.config import Settings
+from core.session_pool import SessionLease
 from unit.util import apply_test_settings
 
 client = TestClient(router)
 
+# the bare router has no exception handlers, error responses need an application around it
+app = FastAPI()
+app.include_router(router)
+app_client = TestClient(app)
+
 TEST_HEADERS = {
     'content': 'application/json',
     'appkey': 'xvz1evFS4wEEPTGEFPHBog',
@@ -57,6 +68,48 @@ class MockSegySession:
         return self.scaled_trace_headers_as_json
 
 
+TRACE_HEADERS_JSON = json.dumps({
+    "Metadata": {
+        "ColumnHeaders": [
+            {"End": 4, "Id": "TraceSequenceLine", "Start": 1},
+            {"End": 72, "Id": "ScalarForCoordinates", "Start": 71}
+        ],
+        "StartTrace": 1,
+        "TraceCount": 2
+    },
+    "TraceData": [
+        {"TraceNo": 1, "Traces": [1.0, -100.0]},
+        {"TraceNo": 2, "Traces": [2.0, -100.0]}
+    ]
+})
+
+
+BINARY_HEADER_JSON = json.dumps({
+    "BinaryHeaders": [
+        {"End": 3218, "Id": "SampleInterval", "Start": 3217, "Value": 500.0},
+        {"End": 3222, "Id": "SamplesPerTrace", "Start": 3221, "Value": 10000.0}
+    ]
+})
+
+
+class MockTraceHeaderSession(MockSegySession):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def get_raw_trace_headers_as_json(self, start_trace, traces_to_dump):
+        self.calls.append((start_trace, traces_to_dump))
+        return json.dumps({
+            "Metadata": {
+                "ColumnHeaders": [{"End": 4, "Id": "TraceSequenceLine", "Start": 1}],
+                "StartTrace": start_trace,
+                "TraceCount": traces_to_dump
+            },
+            "TraceData": [{"TraceNo": n, "Traces": [float(n)]} for n in range(start_trace, start_trace + traces_to_dump)]
+        })
+
+
 apply_test_settings()
 
 
@@ -64,7 +117,7 @@ apply_test_settings()
 class RouteSegyTest(unittest.TestCase):
 
     def test_segy_revision(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/revision?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -72,7 +125,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.text == '1'
 
     def test_segy_is3D(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/is3D?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -80,7 +133,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.text == 'true'
 
     def test_segy_traceHeaderFieldCount(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/traceHeaderFieldCount?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -88,7 +141,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.text == '10'
 
     def test_segy_textualHeader(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/textualHeader?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -96,7 +149,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.json() == {"header": "TextualheaderValue"}
 
     def test_segy_extendedTextualHeaders(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/extendedTextualHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -104,7 +157,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.json() == {"header": "ExtendedTextualHeadersValue"}
 
     def test_segy_binaryHeader(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/binaryHeader?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
             headers=TEST_HEADERS)
@@ -112,7 +165,7 @@ class RouteSegyTest(unittest.TestCase):
         assert response.json() == {"header": "binaryHeaderValue"}
 
     def test_segy_rawTraceHeaders(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=5&start_trace=1",
             headers=TEST_HEADERS)
@@ -120,9 +173,143 @@ class RouteSegyTest(unittest.TestCase):
         assert response.json() == {"header": "rawTraceHeadersValue"}
 
     def test_segy_scaledTraceHeaders(self, mock_create_segy_session):
-        mock_create_segy_session.return_value = MockSegySession()
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
         response = client.get(
             Settings.BASE_URL + Settings.API_PATH + "segy/scaledTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=5&start_trace=1",
             headers=TEST_HEADERS)
         assert response.status_code == 200
         assert response.json() == {"header": "scaledTraceHeadersValue"}
+
+    def test_segy_rawTraceHeaders_npz(self, mock_create_segy_session):
+        session = MockSegySession()
+        session.raw_trace_headers_as_json = TRACE_HEADERS_JSON
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=2&start_trace=1",
+            headers={**TEST_HEADERS, 'Accept': 'application/x-npz'})
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-npz'
+        with np.load(io.BytesIO(response.content)) as columns:
+            assert columns['TraceNo'].tolist() == [1, 2]
+            assert columns['TraceSequenceLine'].tolist() == [1, 2]
+            assert columns['ScalarForCoordinates'].dtype == np.int16
+
+    def test_segy_scaledTraceHeaders_npz(self, mock_create_segy_session):
+        session = MockSegySession()
+        session.scaled_trace_headers_as_json = TRACE_HEADERS_JSON
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/scaledTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=2&start_trace=1",
+            headers={**TEST_HEADERS, 'Accept': 'application/x-npz'})
+        assert response.status_code == 200
+        with np.load(io.BytesIO(response.content)) as columns:
+            assert columns['ScalarForCoordinates'].tolist() == [-100.0, -100.0]
+            assert columns['ScalarForCoordinates'].dtype == np.float64
+
+    @mock.patch.object(Settings, 'TRACE_HEADER_CHUNK_TRACES', 3)
+    def test_segy_rawTraceHeaders_ndjson_is_fetched_in_chunks(self, mock_create_segy_session):
+        session = MockTraceHeaderSession()
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=7&start_trace=1",
+            headers={**TEST_HEADERS, 'Accept': 'application/x-ndjson'})
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[0]["Metadata"]["TraceCount"] == 7
+        assert [line["TraceNo"] for line in lines[1:]] == list(range(1, 8))
+        assert session.calls == [(1, 3), (4, 3), (7, 1)]
+
+    def test_segy_rawTraceHeaders_pages_follow_cursor(self, mock_create_segy_session):
+        session = MockTraceHeaderSession()
+        mock_create_segy_session.return_value = SessionLease(session)
+        url = Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=5&start_trace=1&page_size=2"
+        traces, cursor = [], None
+        while True:
+            response = client.get(url + (f"&cursor={cursor}" if cursor else ""), headers=TEST_HEADERS)
+            assert response.status_code == 200
+            traces += [trace["TraceNo"] for trace in json.loads(response.json()["header"])["TraceData"]]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        assert traces == [1, 2, 3, 4, 5]
+        assert session.calls == [(1, 2), (3, 2), (5, 1)]
+
+    def test_segy_rawTraceHeaders_invalid_cursor(self, mock_create_segy_session):
+        mock_create_segy_session.return_value = SessionLease(MockTraceHeaderSession())
+        response = app_client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=5&start_trace=1&cursor=garbage",
+            headers=TEST_HEADERS)
+        assert response.status_code == 400
+
+    @mock.patch.object(Settings, 'TRACE_HEADER_MAX_BUFFERED_TRACES', 4)
+    def test_segy_rawTraceHeaders_buffered_size_is_capped(self, mock_create_segy_session):
+        session = MockTraceHeaderSession()
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = app_client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/rawTraceHeaders?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&traces_to_dump=5&start_trace=1",
+            headers=TEST_HEADERS)
+        assert response.status_code == 413
+        assert session.calls == []
+
+    def test_segy_summary(self, mock_create_segy_session):
+        session = MockSegySession()
+        session.binary_header_as_json = BINARY_HEADER_JSON
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/summary?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy",
+            headers=TEST_HEADERS)
+        assert response.status_code == 200
+        assert response.json() == {
+            "revision": 1,
+            "is3D": True,
+            "traceHeaderFieldCount": 10,
+            "textualHeader": "TextualheaderValue",
+            "extendedTextualHeaders": "ExtendedTextualHeadersValue",
+            "binaryHeader": [
+                {"Id": "SampleInterval", "Start": 3217, "End": 3218, "Value": 500.0},
+                {"Id": "SamplesPerTrace", "Start": 3221, "End": 3222, "Value": 10000.0}
+            ]
+        }
+        assert mock_create_segy_session.call_count == 1
+
+    def test_segy_summary_fields(self, mock_create_segy_session):
+        session = Mock(wraps=MockSegySession())
+        mock_create_segy_session.return_value = SessionLease(session)
+        response = client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/summary?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&fields=revision,is3D",
+            headers=TEST_HEADERS)
+        assert response.status_code == 200
+        assert response.json() == {"revision": 1, "is3D": True}
+        session.get_binary_header_as_json.assert_not_called()
+
+    def test_segy_summary_unknown_field(self, mock_create_segy_session):
+        mock_create_segy_session.return_value = SessionLease(MockSegySession())
+        response = app_client.get(
+            Settings.BASE_URL + Settings.API_PATH + "segy/summary?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&fields=revision,size",
+            headers=TEST_HEADERS)
+        assert response.status_code == 400
+        mock_create_segy_session.assert_not_called()
+
+    def test_segy_headers_native_json_format(self, mock_create_segy_session):
+        session = MockTraceHeaderSession()
+        session.binary_header_as_json = '{"BinaryHeaders": [{"Id": "SamplesPerTrace", "Value": 4}]}'
+        session.extended_ascii_headers_as_json = '["first", "second"]'
+        mock_create_segy_session.return_value = SessionLease(session)
+        url = Settings.BASE_URL + Settings.API_PATH + "segy/{}?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy&json_format=native"
+        response = client.get(url.format("binaryHeader"), headers=TEST_HEADERS)
+        assert response.status_code == 200
+        assert response.json() == {"header": json.loads(session.binary_header_as_json)}
+        assert client.get(url.format("extendedTextualHeaders"), headers=TEST_HEADERS).json() == {"header": ["first", "second"]}
+        response = client.get(url.format("rawTraceHeaders") + "&start_trace=1&traces_to_dump=3", headers=TEST_HEADERS)
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {"header": json.loads(session.get_raw_trace_headers_as_json(1, 3))}
+
+    def test_segy_headers_json_format_setting(self, mock_create_segy_session):
+        session = MockSegySession()
+        session.binary_header_as_json = '{"BinaryHeaders": []}'
+        mock_create_segy_session.return_value = SessionLease(session)
+        url = Settings.BASE_URL + Settings.API_PATH + "segy/binaryHeader?sdpath=sd%3A%2F%2Fopendes%2Fkt-demo%2Fexample.sgy"
+        with mock.patch.object(Settings, 'JSON_FORMAT', 'native'):
+            assert client.get(url, headers=TEST_HEADERS).json() == {"header": {"BinaryHeaders": []}}
+            assert client.get(url + "&json_format=legacy", headers=TEST_HEADERS).json() == {"header": '{"BinaryHeaders": []}'}
+        assert app_client.get(url + "&json_format=xml", headers=TEST_HEADERS).status_code == 422
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fastapi import HTTPException
+
+from core.sdms_client import SdmsClient
+
+SDPATH = 'sd://opendes/kt-demo/a/b/example.sgy'
+RECORD = {'name': 'example.sgy', 'gcsurl': 'bucket/abc', 'generation': 7,
+          'filemetadata': {'size': 3600 + 100 * 240, 'nobjects': 1, 'type': 'GENERIC'}}
+
+
+class SdmsStandIn(ThreadingHTTPServer):
+    """Answers dataset requests from a script of statuses, then with RECORD, and records what it received."""
+
+    daemon_threads = True
+
+    def __init__(self, statuses=(), delay=0.0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/seistore-svc/api/v3"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests.append((self.path, dict(self.headers)))
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            status = server.statuses.pop(0) if server.statuses else 200
+        time.sleep(server.delay)
+        body = json.dumps(RECORD if status == 200 else {'error': status}).encode('utf-8')
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PATCH = do_PUT = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class SdmsClientTest(unittest.TestCase):
+
+    def stand_in(self, **kwargs):
+        server = SdmsStandIn(**kwargs)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def client(self, server, max_connections=4, retries=3):
+        self.sleeps = []
+
+        async def sleep(seconds):
+            self.sleeps.append(seconds)
+
+        client = SdmsClient(max_connections, retries, 0.2, 5, base_url=server.url, jitter=lambda: 1.0, sleep=sleep)
+        self.addCleanup(client.close)
+        return client
+
+    def test_dataset_descriptor(self):
+        server = self.stand_in()
+        descriptor = asyncio.run(self.client(server).get_descriptor(SDPATH, 'Bearer token', 'key'))
+        assert descriptor.as_dict() == {'name': 'example.sgy', 'size': 27600, 'nobjects': 1, 'generation': 7}
+        path, headers = server.requests[0]
+        assert path == '/seistore-svc/api/v3/dataset/tenant/opendes/subproject/kt-demo/dataset/example.sgy?path=%2Fa%2Fb%2F'
+        assert headers['Authorization'] == 'Bearer token' and headers['appkey'] == 'key'
+
+    def test_locked_update(self):
+        server = self.stand_in()
+        client = self.client(server)
+
+        async def main():
+            await client.lock_dataset(SDPATH, 'Bearer token', 'key')
+            await client.patch_dataset(SDPATH, 'Bearer token', 'key', {'filemetadata': {}}, close='W123')
+            await client.unlock_dataset(SDPATH, 'Bearer token', 'key')
+        asyncio.run(main())
+        dataset = '/seistore-svc/api/v3/dataset/tenant/opendes/subproject/kt-demo/dataset/example.sgy'
+        assert [path for path, _ in server.requests] == [dataset + '/lock?path=%2Fa%2Fb%2F&openmode=write',
+                                                         dataset + '?path=%2Fa%2Fb%2F&close=W123',
+                                                         dataset + '/unlock?path=%2Fa%2Fb%2F']
+
+    def test_connections_are_kept_alive(self):
+        server = self.stand_in()
+        client = self.client(server)
+
+        async def main():
+            for _ in range(10):
+                await client.get_dataset(SDPATH, 'Bearer token', 'key')
+        asyncio.run(main())
+        assert len(server.requests) == 10
+        assert len(server.connections) == 1
+
+    def test_concurrency_is_bounded(self):
+        server = self.stand_in(delay=0.05)
+        client = self.client(server, max_connections=2)
+
+        async def main():
+            await asyncio.gather(*(client.get_dataset(SDPATH, 'Bearer token', 'key') for _ in range(8)))
+        asyncio.run(main())
+        assert len(server.requests) == 8
+        assert server.max_in_flight == 2
+        assert len(server.connections) == 2
+
+    def test_unavailable_sdms_is_retried_with_backoff(self):
+        server = self.stand_in(statuses=[503, 429])
+        record = asyncio.run(self.client(server).get_dataset(SDPATH, 'Bearer token', 'key'))
+        assert record == RECORD
+        assert len(server.requests) == 3
+        assert self.sleeps == [0.2, 0.4]
+
+    def test_errors_after_the_last_retry(self):
+        server = self.stand_in(statuses=[503] * 3)
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(self.client(server, retries=2).get_dataset(SDPATH, 'Bearer token', 'key'))
+        assert raised.exception.status_code == 503
+        assert len(server.requests) == 3
+
+    def test_client_errors_are_not_retried(self):
+        server = self.stand_in(statuses=[403])
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(self.client(server).get_dataset(SDPATH, 'Bearer token', 'key'))
+        assert raised.exception.status_code == 403
+        assert len(server.requests) == 1
+        assert self.sleeps == []
+
+    def test_unreachable_sdms(self):
+        server = self.stand_in()
+        client = self.client(server, retries=1)
+        server.shutdown()
+        server.server_close()
+        with self.assertRaises(HTTPException) as raised:
+            asyncio.run(client.get_dataset(SDPATH, 'Bearer token', 'key'))
+        assert raised.exception.status_code == 502
+        assert len(self.sleeps) == 1
@@ -0,0 +1,191 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.route_segy import router
+from core.bingrid import compute_bingrid
+from core.config import Settings
+from core.session_pool import SessionLease
+from core.segy_bingrid import choose_coordinates, fit_bingrid, sample_trace_chunks, sample_trace_numbers
+from core.segy_decoder import BINARY_HEADER_DTYPES, TRACE_HEADER_SIZE, trace_header_dtype
+from core.segy_range_session import RangeReadSegySession
+from unit.test_trace_header_stats import FixtureSegySession
+from unit.util import apply_test_settings
+
+apply_test_settings()
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+BINGRID_URL = Settings.BASE_URL + Settings.API_PATH + 'segy/bingrid?sdpath=sd://opendes/kt-demo/survey.sgy'
+TEST_HEADERS = {'Authorization': 'Bearer token'}
+
+# inlines 100..120 every 2, crosslines 1000..1030, 25 m between inlines and 12.5 m between crosslines
+INLINES = np.arange(100, 121, 2)
+CROSSLINES = np.arange(1000, 1031)
+ORIGIN = np.array([450000.0, 6700000.0])
+INLINE_STEP = np.array([0.0, 25.0])
+CROSSLINE_STEP = np.array([12.5, 0.0])
+SAMPLES = 4
+
+
+def survey_world(inline, crossline):
+    return ORIGIN + np.multiply.outer((inline - INLINES[0]) / 2, INLINE_STEP) + \
+        np.multiply.outer(crossline - CROSSLINES[0], CROSSLINE_STEP)
+
+
+def make_survey():
+    """SEG-Y file of the survey above, with one dead trace at the end."""
+    binary_header = np.zeros(1, dtype=BINARY_HEADER_DTYPES[True])
+    binary_header["DataSampleFormatCode"] = 5
+    binary_header["SamplesPerTrace"] = SAMPLES
+    inline, crossline = [a.ravel() for a in np.meshgrid(INLINES, CROSSLINES, indexing="ij")]
+    world = survey_world(inline, crossline)
+    headers = np.zeros(len(inline) + 1, dtype=trace_header_dtype(TRACE_HEADER_SIZE + 4 * SAMPLES))
+    headers["TraceSequenceFile"][:-1] = np.arange(1, len(inline) + 1)
+    headers["InlineNumber"][:-1] = inline
+    headers["CrosslineNumber"][:-1] = crossline
+    headers["ScalarForCoordinates"][:-1] = -100
+    headers["CdpX"][:-1] = np.round(world[:, 0] * 100)
+    headers["CdpY"][:-1] = np.round(world[:, 1] * 100)
+    headers["SourceCoordinateX"][:-1] = np.round(world[:, 0] * 100)
+    headers["SourceCoordinateY"][:-1] = np.round(world[:, 1] * 100)
+    return b" " * 3200 + binary_header.tobytes() + headers.tobytes()
+
+
+def expected_bingrid():
+    annotcorners = [(INLINES[0], CROSSLINES[0]), (INLINES[-1], CROSSLINES[0]),
+                    (INLINES[0], CROSSLINES[-1]), (INLINES[-1], CROSSLINES[-1])]
+    corners = [survey_world(np.float64(i), np.float64(x)) for i, x in annotcorners]
+    return compute_bingrid(corners, np.asarray(annotcorners, dtype=np.float64), (2.0, 1.0),
+                           (len(INLINES), len(CROSSLINES))).as_dict()
+
+
+class BytesReader:
+    """RangeReader over an in-memory file."""
+
+    def __init__(self, content):
+        self.content = content
+        self.ranges = []
+
+    def size(self):
+        return len(self.content)
+
+    def read(self, offset, length):
+        return self.read_ranges([(offset, length)])[0]
+
+    def read_ranges(self, ranges, merge_gap=None):
+        self.ranges.extend(ranges)
+        return [self.content[offset:offset + length] for offset, length in ranges]
+
+    def close(self):
+        pass
+
+
+class SegyBinGridTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.raw = make_survey()
+
+    def test_sample_trace_numbers(self):
+        assert sample_trace_numbers(10, 0).tolist() == list(range(1, 11))
+        assert sample_trace_numbers(1000, 5).tolist() == [1, 251, 500, 750, 1000]
+
+    def test_sample_trace_chunks(self):
+        assert sample_trace_chunks(25, 0, 10) == [(1, 10), (11, 10), (21, 5)]
+        assert sample_trace_chunks(25, 3, 10) == [(1, 10), (11, 10), (21, 5)]
+        assert sample_trace_chunks(1000, 3, 10) == [(1, 10), (496, 10), (991, 10)]
+
+    def test_auto_coordinates_report_their_fallback(self):
+        assert choose_coordinates("auto", {"CdpX": np.array([1, 0]), "CdpY": np.array([0, 0])}) == ("cdp", None)
+        assert choose_coordinates("auto", {"CdpX": np.zeros(2), "CdpY": np.zeros(2)})[0] == "source"
+        assert choose_coordinates("auto", {"SourceCoordinateX": np.ones(2)})[0] == "source"
+        assert choose_coordinates("receiver", {}) == ("receiver", None)
+
+    def test_fit_matches_the_survey(self):
+        inline, crossline = [a.ravel() for a in np.meshgrid(INLINES, CROSSLINES, indexing="ij")]
+        world = survey_world(inline, crossline) + np.random.default_rng(0).normal(0, 0.01, (len(inline), 2))
+        bingrid, residuals = fit_bingrid(inline, crossline, world[:, 0], world[:, 1])
+        expected = expected_bingrid()
+        for field in ["P6BinGridOriginI", "P6BinGridOriginJ", "P6BinNodeIncrementOnIaxis", "P6BinNodeIncrementOnJaxis",
+                      "P6BinWidthOnIaxis", "P6BinWidthOnJaxis", "P6MapGridBearingOfBinGridJaxis"]:
+            assert bingrid.as_dict()[field] == expected[field], field
+        assert abs(bingrid.P6BinGridOriginEasting - ORIGIN[0]) < 0.01
+        assert residuals["Count"] == len(inline)
+        assert 0 < residuals["RMS"] < 0.05
+
+    def test_fit_needs_a_3d_grid(self):
+        with self.assertRaises(ValueError):
+            fit_bingrid([1, 1, 1], [1, 2, 3], [0.0, 1.0, 2.0], [0.0, 0.0, 0.0])
+
+    @mock.patch.object(Settings, 'SEGY_BINGRID_SAMPLE_TRACES', 50)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_range_read_sessions_fit_sparse_cdp_coordinates(self, mock_create_segy_session):
+        reader = BytesReader(self.raw)
+        mock_create_segy_session.return_value = SessionLease(RangeReadSegySession(reader, 'sd://opendes/kt-demo/survey.sgy', Mock()))
+        response = client.get(BINGRID_URL, headers=TEST_HEADERS)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["CoordinateSource"] == "cdp"
+        assert {k: v for k, v in body.items() if k.startswith("P6")} == \
+            {k: v for k, v in expected_bingrid().items() if k.startswith("P6")}
+        assert body["Residuals"]["Count"] == 49
+        assert body["Residuals"]["Maximum"] < 1e-6
+        # the file header and 50 trace headers, nothing else
+        assert len(reader.ranges) == 51
+        assert {length for _, length in reader.ranges[1:]} == {TRACE_HEADER_SIZE}
+
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_segysdk_sessions_fit_source_coordinates(self, mock_create_segy_session):
+        segy = FixtureSegySession(self.raw)
+        mock_create_segy_session.return_value = SessionLease(segy)
+        with mock.patch('core.sdms_client.sdms_client.get_dataset',
+                        new=mock.AsyncMock(return_value={'filemetadata': {'size': len(self.raw)}})):
+            response = client.get(BINGRID_URL + '&sample_traces=0', headers=TEST_HEADERS)
+            assert response.status_code == 200
+            assert response.json()["CoordinateSource"] == "source"
+            assert response.json()["CoordinateFallback"] == "The segysdk trace header document has no CDP X/Y"
+            assert response.json()["Residuals"]["Count"] == len(INLINES) * len(CROSSLINES)
+            # every trace, the dead one included, in one chunk
+            assert segy.calls == [(1, len(INLINES) * len(CROSSLINES) + 1)]
+
+            assert client.get(BINGRID_URL + '&coordinates=cdp', headers=TEST_HEADERS).status_code == 400
+
+    @mock.patch.object(Settings, 'SEGY_BINGRID_SAMPLE_CHUNKS', 4)
+    @mock.patch.object(Settings, 'TRACE_HEADER_CHUNK_TRACES', 40)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_segysdk_sessions_sample_chunks_of_traces(self, mock_create_segy_session):
+        segy = FixtureSegySession(self.raw)
+        mock_create_segy_session.return_value = SessionLease(segy)
+        with mock.patch('core.sdms_client.sdms_client.get_dataset',
+                        new=mock.AsyncMock(return_value={'filemetadata': {'size': len(self.raw)}})):
+            response = client.get(BINGRID_URL + '&sample_traces=100', headers=TEST_HEADERS)
+        assert response.status_code == 200
+        body = response.json()
+        assert {k: v for k, v in body.items() if k.startswith("P6")} == \
+            {k: v for k, v in expected_bingrid().items() if k.startswith("P6")}
+        # 100 of the 160 traces of 4 chunks spread over the 342 traces, the dead last one excluded from the fit
+        assert sorted(segy.calls) == [(1, 40), (102, 40), (202, 40), (303, 40)]
+        assert body["Residuals"]["Count"] == 99
+
+    @mock.patch.object(Settings, 'SEGY_BINGRID_SAMPLE_TRACES', 50)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_auto_falls_back_to_source_coordinates_without_cdp(self, mock_create_segy_session):
+        headers = np.frombuffer(self.raw[3600:], dtype=trace_header_dtype(TRACE_HEADER_SIZE + 4 * SAMPLES)).copy()
+        headers["CdpX"] = headers["CdpY"] = 0
+        reader = BytesReader(self.raw[:3600] + headers.tobytes())
+        mock_create_segy_session.return_value = SessionLease(RangeReadSegySession(reader, 'sd://opendes/kt-demo/survey.sgy', Mock()))
+        body = client.get(BINGRID_URL, headers=TEST_HEADERS).json()
+        assert body["CoordinateSource"] == "source"
+        assert body["CoordinateFallback"] == "The CDP X/Y of every sampled trace header are zero"
+        assert body["P6BinGridOriginEasting"] == expected_bingrid()["P6BinGridOriginEasting"]
@@ -0,0 +1,94 @@
+import ast
+import json
+import os
+import unittest
+
+import numpy as np
+
+from core.segy_decoder import (BINARY_HEADER_DTYPES, TRACE_HEADER_SIZE, binary_header_as_json, binary_header_from_json,
+                               decode_binary_header, decode_textual_header, decode_trace_headers,
+                               extended_textual_header_count, scaled_coordinates, textual_header_as_json,
+                               trace_headers_as_json)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'integration_test', 'features', 'data')
+SDPATH = 'sd://opendes//integration_test_dataset.sgy'
+
+
+def load_sdk_header(file_name):
+    with open(os.path.join(DATA_DIR, file_name)) as fp:
+        return ast.literal_eval(json.load(fp))['header']
+
+
+class SegyDecoderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(DATA_DIR, 'integration_test_dataset.sgy'), 'rb') as fp:
+            cls.raw = fp.read()
+
+    def test_textual_header_matches_segysdk(self):
+        expected = load_sdk_header('integration_test_segy_textualHeader_response.json')
+        assert decode_textual_header(self.raw) == expected
+        assert json.loads(textual_header_as_json(self.raw))["Textualheader"] == expected
+
+    def test_ascii_textual_header(self):
+        text = ("C 1 ASCII HEADER".ljust(80) * 40).encode("ascii")
+        assert decode_textual_header(text) == text.decode("ascii")
+
+    def test_binary_header_matches_segysdk(self):
+        binary_header = decode_binary_header(self.raw[3200:3600])
+        assert binary_header.big_endian
+        assert json.loads(binary_header_as_json(binary_header, SDPATH)) == \
+            json.loads(load_sdk_header('integration_test_segy_binaryHeader_response.json'))
+
+    def test_binary_header_layout(self):
+        binary_header = decode_binary_header(self.raw[3200:3600])
+        assert binary_header.sample_size == 2
+        assert binary_header.first_trace_offset == 3600
+        assert binary_header.trace_size == 240 + 2 * 10000
+        assert binary_header.trace_count(len(self.raw)) == 100
+
+    def test_binary_header_from_segysdk_document(self):
+        document = load_sdk_header('integration_test_segy_binaryHeader_response.json')
+        assert binary_header_from_json(document).trace_count(len(self.raw)) == 100
+        revision = json.loads(document)
+        revision['BinaryHeaders'][-1]['Value'] = 256.0
+        binary_header = binary_header_from_json(json.dumps(revision), extended_textual_headers=2)
+        assert binary_header.first_trace_offset == 3600 + 2 * 3200
+        assert binary_header.trace_count(len(self.raw) + 2 * 3200) == 100
+
+    def test_extended_textual_header_count(self):
+        assert extended_textual_header_count(load_sdk_header('integration_test_segy_extendedTextualHeaders_response.json')) == 0
+        assert extended_textual_header_count('{"1": "first", "2": "second"}') == 2
+        assert extended_textual_header_count('{"ExtendedTextualHeaders": ["first", "second", "third"]}') == 3
+
+    def test_little_endian_binary_header(self):
+        big_endian = np.frombuffer(self.raw[3200:3600], dtype=BINARY_HEADER_DTYPES[True], count=1)
+        little_endian = big_endian.astype(BINARY_HEADER_DTYPES[False]).tobytes()
+        binary_header = decode_binary_header(little_endian)
+        assert not binary_header.big_endian
+        assert binary_header["SamplesPerTrace"] == 10000
+
+    def test_trace_headers_match_segysdk(self):
+        binary_header = decode_binary_header(self.raw[3200:3600])
+        headers = decode_trace_headers(self.raw[3600:], 100, binary_header.trace_size)
+        assert json.loads(trace_headers_as_json(headers, 1, binary_header, SDPATH)) == \
+            json.loads(load_sdk_header('integration_test_segy_rawTraceHeaders_response.json'))
+
+    def test_packed_and_strided_trace_headers_agree(self):
+        binary_header = decode_binary_header(self.raw[3200:3600])
+        strided = decode_trace_headers(self.raw[3600:], 100, binary_header.trace_size)
+        packed = b"".join(self.raw[binary_header.trace_offset(i):binary_header.trace_offset(i) + TRACE_HEADER_SIZE]
+                          for i in range(100))
+        headers = decode_trace_headers(packed, 100)
+        for name in strided.dtype.names:
+            np.testing.assert_array_equal(strided[name], headers[name])
+
+    def test_scaled_coordinates(self):
+        headers = np.zeros(3, dtype=decode_trace_headers(bytes(TRACE_HEADER_SIZE), 1).dtype)
+        headers["ScalarForCoordinates"] = [-100, 10, 0]
+        headers["CdpX"] = [123456, 5, 7]
+        headers["CdpY"] = [-100, 2, 3]
+        x, y = scaled_coordinates(headers, "CdpX", "CdpY")
+        np.testing.assert_allclose(x, [1234.56, 50, 7])
+        np.testing.assert_allclose(y, [-1, 20, 3])
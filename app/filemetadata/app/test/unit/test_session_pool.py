@@ -0,0 +1,198 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+import unittest
+
+from core.executor import SdkExecutor
+from core.session_pool import SerializedSession, SessionPool, StreamedLease, token_expiry
+
+
+def make_token(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"Bearer header.{payload}.signature"
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SessionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.opened = []
+        self.closed = []
+        self.clock = FakeClock()
+
+    def factory(self, sdpath, bearer, api_key):
+        session = (sdpath, bearer, len(self.opened))
+        self.opened.append(session)
+        return session
+
+    def make_pool(self, max_size=2, idle_ttl=60):
+        return SessionPool(self.factory, max_size, idle_ttl, closer=self.closed.append, clock=self.clock)
+
+    def use(self, pool, sdpath, bearer, api_key):
+        with pool.acquire(sdpath, bearer, api_key) as session:
+            return session
+
+    def test_repeat_calls_reuse_session(self):
+        pool = self.make_pool()
+        first = self.use(pool, "sd://t/s/a.sgy", "token", "key")
+        second = self.use(pool, "sd://t/s/a.sgy", "token", "key")
+        assert first is second
+        assert len(self.opened) == 1
+        assert pool.hits == 1 and pool.misses == 1
+
+    def test_sessions_are_not_shared_between_callers(self):
+        pool = self.make_pool()
+        first = self.use(pool, "sd://t/s/a.sgy", "token-1", "key")
+        second = self.use(pool, "sd://t/s/a.sgy", "token-2", "key")
+        assert first is not second
+        assert len(self.opened) == 2
+
+    def test_least_recently_used_session_is_evicted(self):
+        pool = self.make_pool(max_size=2)
+        a = self.use(pool, "a", "token", "key")
+        b = self.use(pool, "b", "token", "key")
+        self.use(pool, "a", "token", "key")
+        self.use(pool, "c", "token", "key")
+        assert self.closed == [b]
+        assert self.use(pool, "a", "token", "key") is a
+        assert len(pool) == 2
+
+    def test_idle_session_is_reopened(self):
+        pool = self.make_pool(idle_ttl=60)
+        first = self.use(pool, "a", "token", "key")
+        self.clock.now += 61
+        second = self.use(pool, "a", "token", "key")
+        assert first is not second
+        assert self.closed == [first]
+
+    def test_session_is_dropped_when_token_expires(self):
+        pool = self.make_pool(idle_ttl=0)
+        bearer = make_token(self.clock.now + 120)
+        first = self.use(pool, "a", bearer, "key")
+        self.clock.now += 60
+        assert self.use(pool, "a", bearer, "key") is first
+        self.clock.now += 60
+        assert pool.evict_expired() == 1
+        assert self.closed == [first]
+
+    def test_close_releases_all_sessions(self):
+        pool = self.make_pool()
+        self.use(pool, "a", "token", "key")
+        self.use(pool, "b", "token", "key")
+        pool.close()
+        assert len(pool) == 0
+        assert len(self.closed) == 2
+
+    def test_pooling_disabled(self):
+        pool = self.make_pool(max_size=0)
+        self.use(pool, "a", "token", "key")
+        self.use(pool, "a", "token", "key")
+        assert len(self.opened) == 2
+
+    def test_session_in_use_is_evicted_last(self):
+        pool = self.make_pool(max_size=2)
+        with pool.acquire("a", "token", "key") as a:
+            b = self.use(pool, "b", "token", "key")
+            self.use(pool, "c", "token", "key")
+            assert self.closed == [b]
+            assert self.use(pool, "a", "token", "key") is a
+
+    def test_evicted_session_is_closed_on_last_release(self):
+        pool = self.make_pool(max_size=1)
+        with pool.acquire("a", "token", "key") as a:
+            with pool.acquire("a", "token", "key") as same:
+                assert same is a
+                self.use(pool, "b", "token", "key")
+            assert self.closed == []
+        assert self.closed == [a]
+        assert len(pool) == 1
+
+    def test_session_in_use_does_not_idle_out(self):
+        pool = self.make_pool(idle_ttl=60)
+        with pool.acquire("a", "token", "key") as a:
+            self.clock.now += 61
+            assert pool.evict_expired() == 0
+            assert self.use(pool, "a", "token", "key") is a
+
+    def test_acquire_without_pooling_closes_on_release(self):
+        pool = self.make_pool(max_size=0)
+        with pool.acquire("a", "token", "key") as a:
+            assert self.closed == []
+        assert self.closed == [a]
+
+    def test_lease_outlives_the_handler_that_acquired_it(self):
+        pool = self.make_pool(max_size=1)
+        lease = pool.acquire("a", "token", "key")
+        self.use(pool, "b", "token", "key")
+        self.use(pool, "c", "token", "key")
+        assert lease.session not in self.closed
+        lease.release()
+        lease.release()
+        assert self.closed.count(lease.session) == 1
+
+    def test_streamed_lease_is_released_after_the_read_in_flight(self):
+        pool = self.make_pool(max_size=0)
+        stream = StreamedLease(pool.acquire("a", "token", "key"), SdkExecutor(2))
+        reading, done = threading.Event(), threading.Event()
+
+        def read():
+            reading.set()
+            done.wait(5)
+            return 1
+
+        async def main():
+            # the stream of a disconnected client is cancelled during a read
+            task = asyncio.ensure_future(stream.run(read))
+            await asyncio.get_running_loop().run_in_executor(None, reading.wait)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await stream.close()
+            await stream.close()
+            assert self.closed == []
+            done.set()
+            for _ in range(100):
+                if self.closed:
+                    break
+                await asyncio.sleep(0.01)
+        asyncio.run(main())
+        assert self.closed == [stream.session]
+
+    def test_token_expiry(self):
+        assert token_expiry(make_token(1234)) == 1234
+        assert token_expiry("Bearer opaque-token") is None
+
+    def test_serialized_session_calls_one_at_a_time(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        class Session:
+            name = "not callable"
+
+            def read(self, n):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+                return n
+
+        session = SerializedSession(Session())
+        threads = [threading.Thread(target=session.read, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 1
+        assert session.name == "not callable"
+        assert session.read(3) == 3
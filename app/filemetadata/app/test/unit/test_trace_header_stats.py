@@ -0,0 +1,148 @@
+import sys
+from unittest.mock import Mock
+
+sys.modules.setdefault('segysdk', Mock(SegyException=type('SegyException', (Exception,), {})))
+
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+import requests_mock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes.route_segy import router
+from core.config import Settings
+from core.session_pool import SessionLease
+from core.segy_decoder import (FIRST_TRACE_OFFSET, TRACE_HEADER_FIELDS, binary_header_as_json, decode_binary_header,
+                               decode_trace_headers, trace_headers_as_json)
+from core.trace_header_stats import TraceHeaderHistograms, TraceHeaderSummary, statistics_as_json
+from core.trace_headers import parse_trace_headers
+from unit.util import apply_test_settings
+
+apply_test_settings()
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'integration_test', 'features', 'data')
+SDPATH = 'sd://opendes/kt-demo/example.sgy'
+SDMS_URL = 'https://sdms.unit-tests.com/seistore-svc/api/v3'
+DATASET_URL = SDMS_URL + '/dataset/tenant/opendes/subproject/kt-demo/dataset/example.sgy?path=%2F'
+STATISTICS_URL = Settings.BASE_URL + Settings.API_PATH + 'segy/traceHeaderStatistics?sdpath=' + SDPATH
+TEST_HEADERS = {'Authorization': 'Bearer token'}
+
+
+class FixtureSegySession:
+    """segysdk session stand-in answering from the integration test SEG-Y file."""
+
+    def __init__(self, raw):
+        self.binary_header = decode_binary_header(raw[3200:3600])
+        self.headers = decode_trace_headers(raw[FIRST_TRACE_OFFSET:], self.binary_header.trace_count(len(raw)),
+                                            self.binary_header.trace_size)
+        self.calls = []
+
+    def get_binary_header_as_json(self):
+        return binary_header_as_json(self.binary_header, SDPATH)
+
+    def get_raw_trace_headers_as_json(self, start_trace, traces_to_dump):
+        self.calls.append((start_trace, traces_to_dump))
+        headers = self.headers[start_trace - 1:start_trace - 1 + traces_to_dump]
+        return trace_headers_as_json(headers, start_trace, self.binary_header, SDPATH)
+
+
+class TraceHeaderStatisticsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(DATA_DIR, 'integration_test_dataset.sgy'), 'rb') as fp:
+            cls.raw = fp.read()
+
+    def setUp(self):
+        self.segy = FixtureSegySession(self.raw)
+
+    def chunk(self, start, count):
+        return parse_trace_headers(self.segy.get_raw_trace_headers_as_json(start, count))
+
+    def test_merged_chunks_equal_one_pass(self):
+        whole = TraceHeaderSummary.of(self.chunk(1, 100))
+        merged = TraceHeaderSummary.empty([])
+        for start in range(1, 101, 30):
+            merged = merged.merge(TraceHeaderSummary.of(self.chunk(start, min(30, 101 - start))))
+        assert merged.count == whole.count == 100
+        np.testing.assert_array_equal(merged.minimum, whole.minimum)
+        np.testing.assert_array_equal(merged.maximum, whole.maximum)
+        np.testing.assert_array_equal(merged.total, whole.total)
+
+        whole = TraceHeaderHistograms.of(self.chunk(1, 100), 8)
+        merged = TraceHeaderHistograms.empty([], 8)
+        for start in reversed(range(1, 101, 30)):
+            merged = merged.merge(TraceHeaderHistograms.of(self.chunk(start, min(30, 101 - start)), 8))
+        assert merged.count == 100
+        np.testing.assert_array_equal(merged.exponent, whole.exponent)
+        np.testing.assert_array_equal(merged.first, whole.first)
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        assert (merged.counts.sum(axis=1) == 100).all()
+
+    def test_histogram_bins_are_aligned_powers_of_two(self):
+        sequence = self.chunk(11, 50)
+        histograms = TraceHeaderHistograms.of(sequence, 5)
+        n = sequence.field_ids.index('TraceSequenceFile')
+        # values 6 to 30 need bins of 8 to fit in 5 bins aligned on multiples of the width
+        assert histograms.as_json(n) == {'Minimum': 0, 'Maximum': 32, 'BinWidth': 8, 'Bins': [4, 16, 16, 14]}
+        scalar = sequence.field_ids.index('ScalarForCoordinates')
+        assert histograms.as_json(scalar)['BinWidth'] == 1
+        assert sum(histograms.as_json(scalar)['Bins']) == 50
+
+    def test_statistics_as_json(self):
+        summary = TraceHeaderSummary.of(self.chunk(1, 100))
+        statistics = statistics_as_json(summary, TraceHeaderHistograms.of(self.chunk(1, 100), 4))
+        assert list(statistics) == [name for name, _, _ in TRACE_HEADER_FIELDS]
+        cdp = self.segy.headers['EnsembleNumber']
+        assert statistics['EnsembleNumber']['Minimum'] == cdp.min()
+        assert statistics['EnsembleNumber']['Maximum'] == cdp.max()
+        assert statistics['EnsembleNumber']['Mean'] == cdp.mean()
+        assert sum(statistics['EnsembleNumber']['Histogram']['Bins']) == 100
+
+    @mock.patch.object(Settings, 'TRACE_HEADER_CHUNK_TRACES', 16)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_endpoint_scans_given_traces_in_chunks(self, mock_create_segy_session):
+        mock_create_segy_session.return_value = SessionLease(self.segy)
+        response = client.get(STATISTICS_URL + '&start_trace=11&traces_to_scan=50&bins=5', headers=TEST_HEADERS)
+        assert response.status_code == 200
+        body = response.json()
+        assert (body['StartTrace'], body['TraceCount']) == (11, 50)
+        sequence = self.segy.headers['TraceSequenceFile'][10:60]
+        assert body['Fields']['TraceSequenceFile']['Minimum'] == sequence.min()
+        assert body['Fields']['TraceSequenceFile']['Maximum'] == sequence.max()
+        assert body['Fields']['TraceSequenceFile']['Histogram'] == \
+            {'Minimum': 0, 'Maximum': 32, 'BinWidth': 8, 'Bins': [4, 16, 16, 14]}
+        # one pass over 4 chunks, the last one shorter
+        assert sorted(self.segy.calls) == [(11, 16), (27, 16), (43, 16), (59, 2)]
+
+    @mock.patch.object(Settings, 'SDMS_URL', SDMS_URL)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_endpoint_scans_whole_file_by_default(self, mock_create_segy_session):
+        mock_create_segy_session.return_value = SessionLease(self.segy)
+        with requests_mock.Mocker(real_http=True) as sdms:
+            sdms.get(DATASET_URL, json={'filemetadata': {'size': len(self.raw), 'nobjects': 1}})
+            response = client.get(STATISTICS_URL + '&bins=0', headers=TEST_HEADERS)
+        assert response.status_code == 200
+        assert response.json()['TraceCount'] == 100
+        assert 'Histogram' not in response.json()['Fields']['TraceSequenceFile']
+
+    @mock.patch.object(Settings, 'SDMS_URL', SDMS_URL)
+    @mock.patch('api.routes.route_segy.__create_segy_session')
+    def test_trace_count_skips_extended_textual_headers(self, mock_create_segy_session):
+        revision = self.segy.binary_header.values.copy()
+        revision['SEGYFormatRevisionNumber'] = 0x0100
+        self.segy.binary_header = decode_binary_header(revision.tobytes())
+        self.segy.get_extended_ascii_headers_as_json = lambda: '{"1": "extended header", "2": "extended header"}'
+        mock_create_segy_session.return_value = SessionLease(self.segy)
+        with requests_mock.Mocker(real_http=True) as sdms:
+            sdms.get(DATASET_URL, json={'filemetadata': {'size': len(self.raw) + 2 * 3200, 'nobjects': 1}})
+            response = client.get(STATISTICS_URL + '&bins=0', headers=TEST_HEADERS)
+        assert response.status_code == 200
+        assert response.json()['TraceCount'] == 100
@@ -0,0 +1,53 @@
+import ast
+import json
+import os
+import unittest
+
+import numpy as np
+
+from core.trace_headers import TRACE_NUMBER_COLUMN, parse_trace_headers, to_npz
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'integration_test', 'features', 'data')
+
+
+def load_sdk_header(file_name):
+    with open(os.path.join(DATA_DIR, file_name)) as fp:
+        return ast.literal_eval(json.load(fp))['header']
+
+
+class TraceHeadersTest(unittest.TestCase):
+
+    def test_raw_trace_headers_are_typed_columns(self):
+        headers = parse_trace_headers(load_sdk_header('integration_test_segy_rawTraceHeaders_response.json'))
+        assert headers.start_trace == 1
+        assert headers.trace_count == 100
+        assert len(headers.field_ids) == 73
+        assert headers.columns[TRACE_NUMBER_COLUMN].tolist() == list(range(1, 101))
+        assert headers.columns['TraceSequenceLine'].dtype == np.int32
+        assert headers.columns['ScalarForCoordinates'].dtype == np.int16
+        assert headers.columns['SourceCoordinateX'][0] == 3647880
+        assert headers.columns['SamplesPerTrace'][0] == 10000
+
+    def test_scaled_trace_headers_are_float_columns(self):
+        headers = parse_trace_headers(load_sdk_header('integration_test_segy_scaledTraceHeaders_response.json'), raw=False)
+        assert headers.field_ids[:3] == ['ScalarForCoordinates', 'SourceCoordinateX', 'SourceCoordinateY']
+        assert all(column.dtype == np.float64 for name, column in headers.columns.items() if name != TRACE_NUMBER_COLUMN)
+
+    def test_values_that_do_not_fit_are_widened(self):
+        document = {
+            "Metadata": {"ColumnHeaders": [{"Id": "SamplesPerTrace", "Start": 115, "End": 116}], "StartTrace": 1, "TraceCount": 1},
+            "TraceData": [{"TraceNo": 1, "Traces": [40000.0]}]
+        }
+        headers = parse_trace_headers(json.dumps(document))
+        assert headers.columns['SamplesPerTrace'].dtype == np.int32
+        assert headers.columns['SamplesPerTrace'][0] == 40000
+
+    def test_npz_round_trip(self):
+        headers = parse_trace_headers(load_sdk_header('integration_test_segy_rawTraceHeaders_response.json'))
+        buffer = to_npz(headers)
+        buffer.seek(0)
+        with np.load(buffer) as loaded:
+            assert sorted(loaded.files) == sorted(headers.columns)
+            for name, column in headers.columns.items():
+                np.testing.assert_array_equal(loaded[name], column)
+                assert loaded[name].dtype == column.dtype
@@ -0,0 +1,208 @@
+import asyncio
+import base64
+import json
+import unittest
+
+from fastapi import HTTPException
+
+from core.writeback import WritebackPipeline
+
+RECORD = {'name': 'a.zgy', 'generation': 1, 'filemetadata': {'type': 'GENERIC', 'size': 1000, 'nobjects': 1}}
+
+
+def bearer_token(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"Bearer e30.{payload}.c2ln"
+
+
+class InMemorySdms:
+    """Dataset records by sdpath, with SDMS semantics for the fields a PATCH carries and for write locks."""
+
+    def __init__(self, records, lock_failures=0):
+        self.records = records
+        self.patches = []
+        self.locks = {}
+        self.lock_failures = lock_failures
+
+    async def get_dataset(self, sdpath, bearer, api_key):
+        if sdpath not in self.records:
+            raise HTTPException(status_code=404, detail=f"{sdpath} not found")
+        return self.records[sdpath]
+
+    async def lock_dataset(self, sdpath, bearer, api_key):
+        if sdpath in self.locks or self.lock_failures:
+            self.lock_failures = max(self.lock_failures - 1, 0)
+            raise HTTPException(status_code=423, detail=f"{sdpath} is locked")
+        self.locks[sdpath] = f"W{len(self.patches)}"
+        return {**self.records[sdpath], "sbit": self.locks[sdpath]}
+
+    async def unlock_dataset(self, sdpath, bearer, api_key):
+        self.locks.pop(sdpath, None)
+
+    async def patch_dataset(self, sdpath, bearer, api_key, record, close=None):
+        if sdpath in self.locks and close != self.locks[sdpath]:
+            raise HTTPException(status_code=423, detail=f"{sdpath} is locked")
+        self.patches.append((sdpath, record))
+        self.records[sdpath] = {**self.records[sdpath], **record}
+        if close is not None:
+            del self.locks[sdpath]
+        return self.records[sdpath]
+
+
+class ConcurrentWriter(InMemorySdms):
+    """Another client patching the filemetadata of the records right after they were read."""
+
+    async def get_dataset(self, sdpath, bearer, api_key):
+        record = await super().get_dataset(sdpath, bearer, api_key)
+        await self.patch_dataset(sdpath, bearer, api_key,
+                                 {"filemetadata": {**record["filemetadata"], "checksum": "abc"}})
+        return record
+
+
+class Extraction:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, sdpath, bearer, api_key):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "zgy", {"Size": (6, 6, 10), "Name": sdpath}
+
+
+class WritebackPipelineTest(unittest.TestCase):
+
+    def pipeline(self, extract, sdms, workers=2, retries=2, max_pending=100):
+        self.sleeps = []
+        self.now = 1000.0
+
+        async def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        return WritebackPipeline(extract, sdms, workers, retries, 1.0, 60, max_pending, jitter=lambda: 0.5, sleep=sleep,
+                                 clock=lambda: self.now)
+
+    def run_jobs(self, pipeline, *submissions):
+        async def main():
+            jobs = [pipeline.submit(*submission)[0] for submission in submissions]
+            for job in jobs:
+                async for _ in job.results():
+                    pass
+            await pipeline.close()
+            return [job.as_dict() for job in jobs]
+        return asyncio.run(main())
+
+    def test_metadata_is_merged_into_the_record_once(self):
+        sdms = InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)})
+        pipeline = self.pipeline(Extraction(), sdms)
+        first, second = self.run_jobs(pipeline, (['sd://t/s/a.zgy'], 'Bearer token', 'key'),
+                                      (['sd://t/s/a.zgy'], 'Bearer token', 'key'))
+        assert first['status'] == 'done'
+        assert first['items'] == [{'sdpath': 'sd://t/s/a.zgy', 'status': 'written', 'attempts': 1}]
+        assert second['counts'] == {'pending': 0, 'written': 0, 'unchanged': 1, 'failed': 0, 'expired': 0}
+        assert len(sdms.patches) == 1
+        assert sdms.records['sd://t/s/a.zgy']['filemetadata'] == {
+            'type': 'GENERIC', 'size': 1000, 'nobjects': 1, 'zgy': {'Size': [6, 6, 10], 'Name': 'sd://t/s/a.zgy'}}
+
+    def test_transient_errors_are_retried(self):
+        sdms = InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)})
+        extraction = Extraction(errors=[HTTPException(status_code=503, detail="busy")] * 2)
+        job, = self.run_jobs(self.pipeline(extraction, sdms), (['sd://t/s/a.zgy'], 'Bearer token', 'key'))
+        assert job['items'][0]['status'] == 'written'
+        assert job['items'][0]['attempts'] == 3
+        assert self.sleeps == [0.5, 1.0]
+
+    def test_failures_are_reported_per_dataset(self):
+        sdms = InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)})
+        extraction = Extraction(errors=[HTTPException(status_code=503, detail="busy")] * 3)
+        job, = self.run_jobs(self.pipeline(extraction, sdms, workers=1),
+                             (['sd://t/s/a.zgy', 'sd://t/s/missing.zgy'], 'Bearer token', 'key'))
+        by_path = {item['sdpath']: item for item in job['items']}
+        assert by_path['sd://t/s/a.zgy']['errorStatus'] == 503
+        assert by_path['sd://t/s/a.zgy']['attempts'] == 3
+        assert by_path['sd://t/s/missing.zgy'] == {'sdpath': 'sd://t/s/missing.zgy', 'status': 'failed', 'attempts': 1,
+                                                   'errorStatus': 404, 'errors': ['sd://t/s/missing.zgy not found']}
+        assert job['counts']['failed'] == 2
+        assert sdms.patches == []
+
+    def test_workers_are_bounded(self):
+        sdpaths = [f'sd://t/s/{i}.zgy' for i in range(10)]
+        sdms = InMemorySdms({sdpath: dict(RECORD) for sdpath in sdpaths})
+        extraction = Extraction()
+        job, = self.run_jobs(self.pipeline(extraction, sdms, workers=3), (sdpaths + sdpaths[:2], 'Bearer token', 'key'))
+        assert job['counts']['written'] == 10
+        assert extraction.calls == 10
+        assert extraction.peak == 3
+
+    def test_idempotency_key_returns_the_submitted_job(self):
+        pipeline = self.pipeline(Extraction(), InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)}))
+
+        async def main():
+            first, created = pipeline.submit(['sd://t/s/a.zgy'], 'Bearer token', 'key', 'load-42')
+            again, created_again = pipeline.submit(['sd://t/s/a.zgy'], 'Bearer token', 'key', 'load-42')
+            other, _ = pipeline.submit(['sd://t/s/a.zgy'], 'Bearer other', 'key', 'load-42')
+            assert (created, created_again) == (True, False)
+            assert again is first and other is not first
+            assert pipeline.get(first.id, 'Bearer token', 'key') is first
+            assert pipeline.get(first.id, 'Bearer other', 'key') is None
+            await pipeline.close()
+        asyncio.run(main())
+
+    def test_pending_datasets_are_bounded(self):
+        pipeline = self.pipeline(Extraction(), InMemorySdms({}), max_pending=3)
+
+        async def main():
+            pipeline.submit(['a.zgy', 'b.zgy'], 'Bearer token', 'key')
+            with self.assertRaises(HTTPException) as raised:
+                pipeline.submit(['c.zgy', 'd.zgy'], 'Bearer token', 'key')
+            assert raised.exception.status_code == 503
+            await pipeline.close()
+        asyncio.run(main())
+
+    def test_updates_of_other_writers_are_kept(self):
+        sdms = ConcurrentWriter({'sd://t/s/a.zgy': dict(RECORD)})
+        job, = self.run_jobs(self.pipeline(Extraction(), sdms), (['sd://t/s/a.zgy'], 'Bearer token', 'key'))
+        assert job['counts']['written'] == 1
+        assert sdms.records['sd://t/s/a.zgy']['filemetadata'] == {
+            'type': 'GENERIC', 'size': 1000, 'nobjects': 1, 'checksum': 'abc',
+            'zgy': {'Size': [6, 6, 10], 'Name': 'sd://t/s/a.zgy'}}
+        assert sdms.locks == {}
+
+    def test_locked_datasets_are_retried(self):
+        sdms = InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)}, lock_failures=1)
+        job, = self.run_jobs(self.pipeline(Extraction(), sdms), (['sd://t/s/a.zgy'], 'Bearer token', 'key'))
+        assert job['items'] == [{'sdpath': 'sd://t/s/a.zgy', 'status': 'written', 'attempts': 2}]
+        assert sdms.locks == {}
+
+    def test_datasets_are_not_written_back_with_an_expired_token(self):
+        sdms = InMemorySdms({'sd://t/s/a.zgy': dict(RECORD)})
+        pipeline = self.pipeline(Extraction(errors=[HTTPException(status_code=503, detail="busy")]), sdms)
+
+        async def main():
+            with self.assertRaises(HTTPException) as raised:
+                pipeline.submit(['sd://t/s/a.zgy'], bearer_token(999), 'key', 'load-42')
+            assert raised.exception.status_code == 401
+            # the retry delay outlasts the token
+            job, _ = pipeline.submit(['sd://t/s/a.zgy'], bearer_token(1000.2), 'key', 'load-42')
+            async for _ in job.results():
+                pass
+            again, created = pipeline.submit(['sd://t/s/a.zgy'], bearer_token(2000), 'key', 'load-42')
+            async for _ in again.results():
+                pass
+            await pipeline.close()
+            return job.as_dict(), again.as_dict(), created
+        job, again, created = asyncio.run(main())
+        assert job['items'][0]['status'] == 'expired'
+        assert job['counts']['expired'] == 1
+        assert created and again['items'][0]['status'] == 'written'
+        assert sdms.patches == [('sd://t/s/a.zgy', {'filemetadata': {**RECORD['filemetadata'], 'zgy': {
+            'Size': [6, 6, 10], 'Name': 'sd://t/s/a.zgy'}}})]